@@ -1,53 +1,149 @@
+import time
+_started = time.perf_counter()  # For --startup-timing
+
+import argparse
 import requests
-import gradio as gr
-import pandas as pd
-import plotly.graph_objects as go
-from PIL import Image
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+import hashlib
+import importlib
 import io
 import datetime
+import os
+import threading
+from urllib.parse import urlparse
+
+# Heavy modules are imported on first use rather than with app.py: gradio (and pandas with it) when the UI is
+# built, plotly when the first chart is drawn, and Kaleido when plotly first rasterizes one
+import_times = {}  # Module name -> seconds its first import took
+
+
+class LazyModule:
+    """A module that is imported the first time one of its attributes is used."""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    started = time.perf_counter()
+                    module = importlib.import_module(self._name)
+                    import_times[self._name] = time.perf_counter() - started
+                    self._module = module
+        return getattr(self._module, attr)
+
+
+gr = LazyModule("gradio")
+pd = LazyModule("pandas")
+go = LazyModule("plotly.graph_objects")
+Image = LazyModule("PIL.Image")
 
 API_URL = "http://127.0.0.1:5000"
 
-# Function to fetch expenses with optional filters
-def fetch_expenses(month=None, year=None, category=None):
-    params = {}
+# Chart Rendering
+CHART_MODE = os.environ.get("EXPENSE_CHART_MODE", "image")  # "plot" = interactive gr.Plot, no PNG rasterization
+CHART_CACHE_SIZE = 64  # Rendered PNGs kept, keyed by chart data + title
+_chart_cache = OrderedDict()
+_chart_renders = {}  # Renders in flight, so identical concurrent requests share one Kaleido call
+_chart_lock = threading.Lock()
+_render_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="chart-render")
+
+# One pooled HTTP session, so every call reuses a kept-alive connection to the API
+session = requests.Session()
+# Over loopback compression is pure CPU on both ends, so ask for bodies as they are
+if urlparse(API_URL).hostname in ("127.0.0.1", "localhost", "::1"):
+    session.headers["Accept-Encoding"] = "identity"
+
+# Last ETag and body per GET request, so unchanged data is revalidated (304) instead of re-sent
+_validators = {}
+
+def api_get(path, params=None):
+    """GET from the API with If-None-Match; returns (status_code, parsed JSON)."""
+    key = (path, tuple(sorted((params or {}).items())))
+    cached = _validators.get(key)
+    headers = {"If-None-Match": cached[0]} if cached else {}
+
+    response = session.get(f"{API_URL}{path}", params=params, headers=headers)
+    if response.status_code == 304 and cached:
+        return 200, cached[1]
+    if response.status_code == 200 and "ETag" in response.headers:
+        _validators[key] = (response.headers["ETag"], response.json())
+    return response.status_code, response.json()
+
+# Function to build the expense table from API rows (a list of objects, or ?format=columns parallel arrays)
+def expenses_table(expenses):
+    df = pd.DataFrame(expenses)
+    if df.empty:
+        return pd.DataFrame(columns=["Date", "Description", "Category", "Cost"])
+
+    df = df[["id", "description", "category", "cost", "date"]]  # Column order
+    df["cost"] = pd.to_numeric(df["cost"], errors="coerce")
+    df["date"] = pd.to_datetime(df["date"]).dt.strftime("%Y-%m-%d")
+    return df
+
+# Function to build the monthly summary table (with a TOTAL row) from API totals
+def summary_table(data):
+    summary_df = pd.DataFrame(data["category_totals"])
+
+    if not summary_df.empty:
+        summary_df.columns = ["Category", "Total Cost"]
+        summary_df["Total Cost"] = summary_df["Total Cost"].apply(lambda x: f"${x:.2f}")
+
+        # Add a "Total" row at the bottom
+        total_row = pd.DataFrame([["TOTAL", f"${data['overall_total']:.2f}"]], columns=["Category", "Total Cost"])
+        summary_df = pd.concat([summary_df, total_row], ignore_index=True)
+
+    return summary_df
+
+# Function to fetch the table, pie chart and summary in one request
+# (with wait=False the chart is a Future, so callers can show the table before it finishes rendering)
+def fetch_dashboard(month=None, year=None, category=None, wait=True):
+    params = {'format': 'columns'}  # The table arrives as one array per column, which pandas takes as is
     if month and year:
         params['month'] = str(month)
         params['year'] = str(year)
     if category:
         params['category'] = category
 
-    response = requests.get(f"{API_URL}/expenses", params=params)
-    if response.status_code == 200:
-        expenses = response.json()
-        if expenses:
-            df = pd.DataFrame(expenses)
-            if not df.empty:
-                df = df[["id", "description", "category", "cost", "date"]]  # Column order
-
-            df["cost"] = pd.to_numeric(df["cost"], errors="coerce")
-            df["date"] = pd.to_datetime(df["date"]).dt.strftime("%Y-%m-%d")
-
-            # Ensure delete column is not included in table display
-            if "delete" in df.columns:
-                df = df.drop(columns=["delete"])
-
-            # Aggregate data for pie chart **ONLY by date (month & year)**
-            if month and year:
-                df_pie = df[(df["date"].str.startswith(f"{year}-{str(month).zfill(2)}"))]
-                df_aggregated = df_pie.groupby('category', as_index=False)['cost'].sum()
-            else:
-                df_aggregated = df.groupby('category', as_index=False)['cost'].sum()
+    status_code, data = api_get("/dashboard", params)
+    if status_code == 200:
+        # Pie chart and summary always cover every category of the month; only the table is filtered
+        df_aggregated = pd.DataFrame(data["category_totals"], columns=["category", "total_cost"])
+        df_aggregated = df_aggregated.rename(columns={"total_cost": "cost"})
+        chart = render_chart(df_aggregated, month, year) if not df_aggregated.empty else None
+        if wait and chart is not None:
+            chart = chart.result()
+        return expenses_table(data["expenses"]), chart, summary_table(data)
 
-            return df, create_pie_chart(df_aggregated, month, year)  # Always update pie chart by date only
+    return expenses_table([]), None, empty_summary()
 
-    return pd.DataFrame(columns=["Date", "Description", "Category", "Cost"]), None
+# Function to fetch expenses with optional filters
+def fetch_expenses(month=None, year=None, category=None):
+    table, chart, _ = fetch_dashboard(month, year, category)
+    return table, chart
 
-# Function to filter expenses (Only updates Table)
+# Function to filter expenses (Table, Pie Chart and Monthly Summary from a single call)
 def filter_table(m, y, c):
-    filtered_table, _ = fetch_expenses(m, y, None if c == "All" else c)  # Filters table but NOT pie chart
-    _, updated_chart = fetch_expenses(m, y, None)  # Always fetch full pie chart data for selected month/year
-    return filtered_table, updated_chart  # Table filters, Pie Chart shows all categories
+    # Table filters, Pie Chart shows all categories
+    table, chart, summary = fetch_dashboard(m, y, None if c == "All" else c, wait=False)
+    if chart is not None and not chart.done():
+        yield table, gr.update(), summary  # Show the table right away; the chart follows when rendered
+    yield table, chart.result() if chart is not None else None, summary
+
+# Function to load the current month when the page opens: the table first, then the summary, then the
+# chart once it is rendered (the first render also loads plotly and starts Kaleido)
+def initial_load():
+    table, chart, summary = fetch_dashboard(str(current_month), str(current_year), None, wait=False)
+    yield table, gr.update(), gr.update()
+    if chart is not None and not chart.done():
+        yield gr.update(), gr.update(), summary
+        yield gr.update(), chart.result(), gr.update()
+    else:
+        yield gr.update(), chart.result() if chart is not None else None, summary
 
 # Function to filter Pie Chart (Only updates Pie Chart)
 def filter_pie_chart(m, y):
@@ -71,7 +167,7 @@ def execute_delete(expense_id):
             gr.update(visible=False),  # Hide confirmation
         )
 
-    response = requests.delete(f"{API_URL}/expense/{expense_id}")
+    response = session.delete(f"{API_URL}/expense/{expense_id}")
 
     if response.status_code == 404:
         return (
@@ -133,7 +229,7 @@ def handle_submission(description, date, cost, category):
     }
 
     # Send POST request
-    response = requests.post(f"{API_URL}/expense", json=data)
+    response = session.post(f"{API_URL}/expense", json=data)
     if response.status_code == 201:
         updated_table, updated_chart = fetch_expenses()  # or pass current filters if you have them
         return ("✅ Expense added successfully!", updated_table, updated_chart, "")
@@ -145,42 +241,68 @@ def handle_submission(description, date, cost, category):
 
 # Function to create a pie chart with title including month and year
 def create_pie_chart(df_aggregated, month, year):
+    return render_chart(df_aggregated, month, year).result()
+
+# Function to start (or reuse) a pie chart render; returns a Future of the chart value
+def render_chart(df_aggregated, month, year):
+    title = f"Expense Distribution - {datetime.date(1900, int(month), 1).strftime('%B')} {year}" if month and year else "Expense Distribution"
+    data = tuple(sorted((str(category), round(float(cost), 2))
+                        for category, cost in zip(df_aggregated['category'], df_aggregated['cost'])))
+
+    if CHART_MODE == "plot":
+        return _render_pool.submit(build_pie_figure, data, title)  # Plotly renders it in the browser
+
+    key = hashlib.sha1(repr((title, data)).encode()).hexdigest()
+    with _chart_lock:
+        img_bytes = _chart_cache.get(key)
+        if img_bytes is not None:
+            _chart_cache.move_to_end(key)
+            future = Future()
+            future.set_result(Image.open(io.BytesIO(img_bytes)))
+            return future
+        future = _chart_renders.get(key)
+        if future is None:
+            future = _render_pool.submit(render_png, key, data, title)
+            _chart_renders[key] = future
+        return future
+
+# Function to rasterize a pie chart with Kaleido (runs on the render pool)
+def render_png(key, data, title):
+    try:
+        img_bytes = build_pie_figure(data, title).to_image(format="png", scale=2)
+        with _chart_lock:
+            _chart_cache[key] = img_bytes
+            while len(_chart_cache) > CHART_CACHE_SIZE:
+                _chart_cache.popitem(last=False)
+        return Image.open(io.BytesIO(img_bytes))
+    finally:
+        with _chart_lock:
+            _chart_renders.pop(key, None)
+
+# Function to build the Plotly pie figure from (category, total) pairs
+def build_pie_figure(data, title):
     fig = go.Figure(data=[go.Pie(
-        labels=df_aggregated['category'],
-        values=df_aggregated['cost'],
+        labels=[category for category, _ in data],
+        values=[cost for _, cost in data],
         textinfo='label+percent',  # Shows category name + percentage
         hoverinfo='label+value+percent',  # Tooltip shows value & percentage
         textposition='inside',
-        pull=[0.1] * len(df_aggregated)
+        pull=[0.1] * len(data)
     )])
-
-    title = f"Expense Distribution - {datetime.date(1900, int(month), 1).strftime('%B')} {year}" if month and year else "Expense Distribution"
     fig.update_layout(title=title)
-
-    img_bytes = fig.to_image(format="png", scale=2)
-    img = Image.open(io.BytesIO(img_bytes))
-
-    return img
+    return fig
 
 # Function to fetch monthly summary
 def fetch_summary(month, year):
-    response = requests.get(f"{API_URL}/summary", params={"month": month, "year": year})
-
-    if response.status_code == 200:
-        data = response.json()
-        summary_df = pd.DataFrame(data["category_totals"])
+    status_code, data = api_get("/summary", {"month": str(month), "year": str(year)})
 
-        if not summary_df.empty:
-            summary_df.columns = ["Category", "Total Cost"]
-            summary_df["Total Cost"] = summary_df["Total Cost"].apply(lambda x: f"${x:.2f}")
+    if status_code == 200:
+        return summary_table(data)
 
-            # Add a "Total" row at the bottom
-            total_row = pd.DataFrame([["TOTAL", f"${data['overall_total']:.2f}"]], columns=["Category", "Total Cost"])
-            summary_df = pd.concat([summary_df, total_row], ignore_index=True)
+    return empty_summary()
 
-        return summary_df
-
-    # If no data is available, return an empty table with a $0.00 total row
+# If no data is available, return an empty table with a $0.00 total row
+def empty_summary():
     return pd.concat([
         pd.DataFrame(columns=["Category", "Total Cost"]),
         pd.DataFrame([{"Category": "TOTAL", "Total Cost": "$0.00"}])
@@ -191,105 +313,145 @@ def fetch_summary(month, year):
 current_month = datetime.datetime.now().month
 current_year = datetime.datetime.now().year
 
-# Create a Gradio interface
-with gr.Blocks(css_paths="styles.css") as gui:
-    # Title (Centered)
-    gr.HTML('<h1>Expense Tracker</h1>')
-
-    # First row: Expense Input Form (Left) & Filters (Right)
-    with gr.Row():
-        with gr.Group(elem_id="group"):
-            with gr.Column(scale=1, min_width=400):
-                gr.HTML("<h2 style='text-align: center;'>Add Expense</h2>")
-                description_input = gr.Textbox(label="Description", placeholder="max 25 characters")
-                date_input = gr.DateTime(label="Date", include_time=False)
-                cost_input = gr.Number(label="Cost", step=0.01, precision=2)
-                category_input = gr.Dropdown(
-                    ["Rent/Mortgage", "Utilities", "Gas", "Food", "Entertainment", "Savings", "Insurance", "Other"],
-                    label="Category")
-                submit_button = gr.Button("Add Expense")
-                submit_error_message = gr.Markdown()
 
+# Function to build the Gradio interface
+def build_ui():
+    with gr.Blocks(css_paths="styles.css") as gui:
+        # Title (Centered)
+        gr.HTML('<h1>Expense Tracker</h1>')
+
+        # First row: Expense Input Form (Left) & Filters (Right)
+        with gr.Row():
+            with gr.Group(elem_id="group"):
+                with gr.Column(scale=1, min_width=400):
+                    gr.HTML("<h2 style='text-align: center;'>Add Expense</h2>")
+                    description_input = gr.Textbox(label="Description", placeholder="max 25 characters")
+                    date_input = gr.DateTime(label="Date", include_time=False)
+                    cost_input = gr.Number(label="Cost", step=0.01, precision=2)
+                    category_input = gr.Dropdown(
+                        ["Rent/Mortgage", "Utilities", "Gas", "Food", "Entertainment", "Savings", "Insurance", "Other"],
+                        label="Category")
+                    submit_button = gr.Button("Add Expense")
+                    submit_error_message = gr.Markdown()
+
+            with gr.Group():
+                with gr.Column(scale=1, min_width=400):
+                    gr.HTML("<h2 style='text-align: center;'>Filter Expenses</h2>")
+                    month_input = gr.Dropdown(choices=[str(i) for i in range(1, 13)], label="Month",
+                                              value=str(current_month))
+                    year_input = gr.Dropdown(choices=[str(y) for y in range(current_year - 20, current_year + 1)],
+                                             label="Year", value=str(current_year))
+                    category_filter = gr.Dropdown(
+                        choices=["All", "Rent/Mortgage", "Utilities", "Gas", "Food", "Entertainment", "Savings",
+                                 "Insurance", "Other"], label="Category", value="All")
+                    filter_button = gr.Button("Filter Expenses")
+
+        # Second row: Expense Table (Full Width)
+        table_output = gr.Dataframe(headers=["Date", "Description", "Category", "Cost"], type="pandas")
+
+        #Third row: Delete Expense
         with gr.Group():
             with gr.Column(scale=1, min_width=400):
-                gr.HTML("<h2 style='text-align: center;'>Filter Expenses</h2>")
-                month_input = gr.Dropdown(choices=[str(i) for i in range(1, 13)], label="Month",
-                                          value=str(current_month))
-                year_input = gr.Dropdown(choices=[str(y) for y in range(current_year - 20, current_year + 1)],
-                                         label="Year", value=str(current_year))
-                category_filter = gr.Dropdown(
-                    choices=["All", "Rent/Mortgage", "Utilities", "Gas", "Food", "Entertainment", "Savings",
-                             "Insurance", "Other"], label="Category", value="All")
-                filter_button = gr.Button("Filter Expenses")
-
-    # Second row: Expense Table (Full Width)
-    table_output = gr.Dataframe(headers=["Date", "Description", "Category", "Cost"], type="pandas")
-
-    #Third row: Delete Expense
-    with gr.Group():
-        with gr.Column(scale=1, min_width=400):
-            gr.HTML("<h2 style='text-align: center;'>Delete an Expense</h2>")
-            delete_button = gr.Textbox(label="Enter Expense ID to Delete")
-        delete_action = gr.Button("Delete", elem_id="delete")
-        delete_error_message = gr.Markdown()
-        delete_confirmation = gr.Markdown()
-        confirm_delete_button = gr.Button("Confirm Delete", visible=False)
-        cancel_delete_button = gr.Button("Cancel", visible=False)
-
-    # Fourth row: Pie Chart (Left) & Monthly Summary (Right)
-    with gr.Row():
-        with gr.Group():  # Left Column - Pie Chart
-            with gr.Column(scale=1, min_width=400):
-                pie_chart_output = gr.Image()
-        with gr.Group():  # Right Column - Monthly Summary
-            with gr.Column(scale=1, min_width=400):
-                # Monthly Summary Title (Centered)
-                gr.HTML("<h2 style='text-align: center;'>Monthly Summary</h2>")
-                summary_output = gr.Dataframe(headers=["Category", "Total Cost"], interactive= False, scale=1, type="pandas")
-
-    # Delete button click (Shows confirmation pop-up)
-    delete_action.click(
-        fn=confirm_delete,
-        inputs=[delete_button],
-        outputs=[delete_error_message, delete_confirmation, confirm_delete_button, cancel_delete_button]
-    )
-
-    # If user confirms deletion
-    confirm_delete_button.click(
-        fn=execute_delete,
-        inputs=[delete_button],
-        outputs=[delete_error_message, delete_confirmation, confirm_delete_button, cancel_delete_button, table_output,
-                 pie_chart_output]
-    )
+                gr.HTML("<h2 style='text-align: center;'>Delete an Expense</h2>")
+                delete_button = gr.Textbox(label="Enter Expense ID to Delete")
+            delete_action = gr.Button("Delete", elem_id="delete")
+            delete_error_message = gr.Markdown()
+            delete_confirmation = gr.Markdown()
+            confirm_delete_button = gr.Button("Confirm Delete", visible=False)
+            cancel_delete_button = gr.Button("Cancel", visible=False)
+
+        # Fourth row: Pie Chart (Left) & Monthly Summary (Right)
+        with gr.Row():
+            with gr.Group():  # Left Column - Pie Chart
+                with gr.Column(scale=1, min_width=400):
+                    pie_chart_output = gr.Plot() if CHART_MODE == "plot" else gr.Image()
+            with gr.Group():  # Right Column - Monthly Summary
+                with gr.Column(scale=1, min_width=400):
+                    # Monthly Summary Title (Centered)
+                    gr.HTML("<h2 style='text-align: center;'>Monthly Summary</h2>")
+                    summary_output = gr.Dataframe(headers=["Category", "Total Cost"], interactive= False, scale=1, type="pandas")
+
+        # Delete button click (Shows confirmation pop-up)
+        delete_action.click(
+            fn=confirm_delete,
+            inputs=[delete_button],
+            outputs=[delete_error_message, delete_confirmation, confirm_delete_button, cancel_delete_button]
+        )
 
-    # If user cancels deletion
-    cancel_delete_button.click(
-        fn=lambda: ("", gr.update(visible=False), gr.update(visible=False), gr.update(visible=False)),
-        inputs=[],
-        outputs=[delete_error_message, delete_confirmation, confirm_delete_button, cancel_delete_button]
-    )
+        # If user confirms deletion
+        confirm_delete_button.click(
+            fn=execute_delete,
+            inputs=[delete_button],
+            outputs=[delete_error_message, delete_confirmation, confirm_delete_button, cancel_delete_button, table_output,
+                     pie_chart_output]
+        )
 
-    # Load initial data (Table, Pie Chart, and Summary)
-    gui.load(
-        fn=lambda: (*fetch_expenses(current_month, current_year, None), fetch_summary(current_month, current_year)),
-        inputs=[],
-        outputs=[table_output, pie_chart_output, summary_output]
-    )
+        # If user cancels deletion
+        cancel_delete_button.click(
+            fn=lambda: ("", gr.update(visible=False), gr.update(visible=False), gr.update(visible=False)),
+            inputs=[],
+            outputs=[delete_error_message, delete_confirmation, confirm_delete_button, cancel_delete_button]
+        )
 
-    # Event listeners
-    submit_button.click(
-        fn=handle_submission,
-        inputs=[description_input, date_input, cost_input, category_input],
-        outputs=[submit_error_message, table_output, pie_chart_output, date_input]  # 3 outputs
-    )
+        # Load initial data (Table, Pie Chart, and Summary)
+        gui.load(
+            fn=initial_load,
+            inputs=[],
+            outputs=[table_output, pie_chart_output, summary_output]
+        )
 
-    # Update Table, Pie Chart, and Monthly Summary when filtering
-    filter_button.click(
-        fn=lambda m, y, c: (*filter_table(m, y, c), fetch_summary(m, y)),
-        inputs=[month_input, year_input, category_filter],
-        outputs=[table_output, pie_chart_output, summary_output]
-    )
+        # Event listeners
+        submit_button.click(
+            fn=handle_submission,
+            inputs=[description_input, date_input, cost_input, category_input],
+            outputs=[submit_error_message, table_output, pie_chart_output, date_input]  # 3 outputs
+        )
 
-# Launch the Gradio app
-gui.launch(show_error=True)
+        # Update Table, Pie Chart, and Monthly Summary when filtering
+        filter_button.click(
+            fn=filter_table,
+            inputs=[month_input, year_input, category_filter],
+            outputs=[table_output, pie_chart_output, summary_output]
+        )
 
+    return gui
+
+
+# Function to time a cold start: imports, building the UI, and each step of the initial load
+def startup_timing():
+    import_done = time.perf_counter()
+    build_ui()
+    ui_built = time.perf_counter()
+    steps = []
+    for _ in initial_load():
+        steps.append(time.perf_counter())
+
+    print(f"{'import app.py':<28}{(import_done - _started) * 1000:>10.1f} ms")
+    for name, seconds in import_times.items():
+        print(f"{'  first use of ' + name:<28}{seconds * 1000:>10.1f} ms")
+    print(f"{'build UI':<28}{(ui_built - import_done) * 1000:>10.1f} ms")
+    labels = ("initial load: table", "initial load: summary", "initial load: chart") if len(steps) == 3 else \
+        ("initial load: table", "initial load: summary+chart")
+    started = ui_built
+    for label, finished in zip(labels, steps):
+        print(f"{label:<28}{(finished - started) * 1000:>10.1f} ms")
+        started = finished
+    print(f"{'total':<28}{(started - _started) * 1000:>10.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Expense Tracker web interface")
+    parser.add_argument("--startup-timing", action="store_true",
+                        help="report import, UI build and first-render times against the running API, then exit")
+    args = parser.parse_args()
+    if args.startup_timing:
+        try:
+            startup_timing()
+        except requests.ConnectionError:
+            parser.exit(1, f"The API at {API_URL} is not reachable; start routes.py first\n")
+        return
+    build_ui().launch(show_error=True)
+
+
+if __name__ == "__main__":
+    main()
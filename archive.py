@@ -0,0 +1,277 @@
+import argparse
+import gzip
+import hashlib
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date
+
+from database import DB_NAME, build_db, bump_data_version, get_db_connection
+
+ARCHIVE_DIR = 'archive'
+
+# What an archive file holds: the year's expenses with the hot table's covering indexes, and its rollups
+# (plus a description search index when the hot database has one)
+ARCHIVE_TABLES = ("expenses", "expense_rollups")
+ARCHIVE_INDEXES = ("idx_expense_date_cover", "idx_expense_category_cover", "idx_expense_category_id")
+SEARCH_TABLE = "expenses_fts"
+TABLE_COLUMNS = {
+    "expenses": "id, cost, date, category, description",
+    "expense_rollups": "year, month, category, total_cents, count",
+}
+# How a hot table is narrowed to the years first..last when a span is read in batches
+HOT_YEARS = {
+    "expenses": "date BETWEEN '{first:04d}-01-01' AND '{last:04d}-12-31'",
+    "expense_rollups": "year BETWEEN {first} AND {last}",
+}
+MIN_YEAR, MAX_YEAR = 1, 9999
+
+
+class ArchiveError(Exception):
+    """An archival that cannot go ahead, or a query over more archived years than SQLite can attach."""
+
+
+def archive_file(year, compress=False):
+    return f"expenses_{year}.db" + (".gz" if compress else "")
+
+
+def schema_name(year):
+    # The name a year's archive is attached under
+    return f"archive_{year}"
+
+
+def union_table(table, years, hot=True, clip=None):
+    """A FROM-clause source for `table`: the hot table alone, or a UNION ALL of it and each archived year's.
+
+    SQLite flattens the subquery, pushing the outer WHERE into every arm (so each one still searches
+    its own indexes) and merging the arms for an outer ORDER BY. clip = (first, last) narrows the hot
+    table to those years.
+    """
+    if hot and not years and clip is None:
+        return table
+    arms = [f"SELECT {TABLE_COLUMNS[table]} FROM {schema_name(year)}.{table}" for year in years]
+    if hot:
+        where = " WHERE " + HOT_YEARS[table].format(first=clip[0], last=clip[1]) if clip else ""
+        arms.insert(0, f"SELECT {TABLE_COLUMNS[table]} FROM main.{table}{where}")
+    return f"({' UNION ALL '.join(arms)}) AS {table}"
+
+
+class ArchiveSet:
+    """The per-year archive files in `directory`, as catalogued by the hot database's archived_years table.
+
+    Queries reach an archived year by attaching its file read-only and immutable (so SQLite takes no
+    locks on it) to the connection running them. Compressed archives are unpacked once into `cache_dir`.
+    """
+
+    def __init__(self, directory=ARCHIVE_DIR, cache_dir=None):
+        self.directory = directory
+        self.cache_dir = cache_dir or os.path.join(
+            tempfile.gettempdir(), "expense_archive_" + hashlib.sha1(os.path.abspath(directory).encode()).hexdigest()[:12])
+        self._lock = threading.Lock()
+
+    def catalog(self, conn, first=None, last=None):
+        """{year: file name} for the archived years between first and last (inclusive; None is unbounded)."""
+        try:
+            rows = conn.execute("SELECT year, file FROM archived_years WHERE year BETWEEN ? AND ?",
+                                (MIN_YEAR if first is None else first, MAX_YEAR if last is None else last)).fetchall()
+        except sqlite3.OperationalError:
+            return {}  # A database built before archiving existed
+        return {row[0]: row[1] for row in rows}
+
+    def batches(self, conn, first=None, last=None):
+        """Split the years first..last into consecutive (first, last) runs that each reach no more archived
+        years than SQLite can attach to one connection: just [(first, last)] when they all fit."""
+        limit = conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+        years = sorted(self.catalog(conn, first, last))
+        if len(years) <= limit:
+            return [(first, last)]
+        runs, start = [], MIN_YEAR if first is None else first
+        for i in range(limit, len(years), limit):
+            runs.append((start, years[i] - 1))
+            start = years[i]
+        runs.append((start, MAX_YEAR if last is None else last))
+        return runs
+
+    @contextmanager
+    def tables(self, conn, first=None, last=None, hot=True, clip=False):
+        """Attach the archived years between first and last to conn for the block and yield the sources to
+        format a query template with: {expenses} and {rollups}, plus the list of attached years.
+
+        With hot=False the sources cover the archives only (meaningless when no year was attached). With
+        clip=True the hot tables are narrowed to first..last as well, so that the runs from batches()
+        between them read every hot row exactly once.
+        """
+        catalog = self.catalog(conn, first, last)
+        if len(catalog) > conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED):
+            raise ArchiveError(f"The range covers {len(catalog)} archived years; at most "
+                               f"{conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)} can be read at once")
+        attached = []
+        try:
+            for year, name in sorted(catalog.items()):
+                conn.execute(f"ATTACH DATABASE ? AS {schema_name(year)}", (self.uri(name),))
+                attached.append(year)
+            clip = (MIN_YEAR if first is None else first, MAX_YEAR if last is None else last) if clip else None
+            yield {"expenses": union_table("expenses", attached, hot, clip),
+                   "rollups": union_table("expense_rollups", attached, hot, clip), "years": attached}
+        finally:
+            for year in attached:
+                conn.execute(f"DETACH DATABASE {schema_name(year)}")
+
+    def uri(self, name):
+        # A read-only, immutable URI for an archive file, unpacking it first if it is compressed
+        path = os.path.join(self.directory, name)
+        if name.endswith(".gz"):
+            path = self._unpacked(path, name[:-3])
+        return "file:" + uri_path(os.path.abspath(path)) + "?mode=ro&immutable=1"
+
+    def _unpacked(self, path, name):
+        unpacked = os.path.join(self.cache_dir, name)
+        with self._lock:
+            if not os.path.exists(unpacked) or os.path.getmtime(unpacked) < os.path.getmtime(path):
+                os.makedirs(self.cache_dir, exist_ok=True)
+                partial = f"{unpacked}.{os.getpid()}.part"
+                with gzip.open(path, "rb") as source, open(partial, "wb") as target:
+                    shutil.copyfileobj(source, target, 1024 * 1024)
+                os.replace(partial, unpacked)
+        return unpacked
+
+
+def uri_path(path):
+    # Percent-encodes the characters that would end or alter the path part of a file: URI
+    return path.replace("%", "%25").replace("?", "%3f").replace("#", "%23")
+
+
+def write_archive(db_name, path, year):
+    # Copies the year's expenses and rollups from the hot database into a new, compact SQLite file at
+    # path and returns the number of expenses copied. Tables and indexes reuse the hot schema's DDL,
+    # and the search index (external content, so it reads the archive's own expenses) is rebuilt there.
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("PRAGMA journal_mode = DELETE")  # A read-only file cannot host a write-ahead log
+        conn.execute("ATTACH DATABASE ? AS hot", (db_name,))
+        names = ARCHIVE_TABLES + ARCHIVE_INDEXES + (SEARCH_TABLE,)
+        schema = dict(conn.execute(f"SELECT name, sql FROM hot.sqlite_master WHERE name IN ({', '.join('?' * len(names))})",
+                                   names).fetchall())
+        with conn:
+            for table in ARCHIVE_TABLES:
+                conn.execute(schema[table])
+            conn.execute(f"INSERT INTO main.expenses SELECT {TABLE_COLUMNS['expenses']} FROM hot.expenses "
+                         "WHERE date BETWEEN ? AND ? ORDER BY id", (f"{year:04d}-01-01", f"{year:04d}-12-31"))
+            conn.execute(f"INSERT INTO main.expense_rollups SELECT {TABLE_COLUMNS['expense_rollups']} "
+                         "FROM hot.expense_rollups WHERE year = ?", (year,))
+            for index in ARCHIVE_INDEXES:
+                conn.execute(schema[index])  # Built once over the sorted data rather than row by row
+            if SEARCH_TABLE in schema:
+                conn.execute(schema[SEARCH_TABLE])
+                conn.execute(f"INSERT INTO main.{SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('rebuild')")
+                conn.execute(f"INSERT INTO main.{SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('optimize')")
+        count = conn.execute("SELECT COUNT(*) FROM main.expenses").fetchone()[0]
+        conn.execute("DETACH DATABASE hot")
+        conn.execute("ANALYZE")
+        conn.commit()
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+    return count
+
+
+def archive_year(db_name, directory, year, compress=False):
+    """Move every expense dated in `year` into a read-only archive file and record it in archived_years.
+
+    The hot database's write lock is held from the copy until the year's rows are deleted, so no write
+    slips in between, and the archive is complete on disk before that delete commits: a crash leaves
+    the year in the hot database (and at worst a stray file the next run replaces). Returns a report.
+    """
+    if year >= date.today().year:
+        raise ArchiveError(f"{year} is not closed yet; only past years can be archived")
+    name = archive_file(year, compress)
+    path = os.path.join(directory, name)
+    os.makedirs(directory, exist_ok=True)
+
+    conn = get_db_connection(db_name)
+    placed = False
+    try:
+        # Take the write lock before checking the catalog, so two runs for one year cannot both go ahead
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if conn.execute("SELECT 1 FROM archived_years WHERE year = ?", (year,)).fetchone():
+                raise ArchiveError(f"{year} is already archived")
+            staging = os.path.join(directory, archive_file(year) + ".tmp")
+            rows = write_archive(db_name, staging, year)
+            if compress:
+                with open(staging, "rb") as source, gzip.open(staging + ".gz", "wb") as target:
+                    shutil.copyfileobj(source, target, 1024 * 1024)
+                os.remove(staging)
+                staging += ".gz"
+            os.chmod(staging, 0o444)
+            os.replace(staging, path)
+            placed = True
+
+            deleted = conn.execute("DELETE FROM expenses WHERE date BETWEEN ? AND ?",
+                                   (f"{year:04d}-01-01", f"{year:04d}-12-31")).rowcount
+            if deleted != rows:
+                raise ArchiveError(f"Copied {rows} expenses from {year} but would delete {deleted}")
+            conn.execute("INSERT INTO archived_years (year, file, rows, archived_at) VALUES (?, ?, ?, ?)",
+                         (year, name, rows, time.strftime("%Y-%m-%dT%H:%M:%S%z")))
+            bump_data_version(conn)  # Cached responses and the columnar store reload at the new version
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            if placed:  # Only ever the file this call put there; its rows are back in the hot database
+                os.remove(path)
+            raise
+    finally:
+        conn.close()
+    return {"year": year, "rows": rows, "file": path, "bytes": os.path.getsize(path)}
+
+
+def closed_years(db_name, before):
+    # Years before `before` that still have expenses in the hot database
+    conn = get_db_connection(db_name)
+    try:
+        return [row[0] for row in conn.execute(
+            "SELECT DISTINCT year FROM expense_rollups WHERE year < ? ORDER BY year", (before,))]
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move closed years of expenses into per-year archive databases")
+    parser.add_argument("years", nargs="*", type=int, help="years to archive")
+    parser.add_argument("--before", type=int, help="archive every year before this one that has expenses")
+    parser.add_argument("--database", default=DB_NAME)
+    parser.add_argument("--dir", default=ARCHIVE_DIR, help="where the archive files go (the API's ARCHIVE_DIR)")
+    parser.add_argument("--compress", action="store_true", help="gzip the archives; they are unpacked on first read")
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM the hot database afterwards to return the space")
+    parser.add_argument("--list", action="store_true", help="show the archived years and exit")
+    args = parser.parse_args()
+
+    build_db(args.database)
+    if args.list:
+        conn = get_db_connection(args.database)
+        for row in conn.execute("SELECT year, file, rows, archived_at FROM archived_years ORDER BY year"):
+            print(f"{row['year']}  {row['rows']:>10} rows  {row['file']}  (archived {row['archived_at']})")
+        conn.close()
+        raise SystemExit(0)
+
+    years = sorted(set(args.years) | set(closed_years(args.database, args.before) if args.before else ()))
+    if not years:
+        parser.error("name the years to archive, or use --before YEAR")
+    for year in years:
+        try:
+            report = archive_year(args.database, args.dir, year, args.compress)
+        except ArchiveError as e:
+            print(f"{year}: skipped ({e})")
+            continue
+        print(f"{year}: {report['rows']} expenses archived to {report['file']} ({report['bytes']:,} bytes)")
+    if args.vacuum:
+        conn = get_db_connection(args.database)
+        conn.execute("VACUUM")
+        conn.close()
+        print("Hot database vacuumed.")
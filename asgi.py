@@ -0,0 +1,319 @@
+"""Async (ASGI) serving mode for the Expense Tracker API.
+
+The core routes (/, /expense, /bulk_expense, /expenses, /summary, /expense/<id>, /import) are native
+async views: they run the same route logic as routes.py, with every database call going through an
+AsyncDatabase (a bounded thread executor over the connection pool, sized by the app's POOL_SIZE).
+Any other path is handed to the Flask app through Hypercorn's WSGI middleware, so the full API is
+available from one server. That middleware runs Flask views on the event loop's default executor
+and reads the whole request body first, refusing bodies over MAX_FALLBACK_BODY (with a JSON 413
+when the request declares its length); /import is native so that uploads stream at any size.
+
+Run with:  python asgi.py [--host 127.0.0.1] [--port 5000]
+     or:   hypercorn asgi:application --bind 127.0.0.1:5000
+"""
+import argparse
+import asyncio
+import json
+from functools import wraps
+from types import GeneratorType
+
+from hypercorn.asyncio import serve
+from hypercorn.config import Config
+from hypercorn.middleware import AsyncioWSGIMiddleware
+from quart import Quart, Response, g, jsonify, request
+from werkzeug.exceptions import MethodNotAllowed, NotFound
+
+import routes
+from database import AsyncDatabase
+from encoding import COMPRESSIBLE_TYPES, FastJSONProvider, choose_encoding, compress_body, compress_stream, fast_json_available
+from metrics import add_rows, count_rows, serialize_timer
+from routes import (create_bulk_expenses, create_expense, expenses_partition, fetch_expense, import_records,
+                    list_expenses, make_etag, normalize_query, read_data_version, remove_expense, replace_expense,
+                    summarize_month, summary_partition)
+
+# The Flask app owns the configuration, the connection pool and the response cache
+flask_app = routes.create_app()
+response_cache = flask_app.extensions['response_cache']
+metrics = flask_app.extensions['metrics']
+
+async_app = Quart(__name__)
+async_app.config['CSP'] = flask_app.config['CSP']
+if flask_app.config['FAST_JSON'] and fast_json_available():
+    async_app.json = FastJSONProvider(async_app)
+db = AsyncDatabase(max_workers=flask_app.config['POOL_SIZE'])
+
+# Everything without a native async view is served by the Flask app
+MAX_FALLBACK_BODY = 64 * 1024 * 1024
+flask_fallback = AsyncioWSGIMiddleware(flask_app, max_body_size=MAX_FALLBACK_BODY)
+
+# Uploads whose native view reads the body itself, as it imports it, instead of Quart buffering it first
+STREAMED_UPLOADS = {("POST", "/import")}
+UPLOAD_RECEIVE = "expense_tracker.receive"  # Scope key holding the upload's real ASGI receive channel
+
+
+# Request Metrics (recorded in the Flask app's registry, so /metrics covers both kinds of view)
+@async_app.before_request
+async def start_request_metrics():
+    if metrics is not None:
+        route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        g.request_timings = metrics.start(route, request.method)
+
+
+@async_app.after_request
+async def finish_request_metrics(response):
+    # Streamed bodies are recorded by respond() once they have been sent
+    timings = g.pop('request_timings', None)
+    if timings is not None:
+        metrics.finish(timings, response.status_code)
+    return response
+
+
+# Apply Security Headers Globally
+@async_app.after_request
+async def apply_security_headers(response):
+    if "Content-Security-Policy" not in response.headers:
+        response.headers["Content-Security-Policy"] = async_app.config['CSP']
+    if "X-Content-Type-Options" not in response.headers:
+        response.headers["X-Content-Type-Options"] = "nosniff"
+    return response
+
+
+# Compress JSON bodies as the Flask app does (routes.compress_response); streams are compressed in respond()
+@async_app.after_request
+async def compress_response(response):
+    if (response.status_code != 200 or response.mimetype not in COMPRESSIBLE_TYPES
+            or "Content-Encoding" in response.headers):
+        return response
+    response.vary.add("Accept-Encoding")
+    encoding = negotiated_encoding()
+    if encoding is None:
+        return response
+    body = await response.get_data()
+    if len(body) >= flask_app.config['COMPRESS_MIN_BYTES']:
+        response.set_data(await db.run(timed_compress_body, body, encoding))
+        response.headers["Content-Encoding"] = encoding
+    return response
+
+
+# Helper Functions
+def negotiated_encoding():
+    # The content coding the client accepts for this response, or None (or when compression is off)
+    if flask_app.config['COMPRESS_MIN_BYTES'] <= 0:
+        return None
+    return choose_encoding(request.accept_encodings)
+
+
+def timed_compress_body(body, encoding):
+    # Compression counts as serialization time, as in routes.compress_response
+    with serialize_timer():
+        return compress_body(body, encoding)
+
+
+async def respond(payload, status):
+    # Turns a route-logic result into a Quart response. Generators (streamed listings) are advanced
+    # on the database executor one chunk at a time, since each step reads from SQLite (and, when
+    # the client accepts it, compresses the chunk); the request's metrics are recorded once the
+    # last chunk is sent.
+    if isinstance(payload, GeneratorType):
+        encoding = negotiated_encoding()
+        if encoding is not None:
+            payload = compress_stream(payload, encoding)
+        timings = g.pop('request_timings', None)
+
+        async def chunks():
+            try:
+                while (chunk := await db.run(next, payload, None)) is not None:
+                    yield chunk
+            finally:
+                await db.run(payload.close)
+                if timings is not None:
+                    metrics.finish(timings, status)
+        response = Response(chunks(), status=status, mimetype="application/json")
+        response.vary.add("Accept-Encoding")
+        if encoding is not None:
+            response.headers["Content-Encoding"] = encoding
+        return response
+    with serialize_timer():
+        add_rows(count_rows(payload))
+        response = jsonify(payload)
+    response.status_code = status
+    return response
+
+
+class UploadStream:
+    """A streamed upload as a blocking read(n) for route logic on the database executor. Each read waits
+    for the server's next body message, so the client is read no faster than the rows are imported."""
+
+    def __init__(self, receive, loop):
+        self.receive = receive
+        self.loop = loop
+        self.pending = b""
+        self.complete = False
+
+    def read(self, size=-1):
+        while not self.pending and not self.complete:
+            message = asyncio.run_coroutine_threadsafe(self.receive(), self.loop).result()
+            if message["type"] == "http.disconnect":
+                raise ConnectionResetError("The client disconnected during the upload")
+            self.pending = message.get("body", b"")
+            self.complete = not message.get("more_body", False)
+        size = len(self.pending) if size < 0 else size
+        data, self.pending = self.pending[:size], self.pending[size:]
+        return data
+
+
+def withheld_body():
+    # The receive channel Quart gets for a streamed upload: an empty body, then nothing until the
+    # response is sent and Quart stops listening (the view reads the real body from UPLOAD_RECEIVE)
+    sent = False
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await asyncio.get_running_loop().create_future()
+    return receive
+
+
+def call_in_app_context(fn, *args):
+    # Route logic reads its settings from the Flask app (flask.current_app)
+    with flask_app.app_context():
+        return fn(*args)
+
+
+async def run_logic(fn, *args):
+    # Runs a route-logic function on the database executor
+    return await db.run(call_in_app_context, fn, *args)
+
+
+def conditional(partition=None):
+    # Async counterpart of routes.conditional + routes.cached: weak ETags with 304s, then the shared
+    # response cache for views whose `partition(args)` says they are cacheable.
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(*args, **kwargs):
+            version = await run_logic(read_data_version)
+            key = normalize_query(request.path, request.args)
+            etag = make_etag(version, key)
+            if request.if_none_match.contains_weak(etag):
+                response = Response("", status=304)
+                response.set_etag(etag, weak=True)
+                return response
+
+            scope = partition(request.args) if partition and response_cache.enabled else None
+            entry = response_cache.get(key, version) if scope else None
+            if entry is not None:
+                response = Response(entry.body, mimetype=entry.mimetype)
+            else:
+                payload, status = await view(*args, **kwargs)
+                response = await respond(payload, status)
+                if status != 200:
+                    return response
+                if scope and not isinstance(payload, GeneratorType):
+                    response_cache.put(key, await response.get_data(), response.mimetype, version, *scope)
+            response.set_etag(etag, weak=True)
+            return response
+        return wrapper
+    return decorator
+
+
+# Routes
+@async_app.route('/')
+async def home():
+    return jsonify({"message": "Expense Tracker API is running"}), 200
+
+
+@async_app.route('/expense', methods=['POST'])
+async def add_expense():
+    data = await request.get_json(silent=True)
+    return await respond(*await run_logic(create_expense, data))
+
+
+@async_app.route('/bulk_expense', methods=['POST'])
+async def add_bulk_expenses():
+    data = await request.get_json(silent=True)
+    return await respond(*await run_logic(create_bulk_expenses, data))
+
+
+@async_app.route('/expenses', methods=['GET'])
+@conditional(expenses_partition)
+async def get_expenses():
+    return await run_logic(list_expenses, request.args)
+
+
+@async_app.route('/summary', methods=['GET'])
+@conditional(summary_partition)
+async def get_summary():
+    return await run_logic(summarize_month, request.args)
+
+
+@async_app.route('/expense/<int:id>', methods=['GET'])
+@conditional()
+async def get_expense(id):
+    return await run_logic(fetch_expense, id)
+
+
+@async_app.route('/expense/<int:id>', methods=['PUT'])
+async def update_expense(id):
+    data = await request.get_json(silent=True)
+    return await respond(*await run_logic(replace_expense, id, data))
+
+
+@async_app.route('/expense/<int:id>', methods=['DELETE'])
+async def delete_expense(id):
+    return await respond(*await run_logic(remove_expense, id))
+
+
+@async_app.route('/import', methods=['POST'])
+async def import_expenses():
+    stream = UploadStream(request.scope[UPLOAD_RECEIVE], asyncio.get_running_loop())
+    return await respond(*await run_logic(import_records, stream, request.args, request.mimetype))
+
+
+# ASGI Entry Point
+async def application(scope, receive, send):
+    # Native async views first; anything they do not route goes to the Flask app
+    if scope["type"] == "http":
+        try:
+            async_app.url_map.bind("localhost").match(scope["path"], method=scope["method"])
+        except (NotFound, MethodNotAllowed):
+            if declared_length(scope) > MAX_FALLBACK_BODY:
+                await send_too_large(send)
+                return
+            await flask_fallback(scope, receive, send)
+            return
+        if (scope["method"], scope["path"]) in STREAMED_UPLOADS:
+            scope, receive = {**scope, UPLOAD_RECEIVE: receive}, withheld_body()
+    await async_app(scope, receive, send)
+
+
+def declared_length(scope):
+    # The request's Content-Length, or 0 when it has none (or an unreadable one)
+    for name, value in scope["headers"]:
+        if name.lower() == b"content-length":
+            return int(value) if value.isdigit() else 0
+    return 0
+
+
+async def send_too_large(send):
+    # A JSON 413 for a body the Flask fallback would refuse (it would answer with a bare 400)
+    body = json.dumps({"error": f"Request body over {MAX_FALLBACK_BODY} bytes; "
+                                "send it to a streaming route such as /import"}).encode()
+    await send({"type": "http.response.start", "status": 413,
+                "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()),
+                            (b"x-content-type-options", b"nosniff")]})
+    await send({"type": "http.response.body", "body": body})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the Expense Tracker API on an ASGI server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    args = parser.parse_args()
+
+    config = Config()
+    config.bind = [f"{args.host}:{args.port}"]
+    config.keep_alive_timeout = 75  # Hold idle keep-alive clients open cheaply
+    config.include_server_header = False  # Same policy as the Flask server: no "Server" banner
+    asyncio.run(serve(application, config))
@@ -0,0 +1,327 @@
+"""Reproducible benchmarks for every API route.
+
+Each run builds a fresh temporary database with deterministic synthetic data (10k, 1M or 10M rows),
+drives every route through the Flask test client and/or real HTTP, and reports p50/p95/p99 latency
+and throughput per route. Results can be saved as a baseline and later runs compared against it.
+
+Run with:  python benchmark.py [--rows 10k 1m] [--transport client http] [--iterations 200]
+           python benchmark.py --rows 10k --save-baseline     # record benchmark_baseline.json
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+import requests
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+from database import (CATEGORIES, ROLLUP_TRIGGERS, SEARCH_TRIGGERS, analyze, build_db, get_db_connection,
+                      rebuild_rollups, rebuild_search_index, search_available)
+
+DATASET_SIZES = {"10k": 10_000, "1m": 1_000_000, "10m": 10_000_000}
+DEFAULT_ITERATIONS = 200
+DEFAULT_WARMUP = 20
+DEFAULT_THRESHOLD = 0.5        # Fail when a route's p95 is more than 50% slower than its baseline...
+MIN_REGRESSION_MS = 1.0        # ...and at least this many milliseconds slower (ignores sub-ms jitter)
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+
+# Seeded rows span ten years from SEED_START_DATE. Every column is a pure function of the row number
+# and the seed, generated inside SQLite, so a given size and seed always yield the same database.
+SEED_START_DATE = "2016-01-01"
+SEED_DAYS = 3652
+# Descriptions are a merchant-like word plus a number, so searches match realistic fractions of the rows
+SEED_WORDS = ("Groceries", "Coffee", "Rent", "Electric bill", "Water bill", "Gas station", "Cinema", "Concert",
+              "Restaurant", "Takeaway", "Pharmacy", "Gym", "Bookshop", "Hardware", "Car insurance", "Home insurance",
+              "Savings transfer", "Bakery", "Taxi", "Train ticket", "Parking", "Internet", "Phone plan", "Streaming")
+
+SEED_QUERY = f"""
+    WITH RECURSIVE seq(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM seq WHERE n < :rows)
+    INSERT INTO expenses (cost, date, category, description)
+    SELECT 1 + ((n * 7919 + :seed) % 49900) / 100.0,
+           date('{SEED_START_DATE}', '+' || ((n * 104729 + :seed) % {SEED_DAYS}) || ' days'),
+           CASE (n * 31 + :seed) % {len(CATEGORIES)}
+               {" ".join(f"WHEN {code} THEN '{name}'" for code, name in enumerate(CATEGORIES))}
+           END,
+           CASE (n * 17 + :seed) % {len(SEED_WORDS)}
+               {" ".join(f"WHEN {code} THEN '{word}'" for code, word in enumerate(SEED_WORDS))}
+           END || ' ' || (n % 997)
+    FROM seq
+"""
+
+# One benchmarked request. `path` and `body` are functions of the iteration number (and the dataset
+# size), so write routes touch a different row each time and reads spread over months and categories.
+Scenario = namedtuple("Scenario", ["name", "method", "path", "body"])
+
+
+def month_params(i):
+    return f"month={i % 12 + 1}&year={2016 + (i // 12) % 10}"
+
+
+def category(i):
+    return CATEGORIES[i % len(CATEGORIES)]
+
+
+def new_expense(i, rows=None):
+    return {"cost": 10 + i % 90, "date": f"2024-{i % 12 + 1:02d}-15", "category": category(i),
+            "description": "Benchmark"}
+
+
+SCENARIOS = [
+    Scenario("home", "GET", lambda i, rows: "/", None),
+    Scenario("add_expense", "POST", lambda i, rows: "/expense", new_expense),
+    Scenario("bulk_expense", "POST", lambda i, rows: "/bulk_expense",
+             lambda i, rows: [new_expense(i * 10 + j) for j in range(10)]),
+    Scenario("import_ndjson", "POST", lambda i, rows: "/import",
+             lambda i, rows: "\n".join(json.dumps(new_expense(i * 10 + j)) for j in range(10))),
+    Scenario("expenses_month", "GET", lambda i, rows: f"/expenses?{month_params(i)}", None),
+    Scenario("expenses_month_category", "GET", lambda i, rows: f"/expenses?{month_params(i)}&category={category(i)}",
+             None),
+    Scenario("expenses_page", "GET", lambda i, rows: f"/expenses?{month_params(i)}&limit=50&order=date", None),
+    Scenario("expenses_stream", "GET", lambda i, rows: f"/expenses?{month_params(i)}&stream=1", None),
+    Scenario("search", "GET", lambda i, rows: f"/expenses?q={SEED_WORDS[i % len(SEED_WORDS)].split()[0]}&limit=50",
+             None),
+    Scenario("search_filtered", "GET", lambda i, rows: f"/expenses?q=gr*&{month_params(i)}&category={category(i)}",
+             None),
+    Scenario("summary", "GET", lambda i, rows: f"/summary?{month_params(i)}", None),
+    Scenario("totals", "GET", lambda i, rows: f"/totals?start={2016 + i % 9}-02-10&end={2017 + i % 9}-03-20", None),
+    Scenario("trends", "GET", lambda i, rows: f"/trends?start={2016 + i % 9}-01-01&end={2017 + i % 9}-12-31"
+                                              f"&period=month&window=3&deltas=1", None),
+    Scenario("dashboard", "GET", lambda i, rows: f"/dashboard?{month_params(i)}&category={category(i)}", None),
+    Scenario("export_csv", "GET", lambda i, rows: f"/export?start={2016 + i % 10}-{i % 12 + 1:02d}-01"
+                                                  f"&end={2016 + i % 10}-{i % 12 + 1:02d}-28", None),
+    Scenario("get_expense", "GET", lambda i, rows: f"/expense/{rows // 3 + i}", None),
+    Scenario("update_expense", "PUT", lambda i, rows: f"/expense/{rows // 2 + i}", new_expense),
+    Scenario("delete_expense", "DELETE", lambda i, rows: f"/expense/{i + 1}", None),
+    Scenario("patch_expense", "PATCH", lambda i, rows: f"/expense/{rows * 17 // 20 + i}",
+             lambda i, rows: {"cost": 20 + i % 50}),
+    Scenario("patch_batch", "PATCH", lambda i, rows: "/expenses",
+             lambda i, rows: [{"id": rows // 4 + (i * 10 + j) % (rows // 4), "cost": 5 + j} for j in range(10)]),
+    Scenario("patch_filtered", "PATCH", lambda i, rows: "/expenses",
+             lambda i, rows: {"filter": {"month": i % 12 + 1, "year": 2016 + (i // 12) % 10, "category": category(i)},
+                              "set": {"description": "Patched"}}),
+    Scenario("bulk_delete", "POST", lambda i, rows: "/bulk_delete",
+             lambda i, rows: {"min_id": rows * 6 // 10 + i * 5, "max_id": rows * 6 // 10 + i * 5 + 4}),
+    Scenario("stats", "GET", lambda i, rows: "/stats", None),
+]
+
+
+def seed_database(db_name, rows, seed=42):
+    """Create a database at db_name holding `rows` deterministic synthetic expenses."""
+    build_db(db_name)
+    conn = get_db_connection(db_name)
+    with conn:
+        # Bulk-load without the rollup and search triggers, then rebuild the rollups and index once
+        for name in ("trg_rollup_insert", "trg_rollup_delete", "trg_rollup_update",
+                     "trg_search_insert", "trg_search_delete", "trg_search_update"):
+            conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+        conn.execute(SEED_QUERY, {"rows": rows, "seed": seed})
+    rebuild_rollups(conn)
+    conn.executescript(ROLLUP_TRIGGERS)
+    if search_available(conn):
+        rebuild_search_index(conn)
+        conn.executescript(SEARCH_TRIGGERS)
+    analyze(conn)
+    conn.close()
+
+
+@contextmanager
+def seeded_app(rows, seed=42, config=None):
+    """An app over a freshly seeded temporary database, removed again on exit."""
+    from routes import close_app, create_app
+
+    directory = tempfile.mkdtemp(prefix="expense-bench-")
+    app = None
+    try:
+        db_name = os.path.join(directory, "bench.db")
+        seed_database(db_name, rows, seed)
+        app = create_app({"DATABASE": db_name, "SLOW_QUERY_LOG": "", **(config or {})})
+        yield app
+    finally:
+        if app is not None:
+            close_app(app)
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+class ClientTransport:
+    """Sends requests through the Flask test client (no sockets, no HTTP parsing)."""
+
+    name = "client"
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, body):
+        kwargs = {"data": body} if isinstance(body, str) else {"json": body}
+        response = self.client.open(path, method=method, **kwargs)
+        response.get_data()  # Drain streamed bodies
+        return response.status_code
+
+    def close(self):
+        pass
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass  # A log line per request would be part of what we measure
+
+
+class HTTPTransport:
+    """Sends requests over a keep-alive session to a threaded WSGI server on a free local port."""
+
+    name = "http"
+
+    def __init__(self, app):
+        self.server = make_server("127.0.0.1", 0, app, threaded=True, request_handler=QuietRequestHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}"
+        self.session = requests.Session()
+        self.session.headers["Accept-Encoding"] = "identity"  # As app.py asks over loopback
+
+    def request(self, method, path, body):
+        kwargs = {"data": body} if isinstance(body, str) else {"json": body}
+        return self.session.request(method, self.base_url + path, **kwargs).status_code
+
+    def close(self):
+        self.session.close()
+        self.server.shutdown()
+        self.thread.join()
+
+
+TRANSPORTS = {"client": ClientTransport, "http": HTTPTransport}
+
+
+def summarize(latencies, elapsed, errors):
+    """Latency percentiles (milliseconds) and throughput for one scenario."""
+    cuts = statistics.quantiles(latencies, n=100, method="inclusive") if len(latencies) > 1 else latencies * 99
+    return {
+        "count": len(latencies),
+        "errors": errors,
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 3),
+        "p50_ms": round(cuts[49] * 1000, 3),
+        "p95_ms": round(cuts[94] * 1000, 3),
+        "p99_ms": round(cuts[98] * 1000, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else None,
+    }
+
+
+def run_scenario(transport, scenario, rows, iterations, warmup, first=0):
+    """Time `iterations` sequential requests of one scenario after `warmup` untimed ones.
+
+    Iteration numbers start at `first`, so runs over the same database touch different rows.
+    """
+    for i in range(first, first + warmup):
+        transport.request(scenario.method, scenario.path(i, rows), scenario.body and scenario.body(i, rows))
+
+    latencies, errors = [], 0
+    started = time.perf_counter()
+    for i in range(first + warmup, first + warmup + iterations):
+        path, body = scenario.path(i, rows), scenario.body and scenario.body(i, rows)
+        begin = time.perf_counter()
+        status = transport.request(scenario.method, path, body)
+        latencies.append(time.perf_counter() - begin)
+        errors += status >= 400
+    return summarize(latencies, time.perf_counter() - started, errors)
+
+
+def run_benchmarks(sizes=("10k",), transports=("client",), scenarios=None, iterations=DEFAULT_ITERATIONS,
+                   warmup=DEFAULT_WARMUP, seed=42, log=print):
+    """Run the selected scenarios. Returns {size: {transport: {scenario: summary}}}."""
+    selected = [scenario for scenario in SCENARIOS if not scenarios or scenario.name in scenarios]
+    results = {}
+    for size in sizes:
+        rows = DATASET_SIZES[size]
+        log(f"Seeding {rows:,} rows...")
+        with seeded_app(rows, seed) as app:
+            for run, transport_name in enumerate(transports):
+                transport = TRANSPORTS[transport_name](app)
+                try:
+                    for scenario in selected:
+                        summary = run_scenario(transport, scenario, rows, iterations, warmup,
+                                               first=run * (warmup + iterations))
+                        results.setdefault(size, {}).setdefault(transport_name, {})[scenario.name] = summary
+                        log(f"{size:>4} {transport_name:<6} {scenario.name:<24} p50 {summary['p50_ms']:>8.2f} ms  "
+                            f"p95 {summary['p95_ms']:>8.2f} ms  p99 {summary['p99_ms']:>8.2f} ms  "
+                            f"{summary['throughput_rps']:>8} req/s" + (f"  {summary['errors']} errors"
+                                                                       if summary['errors'] else ""))
+                finally:
+                    transport.close()
+    return results
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD, min_regression_ms=MIN_REGRESSION_MS):
+    """List the scenarios whose p95 regressed past the threshold, or that now return errors."""
+    regressions = []
+    for size, transports in results.items():
+        for transport, scenarios in transports.items():
+            for name, summary in scenarios.items():
+                if summary["errors"]:
+                    regressions.append(f"{size}/{transport}/{name}: {summary['errors']} failed requests")
+                expected = baseline.get(size, {}).get(transport, {}).get(name)
+                if expected is None:
+                    continue
+                limit = max(expected["p95_ms"] * (1 + threshold), expected["p95_ms"] + min_regression_ms)
+                if summary["p95_ms"] > limit:
+                    regressions.append(f"{size}/{transport}/{name}: p95 {summary['p95_ms']:.2f} ms "
+                                       f"vs baseline {expected['p95_ms']:.2f} ms (limit {limit:.2f} ms)")
+    return regressions
+
+
+def load_baseline(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_baseline(path, results):
+    # Merges into the existing file, so sizes and transports can be recorded separately
+    baseline = load_baseline(path)
+    for size, transports in results.items():
+        for transport, scenarios in transports.items():
+            baseline.setdefault(size, {})[transport] = {
+                name: {key: summary[key] for key in ("p50_ms", "p95_ms", "p99_ms", "throughput_rps")}
+                for name, summary in scenarios.items()}
+    with open(path, "w") as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark every Expense Tracker route on seeded data")
+    parser.add_argument("--rows", nargs="+", choices=DATASET_SIZES, default=["10k"], help="dataset sizes")
+    parser.add_argument("--transport", nargs="+", choices=TRANSPORTS, default=["client", "http"])
+    parser.add_argument("--scenario", nargs="+", choices=[scenario.name for scenario in SCENARIOS],
+                        help="only these routes (default: all)")
+    parser.add_argument("--iterations", type=int, default=DEFAULT_ITERATIONS)
+    parser.add_argument("--warmup", type=int, default=DEFAULT_WARMUP)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed p95 slowdown over the baseline, as a fraction (default 0.5)")
+    parser.add_argument("--save-baseline", action="store_true", help="record these results as the baseline")
+    parser.add_argument("--json", help="also write the full results to this file")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.rows, args.transport, args.scenario, args.iterations, args.warmup, args.seed)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        save_baseline(args.baseline, results)
+        print(f"Baseline saved to {args.baseline}")
+        sys.exit(0)
+
+    regressions = compare(results, load_baseline(args.baseline), args.threshold)
+    for regression in regressions:
+        print("REGRESSION", regression)
+    sys.exit(1 if regressions else 0)
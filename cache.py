@@ -0,0 +1,108 @@
+import threading
+from collections import OrderedDict, namedtuple
+
+# A cached response body plus the partition it was computed from. `months` is a frozenset of
+# (year, month) pairs or None for "every month"; `category` is None for "every category".
+CacheEntry = namedtuple("CacheEntry", ["body", "mimetype", "size", "months", "category"])
+
+
+class ResponseCache:
+    """A bounded LRU of serialized responses, invalidated precisely by (year, month) and category.
+
+    Entries are tied to the data version they were computed at. A version the cache did not see
+    arrive through invalidate() (a write from another process, for example) clears everything,
+    and entries computed before the latest known write are never stored.
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=32 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._version = None
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0, "rejected": 0}
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0 and self.max_bytes > 0
+
+    def get(self, key, version):
+        """Return the CacheEntry for key if it is still valid at `version`, else None."""
+        with self._lock:
+            self._sync(version)
+            entry = self._entries.get(key)
+            if entry is None:
+                self._counters["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters["hits"] += 1
+            return entry
+
+    def put(self, key, body, mimetype, version, months=None, category=None):
+        """Store a response computed at `version`, evicting least recently used entries to fit."""
+        size = len(body)
+        with self._lock:
+            if size > self.max_bytes or (self._version is not None and version < self._version):
+                self._counters["rejected"] += 1
+                return
+            self._sync(version)
+
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old.size
+            self._entries[key] = CacheEntry(body, mimetype, size, months, category)
+            self._bytes += size
+
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.size
+                self._counters["evictions"] += 1
+
+    def invalidate(self, partitions, version):
+        """Drop entries overlapping any (year, month, category) touched by a write committed at `version`."""
+        with self._lock:
+            if self._version is None or version > self._version + 1:
+                # Writes we were not told about happened in between; nothing cached can be trusted
+                self._clear()
+                self._version = version
+                return
+            self._version = max(self._version, version)
+
+            for key, entry in list(self._entries.items()):
+                if any(self._overlaps(entry, *partition) for partition in partitions):
+                    del self._entries[key]
+                    self._bytes -= entry.size
+                    self._counters["invalidations"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._clear()
+
+    def stats(self):
+        """Report size and hit/miss/eviction counters."""
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hit_rate": round(self._counters["hits"] / lookups, 4) if lookups else 0,
+                **self._counters,
+            }
+
+    @staticmethod
+    def _overlaps(entry, year, month, category):
+        return ((entry.months is None or (year, month) in entry.months)
+                and (entry.category is None or entry.category == category))
+
+    def _sync(self, version):
+        # A newer version than we know about means someone else wrote: start over at that version
+        if self._version is None or version > self._version:
+            self._clear()
+            self._version = version
+
+    def _clear(self):
+        self._entries.clear()
+        self._bytes = 0
@@ -0,0 +1,276 @@
+import sqlite3
+import threading
+import time
+from datetime import date
+
+try:
+    import numpy as np
+except ImportError:  # Without NumPy every aggregation is answered by SQL
+    np = None
+
+from database import CATEGORIES, get_data_version
+
+CATEGORY_CODES = {name: code for code, name in enumerate(CATEGORIES)}  # uint8 codes, in CHECK-list order
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+DAY_BIAS = 2 ** 31  # Makes day numbers before 1970 non-negative inside the (category, day) sort key
+
+DELTA_LIMIT = 4096    # Pending changes kept beside the sorted base before it is rebuilt
+RELOAD_GRACE = 0.5    # Seconds the store may trail the database (a local write still applying) before reloading
+
+# Cents and day numbers are computed the same way as the rollup triggers, so both agree to the cent
+LOAD_QUERY = f"""
+    SELECT id, CAST(ROUND(cost * 100) AS INTEGER), CAST(julianday(date) - 2440587.5 AS INTEGER),
+           CASE category {" ".join(f"WHEN '{name}' THEN {code}" for name, code in CATEGORY_CODES.items())} END
+    FROM expenses
+    WHERE julianday(date) IS NOT NULL
+"""
+
+
+def day_number(text):
+    """Days since 1970-01-01 for a YYYY-MM-DD string."""
+    return date.fromisoformat(text).toordinal() - EPOCH_ORDINAL
+
+
+class ColumnarStore:
+    """An in-memory, columnar copy of the expenses table for vectorized aggregations.
+
+    The base columns (int64 ids and cents, int32 day numbers, uint8 category codes) are sorted by
+    category, then day, next to a running sum of cents, so the totals of every category over any date
+    range take one vectorized binary search for the range bounds and a subtraction. Writes since the last rebuild are kept as a small
+    list of signed adjustments that queries add in; past DELTA_LIMIT the base is rebuilt.
+
+    Like the response cache, the store is tied to the data version. Changes are applied in version
+    order (one that commits ahead of its predecessor waits for it), and a version that never arrives
+    (a write from another process) makes the next sync() reload from SQLite. Given `connect`, a callable
+    returning a new connection, that reload runs on a background thread and requests use SQL until it
+    is done; without it, sync() reloads inline.
+    """
+
+    def __init__(self, connect=None):
+        self.version = None
+        self.stale = True
+        self._connect = connect
+        self._lock = threading.RLock()
+        self._loading = False
+        self._loaded_version = None
+        self._waiting = {}  # version -> changes that committed ahead of an earlier version
+        self._lag_since = None
+        self._counters = {"loads": 0, "applied": 0, "compactions": 0, "fallbacks": 0}
+        if self.enabled:
+            self._build([], [], [], [])
+
+    @property
+    def enabled(self):
+        return np is not None
+
+    def load(self, conn):
+        """Replace the store's contents with the expenses table, read from one snapshot.
+
+        Queries keep using the current contents while the rows are read; writes applied meanwhile wait
+        and are replayed on top of the snapshot.
+        """
+        with self._lock:
+            self._loading = True
+        try:
+            conn.execute("BEGIN")  # Rows and version must come from the same read transaction
+            try:
+                version = get_data_version(conn)
+                rows = conn.execute(LOAD_QUERY).fetchall()
+            finally:
+                conn.rollback()
+            columns = np.array(rows, dtype=np.int64).reshape(-1, 4).T
+            with self._lock:
+                self._build(*columns)
+                self.version = self._loaded_version = version
+                self.stale = False
+                self._lag_since = None
+                self._waiting = {v: changes for v, changes in self._waiting.items() if v > version}
+                self._counters["loads"] += 1
+                self._drain()
+        finally:
+            with self._lock:
+                self._loading = False
+
+    def sync(self, conn):
+        """Make sure the store matches the database. Returns False when the caller should use SQL."""
+        version = get_data_version(conn)
+        with self._lock:
+            if self._loading:
+                self._counters["fallbacks"] += 1
+                return False
+            if not self.stale and self.version == version:
+                self._lag_since = None
+                return True
+            if not self.stale and self.version < version:
+                # Usually a local write that has committed but not been applied yet: give it a moment
+                now = time.monotonic()
+                if self._lag_since is None:
+                    self._lag_since = now
+                if now - self._lag_since < RELOAD_GRACE:
+                    self._counters["fallbacks"] += 1
+                    return False
+            self._loading = True  # Claimed here, so concurrent requests fall back instead of loading too
+            if self._connect is not None:
+                threading.Thread(target=self._reload, name="columnar-reload", daemon=True).start()
+                self._counters["fallbacks"] += 1
+                return False
+        self.load(conn)
+        return True
+
+    def _reload(self):
+        # A background load on a connection of its own; a failure leaves the store to the next sync()
+        try:
+            conn = self._connect()
+            try:
+                self.load(conn)
+            finally:
+                conn.close()
+        except sqlite3.Error:
+            with self._lock:
+                self._loading = False
+
+    def apply(self, version, upserts=(), deletes=()):
+        """Apply one committed write: `upserts` are (id, cost, date, category) rows, `deletes` are ids."""
+        if version is None:
+            return  # Nothing changed
+        try:
+            changes = [(expense_id, None) for expense_id in deletes]
+            changes += [(expense_id, (day_number(day), int(cost * 100 + 0.5), CATEGORY_CODES[category]))
+                        for expense_id, cost, day, category in upserts]
+        except (KeyError, TypeError, ValueError):
+            self.mark_stale()  # A value SQLite accepted but we cannot place: reload instead
+            return
+
+        with self._lock:
+            if self._loading:
+                if len(self._waiting) < DELTA_LIMIT:
+                    self._waiting.setdefault(version, []).extend(changes)
+                return  # Replayed after the load unless the snapshot already has it
+            if self.stale or version <= self._loaded_version:
+                return  # The next load reads it, or the last one already did
+            # Writes batched into one transaction share a version, so `version == self.version` is in
+            # order too. Each change is applied against the row's current value in the store.
+            if self.version <= version <= self.version + 1:
+                self._apply_changes(version, changes)
+                self._drain()
+            elif version > self.version + 1 and len(self._waiting) < DELTA_LIMIT:
+                self._waiting.setdefault(version, []).extend(changes)
+            else:
+                self.stale = True  # Arrived after a later version was applied
+
+    def mark_stale(self):
+        """Force a reload on the next sync()."""
+        with self._lock:
+            self.stale = True
+
+    def category_totals(self, start, end, category=None):
+        """Total cents and row count per category for dates in [start, end] (datetime.date, inclusive).
+
+        Returns {category: (cents, count)} for the categories with at least one row.
+        """
+        first, last = start.toordinal() - EPOCH_ORDINAL, end.toordinal() - EPOCH_ORDINAL
+        codes = np.array([CATEGORY_CODES[category]] if category is not None else range(len(CATEGORIES)),
+                         dtype=np.int64)
+        with self._lock:
+            cents = np.zeros(len(CATEGORIES), dtype=np.int64)
+            counts = np.zeros(len(CATEGORIES), dtype=np.int64)
+            a = np.searchsorted(self._keys, (codes << 32) + first + DAY_BIAS, side="left")
+            b = np.searchsorted(self._keys, (codes << 32) + last + DAY_BIAS, side="right")
+            cents[codes] = self._cumsum[b] - self._cumsum[a]
+            counts[codes] = b - a
+
+            if self._adjustments:
+                adj_days, adj_cents, adj_cats, adj_signs = self._adjustment_arrays()
+                mask = (adj_days >= first) & (adj_days <= last)
+                if category is not None:
+                    mask &= adj_cats == codes[0]
+                # float64 weights are exact for sums of cents below 2**53
+                size = len(CATEGORIES)
+                cents += np.bincount(adj_cats[mask], adj_cents[mask] * adj_signs[mask], size).astype(np.int64)
+                counts += np.bincount(adj_cats[mask], adj_signs[mask], size).astype(np.int64)
+
+        return {CATEGORIES[code]: (int(cents[code]), int(counts[code])) for code in codes.tolist() if counts[code] > 0}
+
+    def stats(self):
+        """Report size, freshness and load/apply counters."""
+        with self._lock:
+            return {
+                "rows": self._rows,
+                "version": self.version,
+                "stale": self.stale,
+                "pending": len(self._adjustments),
+                "waiting": len(self._waiting),
+                **self._counters,
+            }
+
+    def _build(self, ids, cents, days, categories):
+        # Sorts the base columns by (category, day) and precomputes what range queries need
+        ids = np.asarray(ids, dtype=np.int64)
+        categories = np.asarray(categories, dtype=np.uint8)
+        days = np.asarray(days, dtype=np.int32)
+        order = np.lexsort((days, categories))
+        self._ids = ids[order]
+        self._cents = np.asarray(cents, dtype=np.int64)[order]
+        self._days = days[order]
+        self._categories = categories[order]
+        self._keys = (self._categories.astype(np.int64) << 32) + self._days.astype(np.int64) + DAY_BIAS
+        self._cumsum = np.concatenate(([0], np.cumsum(self._cents)))
+        self._rows = len(self._ids)
+        self._id_order = np.argsort(self._ids)
+        self._sorted_ids = self._ids[self._id_order]
+        self._overrides = {}      # id -> (day, cents, code) for rows changed since the build, None if deleted
+        self._adjustments = []    # (day, cents, code, +1/-1) for every change since the build
+        self._adjustment_columns = None
+
+    def _current(self, expense_id):
+        # The row's (day, cents, code) as the store currently sees it, or None
+        if expense_id in self._overrides:
+            return self._overrides[expense_id]
+        i = np.searchsorted(self._sorted_ids, expense_id)
+        if i == len(self._sorted_ids) or self._sorted_ids[i] != expense_id:
+            return None
+        p = self._id_order[i]
+        return int(self._days[p]), int(self._cents[p]), int(self._categories[p])
+
+    def _apply_changes(self, version, changes):
+        for expense_id, new in changes:
+            old = self._current(expense_id)
+            if old is not None:
+                self._adjustments.append((*old, -1))
+                self._rows -= 1
+            if new is not None:
+                self._adjustments.append((*new, 1))
+                self._rows += 1
+            self._overrides[expense_id] = new
+        self._adjustment_columns = None
+        self.version = version
+        self._counters["applied"] += 1
+        if len(self._adjustments) > DELTA_LIMIT:
+            self._compact()
+
+    def _drain(self):
+        # Applies waiting changes that are now in order
+        while True:
+            for version in (self.version, self.version + 1):
+                if version in self._waiting:
+                    self._apply_changes(version, self._waiting.pop(version))
+                    break
+            else:
+                return
+
+    def _adjustment_arrays(self):
+        if self._adjustment_columns is None:
+            adj = np.array(self._adjustments, dtype=np.int64).reshape(-1, 4).T
+            self._adjustment_columns = (adj[0], adj[1], adj[2].astype(np.intp), adj[3])
+        return self._adjustment_columns
+
+    def _compact(self):
+        # Folds the pending changes into a rebuilt base
+        changed = np.fromiter(self._overrides, dtype=np.int64, count=len(self._overrides))
+        keep = ~np.isin(self._ids, changed)
+        live = [(expense_id, *new) for expense_id, new in self._overrides.items() if new is not None]
+        extra = np.array(live, dtype=np.int64).reshape(-1, 4).T
+        self._build(np.concatenate((self._ids[keep], extra[0])), np.concatenate((self._cents[keep], extra[2])),
+                    np.concatenate((self._days[keep], extra[1])),
+                    np.concatenate((self._categories[keep], extra[3])))
+        self._counters["compactions"] += 1
@@ -1,37 +1,564 @@
+import argparse
+import asyncio
+import contextvars
+import os
+import queue
 import sqlite3
+import threading
+import time
+import weakref
+from collections import namedtuple
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from functools import partial
+from contextlib import contextmanager
+
+from profiler import ProfiledConnection
 
 DB_NAME = 'expense_tracker.db'
 
-def get_db_connection():
-    """Establish and return a connection to the SQLite database."""
-    conn = sqlite3.connect(DB_NAME)
+# Allowed expense categories (enforced by the CHECK constraint on expenses.category)
+CATEGORIES = ('Rent/Mortgage', 'Utilities', 'Gas', 'Food', 'Entertainment', 'Savings', 'Insurance', 'Other')
+
+# Connection Tuning
+POOL_SIZE = 8                    # Maximum number of open connections per process
+POOL_TIMEOUT = 5.0               # Seconds to wait for a free connection before giving up
+BUSY_TIMEOUT_MS = 5000           # How long SQLite retries when another writer holds the lock
+CACHE_SIZE_KB = 16384            # Page cache per connection (16 MiB)
+MMAP_SIZE = 256 * 1024 * 1024    # Memory-mapped I/O window (256 MiB)
+ANALYSIS_LIMIT = 1000            # Rows ANALYZE samples per index, so it stays fast on large tables
+
+# Group Commit
+GROUP_COMMIT_MAX_BATCH = 256     # Most writes committed in one transaction
+GROUP_COMMIT_MAX_WAIT_MS = 2     # Longest the writer waits for more writes before committing
+GROUP_COMMIT_TIMEOUT = 30.0      # Seconds a caller waits for its write to commit before giving up
+
+# Outcome of one write statement: the new row id, affected rows, any RETURNING rows and the data
+# version its transaction committed (None when nothing changed)
+WriteResult = namedtuple("WriteResult", ["lastrowid", "rowcount", "rows", "version"])
+
+
+# Pools and writers alive in this process, so a forked child can replace what it inherited
+_live = weakref.WeakSet()
+
+
+def get_db_connection(db_name=None, profiler=None):
+    """Establish and return a new, tuned connection to the SQLite database.
+
+    Statements on it are reported to `profiler` (a profiler.QueryProfiler) when one is given.
+    """
+    # uri=True lets queries ATTACH archive files by read-only file: URIs (plain paths open as before)
+    conn = sqlite3.connect(db_name or DB_NAME, timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=False, uri=True,
+                           factory=ProfiledConnection if profiler is not None else sqlite3.Connection)
     conn.row_factory = sqlite3.Row  # Allows accessing columns by name
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KB}")
+    conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    if profiler is not None:
+        conn.profiler = profiler
     return conn
 
-def build_db():
-    """Create the expenses table if it does not exist."""
-    conn = get_db_connection()
+
+class ConnectionPool:
+    """A bounded pool of long-lived, tuned SQLite connections shared by all request threads."""
+
+    def __init__(self, db_name=None, size=POOL_SIZE, timeout=POOL_TIMEOUT, profiler=None):
+        self.db_name = db_name or DB_NAME
+        self.size = size
+        self.timeout = timeout
+        self.profiler = profiler
+        self._closed = False
+        self._counters = {"checkouts": 0, "waits": 0, "timeouts": 0, "discarded": 0}
+        self._reset()
+        _live.add(self)
+
+    def _reset(self):
+        # Start with no connections (in a forked child, abandoning the parent's without closing them)
+        self._idle = queue.LifoQueue()  # LIFO keeps the hottest connections (and their page caches) in use
+        self._lock = threading.Lock()
+        self._open = 0
+
+    def acquire(self):
+        """Check out an idle connection, opening a new one while under the size limit."""
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = None
+
+        if conn is None:
+            with self._lock:
+                can_open = self._open < self.size
+                if can_open:
+                    self._open += 1
+            if can_open:
+                try:
+                    conn = get_db_connection(self.db_name, self.profiler)
+                except sqlite3.Error:
+                    with self._lock:
+                        self._open -= 1
+                    raise
+            else:
+                with self._lock:
+                    self._counters["waits"] += 1
+                try:
+                    conn = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    with self._lock:
+                        self._counters["timeouts"] += 1
+                    raise sqlite3.OperationalError("Timed out waiting for a database connection")
+
+        with self._lock:
+            self._counters["checkouts"] += 1
+        return conn
+
+    def release(self, conn):
+        """Return a connection to the pool, discarding it if it is no longer usable."""
+        try:
+            if conn.in_transaction:
+                conn.rollback()  # Never hand out a connection with someone else's open transaction
+        except sqlite3.Error:
+            self._discard(conn)
+            return
+        if self._closed:
+            self._discard(conn)
+            return
+        self._idle.put(conn)
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        with self._lock:
+            self._open -= 1
+            self._counters["discarded"] += 1
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection for the duration of a with block."""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close(self):
+        """Close every idle connection. Connections still checked out are closed on release."""
+        self._closed = True
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
+
+    def stats(self):
+        """Report pool size and health counters."""
+        with self._lock:
+            idle = self._idle.qsize()
+            return {
+                "size": self.size,
+                "open": self._open,
+                "idle": idle,
+                "in_use": self._open - idle,
+                **self._counters,
+            }
+
+
+class WriteQueue:
+    """Funnels writes through a single writer thread that commits them in batches (group commit).
+
+    Callers block in submit() until the batch holding their statement commits, so each still gets its
+    own row id or error, but many concurrent writers share one transaction and one write lock.
+    """
+
+    def __init__(self, db_name=None, max_batch=GROUP_COMMIT_MAX_BATCH, max_wait_ms=GROUP_COMMIT_MAX_WAIT_MS,
+                 timeout=GROUP_COMMIT_TIMEOUT, profiler=None):
+        self.db_name = db_name or DB_NAME
+        self.max_batch = max_batch
+        self.max_wait_ms = max_wait_ms
+        self.timeout = timeout
+        self.profiler = profiler
+        self._counters = {"writes": 0, "batches": 0, "errors": 0, "largest_batch": 0}
+        self._reset()
+        _live.add(self)
+
+    def _reset(self):
+        # Start with an empty queue and no writer thread (a forked child does not inherit the parent's)
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def submit(self, query, params=()):
+        """Queue one write and wait for it to commit. Returns a WriteResult or raises the statement's error
+        (sqlite3.OperationalError if it has not committed within the timeout)."""
+        future = Future()
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():  # Not started yet, or lost to an error
+                self._thread = threading.Thread(target=self._run, name="group-commit-writer", daemon=True)
+                self._thread.start()
+        self._queue.put((query, params, future))
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            raise sqlite3.OperationalError("Timed out waiting for the group-commit writer") from None
+
+    def stop(self):
+        """Commit whatever is queued, then stop the writer thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+    def _run(self):
+        batch = []
+        try:
+            conn = get_db_connection(self.db_name, self.profiler)
+            conn.isolation_level = None  # The writer manages its own transactions
+            running = True
+            while running:
+                item = self._queue.get()
+                if item is None:
+                    break
+
+                # Gather more writes until the batch is full or the wait budget is spent
+                batch = [item]
+                deadline = time.monotonic() + self.max_wait_ms / 1000
+                while len(batch) < self.max_batch:
+                    try:
+                        item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        running = False
+                        break
+                    batch.append(item)
+
+                self._commit_batch(conn, batch)
+                batch = []
+            conn.close()
+        except BaseException as e:
+            # The thread is ending on an error: fail the batch it held and everything still queued, so no
+            # caller waits on it; the next submit() starts a new writer
+            self._fail(batch, e)
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not None:
+                    self._fail([item], e)
+            raise
+
+    @staticmethod
+    def _fail(batch, error):
+        for _, _, future in batch:
+            if not future.done():
+                future.set_exception(error)
+
+    def _commit_batch(self, conn, batch):
+        outcomes = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for query, params, future in batch:
+                try:
+                    cursor = conn.execute(query, params)
+                    rows = cursor.fetchall()
+                    outcomes.append((future, WriteResult(cursor.lastrowid, cursor.rowcount, rows, None)))
+                except Exception as e:
+                    # A failed statement (or one whose parameters could not be bound) only undoes itself,
+                    # unless SQLite had to abandon the transaction
+                    if not conn.in_transaction:
+                        raise
+                    outcomes.append((future, e))
+            if any(not isinstance(outcome, Exception) and outcome.rowcount > 0 for _, outcome in outcomes):
+                version = bump_data_version(conn)  # Once per batch, not per write
+                outcomes = [(future, outcome if isinstance(outcome, Exception) or outcome.rowcount <= 0
+                             else outcome._replace(version=version)) for future, outcome in outcomes]
+            conn.execute("COMMIT")
+        except Exception as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            outcomes = [(future, e) for _, _, future in batch]
+
+        errors = sum(isinstance(outcome, Exception) for _, outcome in outcomes)
+        with self._lock:
+            self._counters["writes"] += len(batch)
+            self._counters["batches"] += 1
+            self._counters["errors"] += errors
+            self._counters["largest_batch"] = max(self._counters["largest_batch"], len(batch))
+
+        for future, outcome in outcomes:
+            if isinstance(outcome, Exception):
+                future.set_exception(outcome)
+            else:
+                future.set_result(outcome)
+
+    def stats(self):
+        """Report queue depth and batching counters."""
+        with self._lock:
+            batches = self._counters["batches"]
+            return {
+                "pending": self._queue.qsize(),
+                "average_batch": round(self._counters["writes"] / batches, 2) if batches else 0,
+                **self._counters,
+            }
+
+
+def reset_after_fork():
+    """Give a forked worker process its own connections and writer threads.
+
+    Connections and threads inherited from the parent must not be used (or closed) in the child, so
+    every pool and writer is emptied in place and opens fresh ones on first use.
+    """
+    for resource in list(_live):
+        resource._reset()
+
+
+os.register_at_fork(after_in_child=reset_after_fork)
+
+
+def bump_data_version(conn):
+    """Advance the data version inside the caller's write transaction and return the new version."""
+    return conn.execute("UPDATE data_version SET version = version + 1 WHERE id = 1 RETURNING version").fetchone()[0]
+
+
+def get_data_version(conn):
+    """Return the current data version; it changes whenever a write path commits."""
+    row = conn.execute("SELECT version FROM data_version WHERE id = 1").fetchone()
+    return row[0] if row else 0
+
+
+class AsyncDatabase:
+    """Async access to the connection pool for the ASGI server.
+
+    Blocking SQLite work runs on a bounded thread executor, so the event loop can hold thousands of
+    idle keep-alive clients while at most `max_workers` statements run at once.
+    """
+
+    def __init__(self, max_workers=POOL_SIZE):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sqlite")
+
+    async def run(self, fn, *args, **kwargs):
+        """Run a blocking function (typically one that borrows a pooled connection) off the event loop.
+
+        Like asyncio.to_thread, it runs in a copy of the caller's context, so context variables such as
+        the current request's metrics timings carry over to the executor thread.
+        """
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(self._executor, partial(context.run, fn, *args, **kwargs))
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+
+# Monthly per-category totals, maintained by triggers so /summary is a primary-key lookup.
+# Totals are kept in integer cents so repeated add/subtract never drifts.
+ROLLUP_TRIGGERS = """
+    CREATE TRIGGER IF NOT EXISTS trg_rollup_insert AFTER INSERT ON expenses
+    BEGIN
+        INSERT INTO expense_rollups (year, month, category, total_cents, count)
+        SELECT CAST(strftime('%Y', NEW.date) AS INTEGER), CAST(strftime('%m', NEW.date) AS INTEGER),
+               NEW.category, CAST(ROUND(NEW.cost * 100) AS INTEGER), 1
+        WHERE strftime('%Y', NEW.date) IS NOT NULL
+        ON CONFLICT (year, month, category) DO UPDATE
+        SET total_cents = total_cents + excluded.total_cents, count = count + 1;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_rollup_delete AFTER DELETE ON expenses
+    BEGIN
+        UPDATE expense_rollups
+        SET total_cents = total_cents - CAST(ROUND(OLD.cost * 100) AS INTEGER), count = count - 1
+        WHERE year = CAST(strftime('%Y', OLD.date) AS INTEGER) AND month = CAST(strftime('%m', OLD.date) AS INTEGER)
+          AND category = OLD.category;
+        DELETE FROM expense_rollups
+        WHERE year = CAST(strftime('%Y', OLD.date) AS INTEGER) AND month = CAST(strftime('%m', OLD.date) AS INTEGER)
+          AND category = OLD.category AND count = 0;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_rollup_update AFTER UPDATE OF cost, date, category ON expenses
+    BEGIN
+        UPDATE expense_rollups
+        SET total_cents = total_cents - CAST(ROUND(OLD.cost * 100) AS INTEGER), count = count - 1
+        WHERE year = CAST(strftime('%Y', OLD.date) AS INTEGER) AND month = CAST(strftime('%m', OLD.date) AS INTEGER)
+          AND category = OLD.category;
+        DELETE FROM expense_rollups
+        WHERE year = CAST(strftime('%Y', OLD.date) AS INTEGER) AND month = CAST(strftime('%m', OLD.date) AS INTEGER)
+          AND category = OLD.category AND count = 0;
+        INSERT INTO expense_rollups (year, month, category, total_cents, count)
+        SELECT CAST(strftime('%Y', NEW.date) AS INTEGER), CAST(strftime('%m', NEW.date) AS INTEGER),
+               NEW.category, CAST(ROUND(NEW.cost * 100) AS INTEGER), 1
+        WHERE strftime('%Y', NEW.date) IS NOT NULL
+        ON CONFLICT (year, month, category) DO UPDATE
+        SET total_cents = total_cents + excluded.total_cents, count = count + 1;
+    END;
+"""
+
+
+# Full-text search over descriptions: an external-content FTS5 index (the text itself lives only in
+# expenses) kept in step by triggers. FTS5 'delete' commands need the old text, which OLD supplies.
+SEARCH_TRIGGERS = """
+    CREATE TRIGGER IF NOT EXISTS trg_search_insert AFTER INSERT ON expenses
+    BEGIN
+        INSERT INTO expenses_fts (rowid, description) VALUES (NEW.id, NEW.description);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_search_delete AFTER DELETE ON expenses
+    BEGIN
+        INSERT INTO expenses_fts (expenses_fts, rowid, description) VALUES ('delete', OLD.id, OLD.description);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_search_update AFTER UPDATE OF description ON expenses
+    BEGIN
+        INSERT INTO expenses_fts (expenses_fts, rowid, description) VALUES ('delete', OLD.id, OLD.description);
+        INSERT INTO expenses_fts (rowid, description) VALUES (NEW.id, NEW.description);
+    END;
+"""
+
+
+def rebuild_rollups(conn):
+    """Recompute expense_rollups from the expenses table (backfill or repair)."""
+    with conn:
+        conn.execute("DELETE FROM expense_rollups")
+        conn.execute("""
+            INSERT INTO expense_rollups (year, month, category, total_cents, count)
+            SELECT CAST(strftime('%Y', date) AS INTEGER), CAST(strftime('%m', date) AS INTEGER), category,
+                   SUM(CAST(ROUND(cost * 100) AS INTEGER)), COUNT(*)
+            FROM expenses
+            WHERE strftime('%Y', date) IS NOT NULL
+            GROUP BY 1, 2, 3
+        """)
+
+
+def search_available(conn):
+    """Whether the database has the expenses_fts search index (SQLite may be built without FTS5)."""
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'expenses_fts'").fetchone() is not None
+
+
+def rebuild_search_index(conn):
+    """Re-index every description from the expenses table (backfill or repair) and merge the index."""
+    with conn:
+        conn.execute("INSERT INTO expenses_fts (expenses_fts) VALUES ('rebuild')")
+        conn.execute("INSERT INTO expenses_fts (expenses_fts) VALUES ('optimize')")
+
+
+def analyze(conn):
+    """Refresh the planner statistics (sqlite_stat1), sampling at most ANALYSIS_LIMIT rows per index."""
+    conn.execute(f"PRAGMA analysis_limit = {ANALYSIS_LIMIT}")
+    conn.execute("ANALYZE")
+    conn.commit()
+
+
+def build_db(db_name=None):
+    """Create the expenses table, its indexes and the summary rollups if they do not exist."""
+    conn = get_db_connection(db_name)
     c = conn.cursor()
 
-    c.execute("""
+    category_list = ", ".join(f"'{category}'" for category in CATEGORIES)
+    c.execute(f"""
         CREATE TABLE IF NOT EXISTS expenses (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             cost REAL NOT NULL CHECK (cost > 0),
             date TEXT NOT NULL,
             category TEXT NOT NULL CHECK (category IN (
-                'Rent/Mortgage', 'Utilities', 'Gas', 'Food', 'Entertainment', 'Savings', 'Insurance', 'Other'
+                {category_list}
             )),
             description TEXT
         )
     """)
 
-    # Add Indexing to Speed Up Queries
-    c.execute("CREATE INDEX IF NOT EXISTS idx_expense_date ON expenses(date);")
-    c.execute("CREATE INDEX IF NOT EXISTS idx_expense_category ON expenses(category);")
+    # Indexes designed for the queries in routes.py. The covering pair ends in (id, cost), so listings come
+    # out in (date, id) order without a sort and range aggregates never visit the table:
+    #   idx_expense_date_cover      month and date-range listings, keyset pages, exports, the dashboard
+    #   idx_expense_category_cover  category filters and per-category aggregates (totals, trends)
+    #   idx_expense_category_id     category keyset pages and streams in the default id order (a month
+    #                               in one category is read from the cover and its few rows sorted)
+    c.execute("DROP INDEX IF EXISTS idx_expense_date")
+    c.execute("DROP INDEX IF EXISTS idx_expense_category")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_expense_date_cover ON expenses(date, id, category, cost)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_expense_category_cover ON expenses(category, date, id, cost)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_expense_category_id ON expenses(category, id)")
 
+    # Data Version (a single counter bumped by every write, used for HTTP validators)
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS data_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL
+        )
+    """)
+    c.execute("INSERT OR IGNORE INTO data_version (id, version) VALUES (1, 0)")
+
+    # Monthly Rollups (backfilled the first time they are created)
+    rollups_exist = c.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'expense_rollups'").fetchone()
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS expense_rollups (
+            year INTEGER NOT NULL,
+            month INTEGER NOT NULL,
+            category TEXT NOT NULL,
+            total_cents INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (year, month, category)
+        ) WITHOUT ROWID
+    """)
     conn.commit()
+    c.executescript(ROLLUP_TRIGGERS)
+    if not rollups_exist:
+        rebuild_rollups(conn)
+
+    # Description Search (prefix indexes turn word* queries of 2 to 6 characters into direct lookups)
+    search_exists = search_available(conn)
+    try:
+        c.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS expenses_fts USING fts5(
+                description, content = 'expenses', content_rowid = 'id', prefix = '2 3 4 5 6'
+            )
+        """)
+    except sqlite3.OperationalError:
+        print("SQLite lacks FTS5; description search is disabled.")
+    else:
+        conn.commit()
+        c.executescript(SEARCH_TRIGGERS)
+        if not search_exists:
+            rebuild_search_index(conn)
+
+    # Archive Catalog (closed years moved to per-year files by archive.py; reads attach them by range)
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS archived_years (
+            year INTEGER PRIMARY KEY,
+            file TEXT NOT NULL,
+            rows INTEGER NOT NULL,
+            archived_at TEXT NOT NULL
+        )
+    """)
+
+    conn.commit()
+    analyze(conn)
     conn.close()
     print("Database initialized successfully.")
 
+
 if __name__ == "__main__":
-    build_db()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Expense Tracker database maintenance")
+    parser.add_argument("command", nargs="?", default="init", choices=["init", "rebuild-rollups", "rebuild-search"],
+                        help="init: create tables/indexes and refresh planner statistics (default); "
+                             "rebuild-rollups: recompute monthly summaries; "
+                             "rebuild-search: re-index descriptions for full-text search")
+    args = parser.parse_args()
+
+    build_db()
+    if args.command == "rebuild-rollups":
+        conn = get_db_connection()
+        rebuild_rollups(conn)
+        conn.close()
+        print("Monthly rollups rebuilt.")
+    elif args.command == "rebuild-search":
+        conn = get_db_connection()
+        rebuild_search_index(conn)
+        conn.close()
+        print("Search index rebuilt.")
+
@@ -0,0 +1,121 @@
+import csv
+import io
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet and Arrow exports need pyarrow; CSV does not
+    pa = pq = None
+
+EXPORT_COLUMNS = ("id", "cost", "date", "category", "description")
+CSV_CHUNK_ROWS = 5000        # Rows formatted per yielded CSV chunk
+ROW_GROUP_ROWS = 65536       # Rows per Parquet row group / Arrow record batch
+
+# Format name -> (mimetype, file extension)
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+}
+
+
+def arrow_available():
+    return pa is not None
+
+
+class ChunkSink:
+    """A write-only file object that hands back whatever has been written since the last take()."""
+
+    def __init__(self):
+        self._chunks = []
+        self.closed = False
+        self._position = 0
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def writable(self):
+        return True
+
+    def seekable(self):
+        return False
+
+    def take(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def iter_csv(cursor):
+    """Yield a CSV export (header first) in CSV_CHUNK_ROWS-row chunks straight from the cursor."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    while True:
+        rows = cursor.fetchmany(CSV_CHUNK_ROWS)
+        if not rows:
+            break
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def arrow_schema():
+    return pa.schema([
+        ("id", pa.int64()),
+        ("cost", pa.float64()),
+        ("date", pa.string()),
+        ("category", pa.string()),
+        ("description", pa.string()),
+    ])
+
+
+def iter_record_batches(cursor, schema):
+    # One Arrow record batch per ROW_GROUP_ROWS rows fetched from the cursor
+    while True:
+        rows = cursor.fetchmany(ROW_GROUP_ROWS)
+        if not rows:
+            return
+        columns = zip(*rows)
+        yield pa.RecordBatch.from_arrays([pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+                                         schema=schema)
+
+
+def iter_parquet(cursor):
+    """Yield a Parquet file, one row group per batch, flushing the written bytes after each."""
+    schema = arrow_schema()
+    sink = ChunkSink()
+    with pq.ParquetWriter(sink, schema, compression="zstd") as writer:
+        for batch in iter_record_batches(cursor, schema):
+            writer.write_batch(batch, row_group_size=ROW_GROUP_ROWS)
+            yield sink.take()
+    yield sink.take()  # Footer
+
+
+def iter_arrow(cursor):
+    """Yield an Arrow IPC stream, one record batch at a time."""
+    schema = arrow_schema()
+    sink = ChunkSink()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        for batch in iter_record_batches(cursor, schema):
+            writer.write_batch(batch)
+            yield sink.take()
+    yield sink.take()  # End-of-stream marker
+
+
+EXPORT_WRITERS = {"csv": iter_csv, "parquet": iter_parquet, "arrow": iter_arrow}
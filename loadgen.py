@@ -0,0 +1,291 @@
+"""Concurrent load generator for the Expense Tracker API.
+
+Many clients (threads, or asyncio tasks with aiohttp) replay a weighted mix of writes and reads
+against a server for a fixed duration. Every interval it prints throughput, latency percentiles and
+the error and "database is locked" rates; at the end, per-operation totals and latency histograms.
+
+Run with:  python loadgen.py --url http://127.0.0.1:5000 --clients 32 --duration 30
+           python loadgen.py --seed-rows 100000 --clients 16 --mix add=10,summary=40,dashboard=50
+"""
+import argparse
+import asyncio
+import bisect
+import json
+import random
+import statistics
+import sys
+import threading
+import time
+from collections import deque
+
+import requests
+
+try:
+    import aiohttp
+except ImportError:  # Only --mode asyncio needs it
+    aiohttp = None
+
+from database import CATEGORIES
+
+DEFAULT_MIX = {"add": 20, "bulk": 5, "expenses": 25, "summary": 20, "dashboard": 25, "delete": 5}
+HISTOGRAM_BOUNDS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)  # Upper bounds; the last bucket is open
+LOCKED_MARKER = "database is locked"
+MAX_TRACKED_IDS = 10000   # Ids of rows this run created, kept for the delete operation
+
+
+def random_expense(rng):
+    return {"cost": round(rng.uniform(1, 500), 2), "date": f"{rng.randint(2016, 2025)}-{rng.randint(1, 12):02d}-"
+            f"{rng.randint(1, 28):02d}", "category": rng.choice(CATEGORIES), "description": "Load Test"}
+
+
+def month_query(rng):
+    return f"month={rng.randint(1, 12)}&year={rng.randint(2016, 2025)}"
+
+
+def build_request(op, rng, created_ids):
+    """The (method, path, JSON body) for one operation. Deletes fall back to adds until a row exists."""
+    if op == "delete":
+        try:
+            return "DELETE", f"/expense/{created_ids.popleft()}", None
+        except IndexError:
+            op = "add"
+    if op == "add":
+        return "POST", "/expense", random_expense(rng)
+    if op == "bulk":
+        return "POST", "/bulk_expense", [random_expense(rng) for _ in range(rng.randint(10, 100))]
+    if op == "expenses":
+        filters = [month_query(rng), f"category={rng.choice(CATEGORIES)}"]
+        return "GET", "/expenses?" + "&".join(rng.sample(filters, rng.randint(1, 2))), None
+    if op == "summary":
+        return "GET", f"/summary?{month_query(rng)}", None
+    if op == "dashboard":
+        return "GET", f"/dashboard?{month_query(rng)}&category={rng.choice(CATEGORIES)}", None
+    raise ValueError(f"Unknown operation: {op}")
+
+
+def parse_mix(text):
+    # "add=20,summary=40" -> {"add": 20, "summary": 40}
+    mix = {}
+    for part in text.split(","):
+        op, _, weight = part.partition("=")
+        if op.strip() not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"unknown operation {op!r}; expected {', '.join(DEFAULT_MIX)}")
+        mix[op.strip()] = float(weight)
+    return mix
+
+
+class LoadStats:
+    """Thread-safe latency and outcome counters, per operation and per reporting interval."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.operations = {}
+        self.interval = []
+        self.timeline = []
+
+    def record(self, op, seconds, status, locked):
+        with self._lock:
+            stats = self.operations.setdefault(op, {"latencies": [], "errors": 0, "locked": 0,
+                                                    "histogram": [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)})
+            ms = seconds * 1000
+            stats["latencies"].append(ms)
+            stats["histogram"][bisect.bisect_left(HISTOGRAM_BOUNDS_MS, ms)] += 1
+            error = status is None or status >= 400
+            stats["errors"] += error
+            stats["locked"] += locked
+            self.interval.append((ms, error, locked))
+
+    def close_interval(self, elapsed, length):
+        """Summarize and reset the current interval; returns the summary."""
+        with self._lock:
+            samples, self.interval = self.interval, []
+        summary = {"elapsed_s": round(elapsed, 1), **describe([ms for ms, _, _ in samples], length),
+                   "error_rate": rate(sum(error for _, error, _ in samples), len(samples)),
+                   "locked_rate": rate(sum(locked for _, _, locked in samples), len(samples))}
+        self.timeline.append(summary)
+        return summary
+
+    def totals(self, duration):
+        with self._lock:
+            return {op: {**describe(stats["latencies"], duration), "errors": stats["errors"],
+                         "error_rate": rate(stats["errors"], len(stats["latencies"])),
+                         "locked": stats["locked"], "locked_rate": rate(stats["locked"], len(stats["latencies"])),
+                         "histogram": dict(zip(histogram_labels(), stats["histogram"]))}
+                    for op, stats in sorted(self.operations.items())}
+
+
+def rate(count, total):
+    return round(count / total, 4) if total else 0.0
+
+
+def describe(latencies, seconds):
+    # Request count, throughput and latency percentiles (milliseconds)
+    if not latencies:
+        return {"requests": 0, "throughput_rps": 0.0, "p50_ms": None, "p95_ms": None, "p99_ms": None}
+    cuts = statistics.quantiles(latencies, n=100, method="inclusive") if len(latencies) > 1 else latencies * 99
+    return {"requests": len(latencies), "throughput_rps": round(len(latencies) / seconds, 1),
+            "p50_ms": round(cuts[49], 2), "p95_ms": round(cuts[94], 2), "p99_ms": round(cuts[98], 2)}
+
+
+def histogram_labels():
+    return [f"<={bound}ms" for bound in HISTOGRAM_BOUNDS_MS] + [f">{HISTOGRAM_BOUNDS_MS[-1]}ms"]
+
+
+def note_created(op, status, payload, created_ids):
+    # Remember ids of rows we added, so deletes remove load-test rows rather than real ones
+    if op == "add" and status == 201 and isinstance(payload, dict) and "id" in payload:
+        created_ids.append(payload["id"])
+
+
+def run_threads(base_url, clients, deadline, mix, stats, created_ids, seed):
+    def client(number):
+        rng = random.Random(seed + number)
+        session = requests.Session()
+        ops, weights = list(mix), list(mix.values())
+        while time.monotonic() < deadline:
+            op = rng.choices(ops, weights)[0]
+            method, path, body = build_request(op, rng, created_ids)
+            started = time.perf_counter()
+            try:
+                response = session.request(method, base_url + path, json=body, timeout=30)
+                status, text = response.status_code, response.text
+            except requests.RequestException as e:
+                status, text = None, str(e)
+            stats.record(op, time.perf_counter() - started, status, LOCKED_MARKER in text)
+            if status == 201 and op == "add":
+                note_created(op, status, response.json(), created_ids)
+        session.close()
+
+    threads = [threading.Thread(target=client, args=(number,), daemon=True) for number in range(clients)]
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+async def run_tasks(base_url, clients, deadline, mix, stats, created_ids, seed):
+    async def client(session, number):
+        rng = random.Random(seed + number)
+        ops, weights = list(mix), list(mix.values())
+        while time.monotonic() < deadline:
+            op = rng.choices(ops, weights)[0]
+            method, path, body = build_request(op, rng, created_ids)
+            started = time.perf_counter()
+            payload = None
+            try:
+                async with session.request(method, base_url + path, json=body) as response:
+                    status, text = response.status, await response.text()
+                    if status == 201 and op == "add":
+                        payload = json.loads(text)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                status, text = None, str(e)
+            stats.record(op, time.perf_counter() - started, status, LOCKED_MARKER in text)
+            note_created(op, status, payload, created_ids)
+
+    connector = aiohttp.TCPConnector(limit=clients)
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=30)) as session:
+        await asyncio.gather(*(client(session, number) for number in range(clients)))
+
+
+def report_interval(summary):
+    print(f"[{summary['elapsed_s']:>6.1f}s] {summary['throughput_rps']:>8.1f} req/s  "
+          f"p50 {summary['p50_ms'] or 0:>7.2f} ms  p95 {summary['p95_ms'] or 0:>7.2f} ms  "
+          f"p99 {summary['p99_ms'] or 0:>7.2f} ms  errors {summary['error_rate']:.2%}  "
+          f"locked {summary['locked_rate']:.2%}", flush=True)
+
+
+def report_totals(totals):
+    print("\nPer operation:")
+    for op, summary in totals.items():
+        print(f"  {op:<10} {summary['requests']:>8} req  {summary['throughput_rps']:>8.1f} req/s  "
+              f"p50 {summary['p50_ms']:>7.2f} ms  p95 {summary['p95_ms']:>7.2f} ms  p99 {summary['p99_ms']:>7.2f} ms  "
+              f"errors {summary['error_rate']:.2%}  locked {summary['locked_rate']:.2%}")
+    print("\nLatency histograms:")
+    for op, summary in totals.items():
+        print(f"  {op}")
+        peak = max(summary["histogram"].values()) or 1
+        for label, count in summary["histogram"].items():
+            if count:
+                print(f"    {label:>9} {count:>8}  {'#' * max(1, round(40 * count / peak))}")
+
+
+def run_load(base_url, clients, duration, mix, mode="threads", interval=5.0, seed=0):
+    """Drive `clients` concurrent clients for `duration` seconds. Returns {"timeline", "operations"}."""
+    if mode == "asyncio" and aiohttp is None:
+        raise RuntimeError("--mode asyncio requires aiohttp, which is not installed")
+    stats, created_ids = LoadStats(), deque(maxlen=MAX_TRACKED_IDS)
+    started = time.monotonic()
+    deadline = started + duration
+
+    if mode == "asyncio":
+        worker = threading.Thread(target=lambda: asyncio.run(
+            run_tasks(base_url, clients, deadline, mix, stats, created_ids, seed)), daemon=True)
+        worker.start()
+        workers = [worker]
+    else:
+        workers = run_threads(base_url, clients, deadline, mix, stats, created_ids, seed)
+
+    last = started
+    while True:
+        time.sleep(max(min(last + interval, deadline) - time.monotonic(), 0))
+        finished = time.monotonic() >= deadline
+        if finished:
+            for worker in workers:  # Requests in flight at the deadline count towards the last interval
+                worker.join()
+        now = time.monotonic()
+        if finished or now - last >= interval:
+            report_interval(stats.close_interval(now - started, now - last))
+            last = now
+        if finished:
+            break
+    return {"timeline": stats.timeline, "operations": stats.totals(time.monotonic() - started)}
+
+
+def serve_seeded(rows):
+    # A threaded server over a freshly seeded temporary database; returns (base URL, stop function)
+    from werkzeug.serving import make_server
+    from benchmark import QuietRequestHandler, seeded_app
+
+    context = seeded_app(rows)
+    app = context.__enter__()
+    server = make_server("127.0.0.1", 0, app, threaded=True, request_handler=QuietRequestHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    def stop():
+        server.shutdown()
+        thread.join()
+        context.__exit__(None, None, None)
+
+    return f"http://127.0.0.1:{server.server_port}", stop
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate concurrent mixed load against the Expense Tracker API")
+    parser.add_argument("--url", default="http://127.0.0.1:5000", help="server to load (ignored with --seed-rows)")
+    parser.add_argument("--seed-rows", type=int, help="serve a freshly seeded temporary database in-process instead")
+    parser.add_argument("--clients", type=int, default=16, help="concurrent clients")
+    parser.add_argument("--duration", type=float, default=30, help="seconds to run")
+    parser.add_argument("--mode", choices=["threads", "asyncio"], default="threads")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX,
+                        help=f"operation weights, e.g. add=20,summary=40 (operations: {', '.join(DEFAULT_MIX)})")
+    parser.add_argument("--interval", type=float, default=5.0, help="seconds between progress lines")
+    parser.add_argument("--seed", type=int, default=0, help="random seed for the request mix")
+    parser.add_argument("--json", help="also write the timeline and totals to this file")
+    args = parser.parse_args()
+
+    stop = None
+    base_url = args.url.rstrip("/")
+    if args.seed_rows:
+        base_url, stop = serve_seeded(args.seed_rows)
+    try:
+        results = run_load(base_url, args.clients, args.duration, args.mix, args.mode, args.interval, args.seed)
+    except RuntimeError as e:
+        sys.exit(str(e))
+    finally:
+        if stop is not None:
+            stop()
+
+    report_totals(results["operations"])
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
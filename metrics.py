@@ -0,0 +1,200 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from flask.json.provider import DefaultJSONProvider
+
+# Histogram bucket upper bounds (Prometheus convention: seconds; the +Inf bucket is implicit)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ROW_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000, 1000000)
+
+# The timings of the request being handled on this thread (or asyncio task), or None outside one
+_current = ContextVar("request_timings", default=None)
+
+
+class RequestTimings:
+    """Database time, serialization time and rows returned, accumulated over one request."""
+    __slots__ = ("route", "method", "started", "db", "serialize", "rows")
+
+    def __init__(self, route, method):
+        self.route = route
+        self.method = method
+        self.started = time.perf_counter()
+        self.db = 0.0
+        self.serialize = 0.0
+        self.rows = 0
+
+
+class Histogram:
+    """Bucket counts, sum and count per label set."""
+
+    def __init__(self, name, help_text, labels, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}
+
+    def observe(self, label_values, value):
+        # Callers hold the registry lock
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for label_values, (counts, total, count) in sorted(self._series.items()):
+            labels = format_labels(self.labels, label_values)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{labels}}} {total}")
+            lines.append(f"{self.name}_count{{{labels}}} {count}")
+        return lines
+
+
+def format_labels(names, values):
+    return ",".join(f'{name}="{escape_label(value)}"' for name, value in zip(names, values))
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Metrics:
+    """Per-route request instrumentation for one process, rendered in the Prometheus text format.
+
+    Under a pre-forking server every worker keeps its own registry, so a scrape of /metrics
+    reports the worker that answered it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self.duration = Histogram("expense_http_request_duration_seconds",
+                                  "Time from routing to the last byte of the response body.",
+                                  ("route", "method", "status"), LATENCY_BUCKETS)
+        self.db = Histogram("expense_db_duration_seconds",
+                            "Time per request spent holding database connections or waiting on the writer.",
+                            ("route", "method"), LATENCY_BUCKETS)
+        self.serialize = Histogram("expense_serialization_duration_seconds",
+                                   "Time per request spent encoding (and compressing) response bodies.",
+                                   ("route", "method"), LATENCY_BUCKETS)
+        self.rows = Histogram("expense_rows_returned", "Rows (list items) returned per request.",
+                              ("route", "method"), ROW_BUCKETS)
+
+    def start(self, route, method):
+        """Begin timing a request on this thread; returns its RequestTimings."""
+        timings = RequestTimings(route, method)
+        _current.set(timings)
+        with self._lock:
+            key = (route, method)
+            self._in_flight[key] = self._in_flight.get(key, 0) + 1
+        return timings
+
+    def finish(self, timings, status):
+        """Record a finished request."""
+        elapsed = time.perf_counter() - timings.started
+        if _current.get() is timings:
+            _current.set(None)
+        key = (timings.route, timings.method)
+        with self._lock:
+            self._in_flight[key] -= 1
+            self.duration.observe((*key, str(status)), elapsed)
+            self.db.observe(key, timings.db)
+            self.serialize.observe(key, timings.serialize)
+            self.rows.observe(key, timings.rows)
+
+    def render(self):
+        """The whole registry in the Prometheus text exposition format."""
+        with self._lock:
+            lines = ["# HELP expense_http_requests_in_flight Requests currently being handled.",
+                     "# TYPE expense_http_requests_in_flight gauge"]
+            lines += [f"expense_http_requests_in_flight{{{format_labels(('route', 'method'), key)}}} {count}"
+                      for key, count in sorted(self._in_flight.items())]
+            for histogram in (self.duration, self.db, self.serialize, self.rows):
+                lines += histogram.render()
+        return "\n".join(lines) + "\n"
+
+
+@contextmanager
+def db_timer():
+    """Counts the time spent inside the with block as database time of the current request."""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.db += time.perf_counter() - started
+
+
+@contextmanager
+def serialize_timer():
+    """Counts the time spent inside the with block, less any database time within it, as
+    serialization time of the current request."""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    started, db_before = time.perf_counter(), timings.db
+    try:
+        yield
+    finally:
+        timings.serialize += time.perf_counter() - started - (timings.db - db_before)
+
+
+def add_rows(count):
+    """Adds to the rows the current request returned."""
+    timings = _current.get()
+    if timings is not None:
+        timings.rows += count
+
+
+def count_rows(payload, nested=False):
+    # Rows in a JSON payload: the items of a list, or the rows of a column set (anything with a row_count,
+    # like encoding.Columns), at the top level or as any value of a top-level object
+    if isinstance(payload, list):
+        return len(payload)
+    row_count = getattr(payload, "row_count", None)
+    if row_count is not None:
+        return row_count
+    if isinstance(payload, dict) and not nested:
+        return sum(count_rows(value, nested=True) for value in payload.values())
+    return 0
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Flask's JSON provider, with jsonify() time and row counts recorded against the current request."""
+
+    def response(self, *args, **kwargs):
+        if _current.get() is None:
+            return super().response(*args, **kwargs)
+        with serialize_timer():
+            if len(args) == 1 and not kwargs:
+                add_rows(count_rows(args[0]))
+            return super().response(*args, **kwargs)
+
+
+class MeasuredCursor:
+    """Wraps a cursor so fetchmany() counts as database time and its rows as rows returned."""
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def fetchmany(self, size):
+        with db_timer():
+            rows = self.cursor.fetchmany(size)
+        add_rows(len(rows))
+        return rows
+
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
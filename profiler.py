@@ -0,0 +1,251 @@
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+from logging.handlers import RotatingFileHandler
+
+# Slow-Query Log
+SLOW_QUERY_MS = 100                      # Statements at or above this wall time are logged with their plan
+SLOW_LOG_BYTES = 10 * 1024 * 1024        # Size at which the log file rotates
+SLOW_LOG_BACKUPS = 5                     # Rotated files kept
+RECENT_SLOW_QUERIES = 100                # Slow statements kept in memory for /admin/slow_queries
+
+EXPLAINABLE = ("SELECT", "WITH", "INSERT", "REPLACE", "UPDATE", "DELETE")
+
+_SPACE = re.compile(r"\s+")
+_LITERALS = re.compile(r"'(?:[^']|'')*'|(?<![\w.])-?\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r"\bIN \(\?(?:, \?)+\)", re.IGNORECASE)
+
+
+@lru_cache(maxsize=1024)
+def normalize_sql(sql):
+    """One line of SQL with literals as ? and IN (?, ?, ...) lists collapsed, so variants group together."""
+    sql = _SPACE.sub(" ", sql.strip())
+    sql = _LITERALS.sub("?", sql)
+    return _IN_LISTS.sub("IN (?, ...)", sql)
+
+
+def param_shape(params, many=False):
+    """The types of the bound parameters, e.g. "(str, str, int)"; never their values."""
+    if many:
+        if not isinstance(params, (list, tuple)):
+            return "iterable"
+        return f"{len(params)} x {param_shape(params[0])}" if params else "0 rows"
+    if isinstance(params, dict):
+        return "{" + ", ".join(f"{key}: {type(value).__name__}" for key, value in params.items()) + "}"
+    return "(" + ", ".join(type(value).__name__ for value in params) + ")"
+
+
+class QueryProfiler:
+    """Per-statement call counts and timings for every profiled connection, plus a slow-query log.
+
+    Statements are grouped by their normalized SQL. Any single execution at or above the threshold
+    is written, with its parameter shape, row count and query plan, as one JSON line to a rotating
+    log file (when a path is given) and kept in a short in-memory list.
+    """
+
+    def __init__(self, threshold_ms=SLOW_QUERY_MS, log_path=None, max_bytes=SLOW_LOG_BYTES,
+                 backups=SLOW_LOG_BACKUPS):
+        self.threshold = threshold_ms / 1000
+        self.log_path = log_path or None
+        self._lock = threading.Lock()
+        self._statements = {}  # normalized SQL -> [calls, seconds, max seconds, rows, errors, slow]
+        self._recent = deque(maxlen=RECENT_SLOW_QUERIES)
+        self._logger = None
+        if self.log_path:
+            self._logger = logging.Logger("expense.slow_queries")  # Unregistered, so apps never share handlers
+            handler = RotatingFileHandler(self.log_path, maxBytes=max_bytes, backupCount=backups, delay=True)
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            self._logger.addHandler(handler)
+
+    def record(self, conn, sql, params, many, seconds, rows, error=None):
+        """Account one finished statement, logging it if it was slow."""
+        key = normalize_sql(sql)
+        slow = seconds >= self.threshold
+        with self._lock:
+            stats = self._statements.get(key)
+            if stats is None:
+                stats = self._statements[key] = [0, 0.0, 0.0, 0, 0, 0]
+            stats[0] += 1
+            stats[1] += seconds
+            stats[2] = max(stats[2], seconds)
+            stats[3] += rows
+            stats[4] += error is not None
+            stats[5] += slow
+        if slow:
+            self._log_slow(conn, sql, key, params, many, seconds, rows, error)
+
+    def _log_slow(self, conn, sql, key, params, many, seconds, rows, error):
+        entry = {"time": time.strftime("%Y-%m-%dT%H:%M:%S%z"), "sql": key, "params": param_shape(params, many),
+                 "ms": round(seconds * 1000, 3), "rows": rows, "plan": explain(conn, sql, params, many)}
+        if error is not None:
+            entry["error"] = error
+        with self._lock:
+            self._recent.append(entry)
+        if self._logger is not None:
+            self._logger.warning(json.dumps(entry))
+
+    def top(self, limit=20, order="total"):
+        """The `limit` statements with the highest total (or mean, max, calls) time."""
+        with self._lock:
+            rows = [{"sql": sql, "calls": calls, "total_ms": round(seconds * 1000, 3),
+                     "mean_ms": round(seconds * 1000 / calls, 3), "max_ms": round(longest * 1000, 3),
+                     "rows": rows, "errors": errors, "slow": slow}
+                    for sql, (calls, seconds, longest, rows, errors, slow) in self._statements.items()]
+        sort_key = {"total": "total_ms", "mean": "mean_ms", "max": "max_ms", "calls": "calls"}[order]
+        return sorted(rows, key=lambda row: row[sort_key], reverse=True)[:limit]
+
+    def recent(self, limit=20):
+        """The latest slow statements, newest first."""
+        with self._lock:
+            return list(self._recent)[::-1][:limit]
+
+    def reset(self):
+        with self._lock:
+            self._statements.clear()
+            self._recent.clear()
+
+    def close(self):
+        """Close the slow-query log file."""
+        if self._logger is not None:
+            for handler in self._logger.handlers:
+                handler.close()
+
+
+def explain(conn, sql, params, many):
+    # EXPLAIN QUERY PLAN for the statement (with the first row's parameters for executemany), run on
+    # the base class so it is not profiled itself. None for statements SQLite cannot explain.
+    if not sql.lstrip().upper().startswith(EXPLAINABLE):
+        return None
+    if many:
+        if not isinstance(params, (list, tuple)) or not params:
+            return None
+        params = params[0]
+    try:
+        return [row[3] for row in sqlite3.Connection.execute(conn, "EXPLAIN QUERY PLAN " + sql, params)]
+    except sqlite3.Error:
+        return None
+
+
+class ProfiledCursor(sqlite3.Cursor):
+    """Times each statement from execute() until its rows are exhausted (or the cursor is dropped)."""
+
+    _pending = None  # [sql, params, seconds so far, rows so far] of a SELECT still being read
+
+    def execute(self, sql, parameters=()):
+        self._finish()
+        started = time.perf_counter()
+        try:
+            super().execute(sql, parameters)
+        except sqlite3.Error as e:
+            self._record(sql, parameters, False, time.perf_counter() - started, 0, str(e))
+            raise
+        elapsed = time.perf_counter() - started
+        if self.description is None:
+            self._record(sql, parameters, False, elapsed, max(self.rowcount, 0))
+        else:
+            self._pending = [sql, parameters, elapsed, 0]
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        self._finish()
+        started = time.perf_counter()
+        try:
+            super().executemany(sql, seq_of_parameters)
+        except sqlite3.Error as e:
+            self._record(sql, seq_of_parameters, True, time.perf_counter() - started, 0, str(e))
+            raise
+        self._record(sql, seq_of_parameters, True, time.perf_counter() - started, max(self.rowcount, 0))
+        return self
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(time.perf_counter() - started, row is not None, row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._fetched(time.perf_counter() - started, len(rows), len(rows) < (self.arraysize if size is None else size))
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(time.perf_counter() - started, len(rows), True)
+        return rows
+
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._fetched(time.perf_counter() - started, 0, True)
+            raise
+        self._fetched(time.perf_counter() - started, 1, False)
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        self._finish()
+
+    def _fetched(self, seconds, rows, exhausted):
+        pending = self._pending
+        if pending is not None:
+            pending[2] += seconds
+            pending[3] += rows
+            if exhausted:
+                self._finish()
+
+    def _finish(self):
+        pending, self._pending = self._pending, None
+        if pending is not None:
+            sql, params, seconds, rows = pending
+            self._record(sql, params, False, seconds, rows)
+
+    def _record(self, sql, params, many, seconds, rows, error=None):
+        profiler = getattr(self.connection, "profiler", None)
+        if profiler is not None:
+            profiler.record(self.connection, sql, params, many, seconds, rows, error)
+
+
+class ProfiledConnection(sqlite3.Connection):
+    """A connection whose statements, commits and rollbacks are reported to `profiler`."""
+
+    profiler = None
+
+    def cursor(self, factory=ProfiledCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def commit(self):
+        self._timed("COMMIT", super().commit)
+
+    def rollback(self):
+        self._timed("ROLLBACK", super().rollback)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # `with conn:` commits or rolls back in C, bypassing commit() and rollback()
+        return self._timed("ROLLBACK" if exc_type else "COMMIT", super().__exit__, exc_type, exc_value, traceback)
+
+    def _timed(self, statement, fn, *args):
+        if self.profiler is None or not self.in_transaction:
+            return fn(*args)
+        started = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            self.profiler.record(self, statement, (), False, time.perf_counter() - started, 0)
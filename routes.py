@@ -1,13 +1,89 @@
-from flask import Flask, request, jsonify
-from database import get_db_connection
+from flask import Blueprint, Flask, Response, current_app, g, jsonify, make_response, request
+from archive import ARCHIVE_DIR, ArchiveError, ArchiveSet, schema_name
+from cache import ResponseCache
+from columnar import ColumnarStore
+from encoding import (COMPRESS_MIN_BYTES, COMPRESSIBLE_TYPES, FastJSONProvider, TimedFastJSONProvider, choose_encoding,
+                      compress_body, compress_stream, fast_json_available, rows_to_columns)
+from export import EXPORT_COLUMNS, EXPORT_FORMATS, EXPORT_WRITERS, arrow_available
+from profiler import SLOW_QUERY_MS, QueryProfiler
+from metrics import MeasuredCursor, Metrics, TimedJSONProvider, db_timer, serialize_timer
+from trends import (MAX_TREND_PERIODS, PERIODS, deltas, moving_average, period_count, period_key, period_labels,
+                    whole_months)
+from database import (CATEGORIES, DB_NAME, POOL_SIZE, ConnectionPool, WriteQueue, WriteResult, bump_data_version,
+                      get_data_version, get_db_connection)
+from contextlib import ExitStack, closing, contextmanager
+from functools import partial, wraps
+from itertools import groupby, islice
+from operator import itemgetter
+from types import GeneratorType
+from urllib.parse import urlencode
+import calendar
+import csv
+import hashlib
+import heapq
+import io
+import json
+import os
+import re
 import sqlite3
-from datetime import datetime
+from datetime import datetime, timedelta
 import werkzeug.serving
 
-app = Flask(__name__)
+bp = Blueprint('expenses', __name__)
+
+# Result Set Limits
+MAX_PAGE_SIZE = 10000      # Largest page a client may request with ?limit=
+STREAM_CHUNK_SIZE = 1000   # Rows pulled from the cursor per fetchmany() when streaming
+IMPORT_CHUNK_SIZE = 1000   # Rows committed per transaction by /import (override with ?chunk_size=)
+MAX_IMPORT_CHUNK_SIZE = 50000
+DELETE_CHUNK_SIZE = 5000   # Rows deleted per transaction by /bulk_delete
+MAX_PATCHES = 50000        # Patches one PATCH /expenses request may carry
+ID_LIST_SIZE = 5000        # Ids bound per IN (...) list when reading rows by id
+
+PATCH_FIELDS = ('cost', 'date', 'category', 'description')  # Columns a patch may set, in SET order
+ROW_FORMATS = ('rows', 'columns')  # ?format= for listings: a list of objects, or parallel arrays per column
+
+INSERT_EXPENSE = "INSERT INTO expenses (cost, date, category, description) VALUES (?, ?, ?, ?)"
+
+# A "quoted phrase" or a single word (possibly ending in * for a prefix search) in a ?q= search
+SEARCH_TERMS = re.compile(r'"([^"]*)"|(\S+)')
+
+# App Configuration
+DEFAULT_CONFIG = {
+    'DATABASE': DB_NAME,
+    'POOL_SIZE': POOL_SIZE,
+    'GROUP_COMMIT': False,               # Route single-row writes through one batching writer thread
+    'RESPONSE_CACHE_ENTRIES': 1024,      # Set either cache limit to 0 to disable the response cache
+    'RESPONSE_CACHE_BYTES': 32 * 1024 * 1024,
+    'COLUMNAR': True,                    # Answer totals from the in-memory NumPy store (needs numpy)
+    'METRICS': True,                     # Per-route timing histograms, served on /metrics
+    'PROFILE_SQL': True,                 # Time every statement, summarized on /admin/slow_queries
+    'SLOW_QUERY_MS': SLOW_QUERY_MS,      # Statements this slow are logged with their query plan
+    'SLOW_QUERY_LOG': 'slow_queries.log',  # Rotating JSON-lines slow-query log ('' keeps it in memory only)
+    'ARCHIVE_DIR': ARCHIVE_DIR,          # Per-year archive files written by archive.py, attached by date range
+    'FAST_JSON': True,                   # Encode and decode JSON with orjson when it is installed
+    'COMPRESS_MIN_BYTES': COMPRESS_MIN_BYTES,  # gzip/brotli bodies this large when accepted (0 disables)
+}
+
+# Environment variables that override DEFAULT_CONFIG
+CONFIG_ENV_VARS = {
+    'DATABASE': 'EXPENSE_DATABASE',
+    'POOL_SIZE': 'EXPENSE_POOL_SIZE',
+    'GROUP_COMMIT': 'EXPENSE_GROUP_COMMIT',
+    'RESPONSE_CACHE_ENTRIES': 'EXPENSE_CACHE_ENTRIES',
+    'RESPONSE_CACHE_BYTES': 'EXPENSE_CACHE_BYTES',
+    'COLUMNAR': 'EXPENSE_COLUMNAR',
+    'METRICS': 'EXPENSE_METRICS',
+    'PROFILE_SQL': 'EXPENSE_PROFILE_SQL',
+    'SLOW_QUERY_MS': 'EXPENSE_SLOW_QUERY_MS',
+    'SLOW_QUERY_LOG': 'EXPENSE_SLOW_QUERY_LOG',
+    'ARCHIVE_DIR': 'EXPENSE_ARCHIVE_DIR',
+    'FAST_JSON': 'EXPENSE_FAST_JSON',
+    'COMPRESS_MIN_BYTES': 'EXPENSE_COMPRESS_MIN_BYTES',
+}
 
 # Security Configurations
-app.config['CSP'] = (
+CSP = (
     "default-src 'self'; "
     "script-src 'self'; "
     "style-src 'self'; "
@@ -18,29 +94,142 @@ app.config['CSP'] = (
 )
 
 
+def config_from_env():
+    # Reads the CONFIG_ENV_VARS overrides, converted to the type of each default
+    overrides = {}
+    for key, var in CONFIG_ENV_VARS.items():
+        value = os.environ.get(var)
+        if value is None:
+            continue
+        default = DEFAULT_CONFIG[key]
+        if isinstance(default, bool):
+            overrides[key] = value.lower() in ("1", "true")
+        elif isinstance(default, int):
+            overrides[key] = int(value)
+        else:
+            overrides[key] = value
+    return overrides
+
+
+def create_app(config=None):
+    """Build the API: defaults, then EXPENSE_* environment variables, then `config`.
+
+    Each app has its own connection pool, group-commit writer and statement profiler, so apps on
+    different databases can live side by side. Under a pre-forking server call it in each worker.
+    """
+    app = Flask(__name__)
+    app.config.update(DEFAULT_CONFIG)
+    app.config.update(config_from_env())
+    app.config.update(config or {})
+    app.config['CSP'] = CSP
+
+    profiler = None
+    if app.config['PROFILE_SQL']:
+        profiler = QueryProfiler(app.config['SLOW_QUERY_MS'], app.config['SLOW_QUERY_LOG'])
+    app.extensions['profiler'] = profiler
+    app.extensions['pool'] = ConnectionPool(app.config['DATABASE'], app.config['POOL_SIZE'], profiler=profiler)
+    app.extensions['write_queue'] = WriteQueue(app.config['DATABASE'], profiler=profiler)
+    app.extensions['archive'] = ArchiveSet(app.config['ARCHIVE_DIR'])
+    app.extensions['response_cache'] = ResponseCache(app.config['RESPONSE_CACHE_ENTRIES'],
+                                                     app.config['RESPONSE_CACHE_BYTES'])
+    app.extensions['columnar'] = None
+    store = ColumnarStore(partial(get_db_connection, app.config['DATABASE'], profiler))
+    if app.config['COLUMNAR'] and store.enabled:
+        app.extensions['columnar'] = store
+        try:
+            with app.extensions['pool'].connection() as conn:
+                store.load(conn)
+        except sqlite3.Error:
+            pass  # No database yet; the first query loads it
+
+    fast_json = app.config['FAST_JSON'] and fast_json_available()
+    if fast_json:
+        app.json = FastJSONProvider(app)
+    app.extensions['metrics'] = None
+    if app.config['METRICS']:
+        app.extensions['metrics'] = Metrics()
+        app.json = TimedFastJSONProvider(app) if fast_json else TimedJSONProvider(app)
+        app.before_request(start_request_metrics)
+        app.after_request(finish_request_metrics)
+
+    app.after_request(apply_security_headers)
+    app.after_request(compress_response)  # Runs first, so compression counts toward the request's metrics
+    app.register_blueprint(bp)
+    return app
+
+
+def close_app(app):
+    """Release what create_app opened: commit queued writes and stop the writer, close the pool's
+    connections and the slow-query log."""
+    app.extensions['write_queue'].stop()
+    app.extensions['pool'].close()
+    if app.extensions['profiler'] is not None:
+        app.extensions['profiler'].close()
+
+
 # Apply Security Headers Globally
-@app.after_request
 def apply_security_headers(response):
     if "Content-Security-Policy" not in response.headers:
-        response.headers["Content-Security-Policy"] = app.config['CSP']
+        response.headers["Content-Security-Policy"] = current_app.config['CSP']
     if "X-Content-Type-Options" not in response.headers:
         response.headers["X-Content-Type-Options"] = "nosniff"
     return response
 
 
+# Response Compression
+def compress_response(response):
+    # Negotiated gzip (or brotli, when installed) for JSON, CSV and text bodies of at least
+    # COMPRESS_MIN_BYTES. Streamed bodies are compressed chunk by chunk, whatever their size.
+    minimum = current_app.config['COMPRESS_MIN_BYTES']
+    if (minimum <= 0 or response.status_code != 200 or response.mimetype not in COMPRESSIBLE_TYPES
+            or response.direct_passthrough or "Content-Encoding" in response.headers):
+        return response
+    response.vary.add("Accept-Encoding")
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding is None or (not response.is_streamed and response.calculate_content_length() < minimum):
+        return response
+    with serialize_timer():
+        if response.is_streamed:
+            response.response = compress_stream(response.response, encoding)
+            response.headers.pop("Content-Length", None)
+        else:
+            response.set_data(compress_body(response.get_data(), encoding))
+    response.headers["Content-Encoding"] = encoding
+    return response
 
-# Suppress "Server" Header
-werkzeug.serving.WSGIRequestHandler.server_version = "Secure-Server"
-werkzeug.serving.WSGIRequestHandler.sys_version = ""
+
+# Request Metrics
+def start_request_metrics():
+    # Routes are labelled by their rule ("/expense/<int:id>"), so label sets stay bounded
+    route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    g.request_timings = current_app.extensions['metrics'].start(route, request.method)
+
+
+def finish_request_metrics(response):
+    # Streamed bodies are still being produced here, so they are recorded once the server closes them
+    metrics, timings = current_app.extensions['metrics'], g.pop('request_timings', None)
+    if timings is None:
+        return response
+    if response.is_streamed:
+        response.call_on_close(lambda: metrics.finish(timings, response.status_code))
+    else:
+        metrics.finish(timings, response.status_code)
+    return response
+
+
+# Suppress "Server" Header (development server)
+def suppress_server_header():
+    werkzeug.serving.WSGIRequestHandler.server_version = "Secure-Server"
+    werkzeug.serving.WSGIRequestHandler.sys_version = ""
 
 
 # Define Static Routes
-@app.route('/robots.txt')
+@bp.route('/robots.txt')
 def robots():
     return "User-agent: *\nDisallow:", 200, {'Content-Type': 'text/plain'}
 
 
-@app.route('/sitemap.xml')
+@bp.route('/sitemap.xml')
 def sitemap():
     return "", 200, {'Content-Type': 'application/xml'}
 
@@ -50,98 +239,473 @@ def validate_date(date_str):
     # Ensures the date format is YYYY-MM-DD and is a valid date.
     try:
         parsed_date = datetime.strptime(date_str, "%Y-%m-%d")
-        return parsed_date.strftime("%Y-%m-%d")
+        return parsed_date.date().isoformat()  # Zero-pads the year, which strftime("%Y") may not
     except ValueError:
         return None
 
 
-def execute_query(query, params=(), fetch_one=False, fetch_all=False, commit=False):
-    # Handles common database interactions.
-    conn = get_db_connection()
-    cursor = conn.cursor()
+def check_field(name, value):
+    # Validates and normalizes one expense column: returns (value, None) or (None, error message)
+    if name == 'description':
+        if not isinstance(value, str):
+            return None, "Description must be a string."
+        if len(value) > 25:
+            return None, "Description must be 25 characters or fewer."
+        if not value:
+            return None, "Description cannot be empty."
+        return value, None
+
+    if name == 'date':
+        # Convert Unix timestamp or validate string date
+        if isinstance(value, (int, float)):
+            try:
+                return datetime.fromtimestamp(value).date().isoformat(), None
+            except (OverflowError, OSError, ValueError):
+                return None, "Invalid timestamp."
+        if isinstance(value, str):
+            formatted_date = validate_date(value)
+            if formatted_date is None:
+                return None, "Invalid date format or non-existent date (e.g., 2025-02-30). Expected YYYY-MM-DD."
+            return formatted_date, None
+        return None, "Invalid date type. Expected string or timestamp."
+
+    if name == 'category':
+        if value not in CATEGORIES:
+            return None, f"Invalid category. Expected one of: {', '.join(CATEGORIES)}."
+        return value, None
+
     try:
-        cursor.execute(query, params)
-        if commit:
-            conn.commit()
-        if fetch_one:
-            return cursor.fetchone()
-        if fetch_all:
-            return cursor.fetchall()
-    except sqlite3.Error as e:
-        conn.rollback()
-        return {"error": f"Database error: {str(e)}"}
-    finally:
-        conn.close()
+        cost = float(value)
+    except (TypeError, ValueError):
+        return None, "Cost must be a number."
+    if cost <= 0:
+        return None, "Cost must be greater than zero."
+    return cost, None
 
 
-# Routes
-@app.route('/')
-def home():
-    return jsonify({"message": "Expense Tracker API is running"}), 200
+def validate_expense(data):
+    # Validates one expense payload and returns (row, None) ready for INSERT_EXPENSE, or (None, error message).
+    if not isinstance(data, dict):
+        return None, "Expected an expense object."
 
+    cost = data.get('cost')
+    date = data.get('date')
+    category = data.get('category')
+    description = data.get('description') or ''
 
-@app.route('/expense', methods=['POST'])
-def add_expense():
+    # Ensure required fields are provided
+    if cost is None or date is None or category is None:
+        return None, "Missing required fields: cost, date, category"
+
+    values = {}
+    for name, value in (('description', description), ('date', date), ('category', category), ('cost', cost)):
+        values[name], error = check_field(name, value)
+        if error:
+            return None, error
+
+    return (values['cost'], values['date'], values['category'], values['description']), None
+
+
+@contextmanager
+def db_connection():
+    # A pooled connection whose time checked out counts as the current request's database time
+    with db_timer(), pooled_connection() as conn:
+        yield conn
+
+
+def execute_query(query, params=(), fetch_one=False, fetch_all=False, commit=False, span=None, key=None):
+    # Handles common database interactions on a pooled connection.
+    # Write statements (commit=True) return the number of affected rows.
+    # Reads that may reach archived years name their tables {expenses} / {rollups} and pass the
+    # span = (first year, last year) they cover (see archive_batches). A span read in several batches
+    # returns the first row any batch finds (fetch_one) or every batch's rows (fetch_all): merged by
+    # `key`, a row's sort key under the query's ORDER BY, or else concatenated, so grouped rows can come
+    # back once per batch and callers add them up.
     try:
-        data = request.json
-        cost = data.get('cost')
-        date = data.get('date')
-        category = data.get('category')
-        description = data.get('description', '')
-
-        # Ensure required fields are provided
-        if cost is None or date is None or category is None:
-            return jsonify({"error": "Missing required fields: cost, date, category"}), 400
-
-        # Validate description length
-        if len(description) > 25:
-            return jsonify({"error": "Description must be 25 characters or fewer."}), 400
-
-        # Ensure description is not empty
-        if not description:
-            return jsonify({"error": "Description cannot be empty."}), 400
-
-        # Validate date format & ensure it's a real date
-        def validate_date(date_str):
-            try:
-                parsed_date = datetime.strptime(date_str, "%Y-%m-%d")
-                return parsed_date.strftime("%Y-%m-%d")  # Ensure YYYY-MM-DD format
-            except ValueError:
+        with db_connection() as conn, closing(archive_batches(conn, span)) as batches:
+            results = []
+            for tables in batches:
+                cursor = conn.cursor()
+                try:
+                    cursor.execute(query.format_map(tables) if tables else query, params)
+                    if commit:
+                        conn.commit()
+                    if fetch_one:
+                        row = cursor.fetchone()
+                        if row is not None:
+                            return row
+                        continue
+                    if not fetch_all:
+                        return cursor.rowcount
+                    results.append(cursor.fetchall())
+                except sqlite3.Error:
+                    conn.rollback()
+                    raise
+                finally:
+                    cursor.close()  # An archive cannot be detached while a statement is still reading it
+            if fetch_one:
                 return None
+            if len(results) == 1:
+                return results[0]
+            return list(heapq.merge(*results, key=key)) if key else [row for rows in results for row in rows]
+    except (sqlite3.Error, ArchiveError) as e:
+        return {"error": f"Database error: {str(e)}"}
 
-        # Convert Unix timestamp or validate string date
-        if isinstance(date, (int, float)):
-            formatted_date = datetime.fromtimestamp(date).strftime("%Y-%m-%d")
-        elif isinstance(date, str):
-            formatted_date = validate_date(date)
-            if formatted_date is None:
-                return jsonify({"error": "Invalid date format or non-existent date (e.g., 2025-02-30). Expected YYYY-MM-DD."}), 400
+
+def execute_write(query, params=()):
+    # Runs and commits one INSERT/UPDATE/DELETE, directly on a pooled connection or, in group-commit
+    # mode, through the app's writer thread. Returns a WriteResult; raises sqlite3.Error.
+    if current_app.config['GROUP_COMMIT']:
+        with db_timer():
+            return get_write_queue().submit(query, params)
+    with db_connection() as conn, conn:
+        cursor = conn.execute(query, params)
+        rows = cursor.fetchall()
+        version = bump_data_version(conn) if cursor.rowcount > 0 else None
+        return WriteResult(cursor.lastrowid, cursor.rowcount, rows, version)
+
+
+def read_data_version():
+    # The current data version from a pooled connection
+    with db_connection() as conn:
+        return get_data_version(conn)
+
+
+def current_data_version():
+    # The data version, read once per request
+    if 'data_version' not in g:
+        g.data_version = read_data_version()
+    return g.data_version
+
+
+def normalize_query(path, args):
+    # A path plus its query parameters in a canonical form ("03" and "3" are the same month)
+    normalized = []
+    for key, value in sorted(args.items(multi=True)):
+        if value == "":
+            continue
+        if key in ("month", "year") and value.isdigit():
+            value = str(int(value))
+        normalized.append((key, value))
+    return path + "?" + urlencode(normalized)
+
+
+def normalized_request():
+    return normalize_query(request.path, request.args)
+
+
+def make_etag(version, normalized):
+    # Weak validator for a normalized request at a given data version
+    return f"{version}-{hashlib.sha1(normalized.encode()).hexdigest()[:16]}"
+
+
+def to_cents(cost):
+    # A cost in whole cents, rounded half away from zero exactly as SQLite's CAST(ROUND(cost * 100) AS INTEGER)
+    # (so totals computed here agree with the rollups and the columnar store)
+    scaled = cost * 100
+    return int(scaled + 0.5) if scaled >= 0 else int(scaled - 0.5)
+
+
+def get_pool():
+    return current_app.extensions['pool']
+
+
+def pooled_connection():
+    # Borrow a connection from this app's pool: `with pooled_connection() as conn: ...`
+    return get_pool().connection()
+
+
+def get_write_queue():
+    return current_app.extensions['write_queue']
+
+
+def get_profiler():
+    # The app's QueryProfiler, or None when statements are not profiled
+    return current_app.extensions['profiler']
+
+
+def get_response_cache():
+    return current_app.extensions['response_cache']
+
+
+def get_archive():
+    return current_app.extensions['archive']
+
+
+def archive_batches(conn, span, archive=None, hot=True):
+    # The {expenses} / {rollups} sources for a query over span = (first year, last year), either bound
+    # None for unbounded: the hot tables plus any archived years in the span, which stay attached to
+    # conn while the caller runs the batch. SQLite attaches at most 10 databases to a connection, so a
+    # span reaching more archived years is read in several batches of consecutive years, each seeing
+    # only its own years' hot rows. Queries without a span get one None batch and are run as written.
+    # Close the generator (contextlib.closing) so an abandoned batch still detaches its archives.
+    if span is None:
+        yield None
+        return
+    archive = archive or get_archive()
+    runs = archive.batches(conn, *span)
+    for first, last in runs:
+        with archive.tables(conn, first, last, hot, clip=len(runs) > 1) as tables:
+            yield tables
+
+
+def get_columnar():
+    # The in-memory columnar store, or None when totals come from SQL
+    return current_app.extensions['columnar']
+
+
+def sync_columnar(version, upserts=(), deletes=()):
+    # Feeds a committed write to the columnar store: (id, cost, date, category) rows and deleted ids
+    store = get_columnar()
+    if store is not None:
+        store.apply(version, upserts, deletes)
+
+
+def recent_inserts(conn, count):
+    # The rows this transaction just inserted, for the columnar store. AUTOINCREMENT ids are always
+    # above every existing id, and we hold the write lock, so they are the `count` highest ids.
+    if get_columnar() is None or not count:
+        return []
+    return conn.execute("SELECT id, cost, date, category FROM expenses ORDER BY id DESC LIMIT ?", (count,)).fetchall()
+
+
+def category_filter(category=None):
+    # One category, or all of them spelled out: an IN list lets aggregates seek the covering
+    # (category, date, ...) index one category at a time instead of sorting a date range by category
+    if category:
+        return "category = ?", [category]
+    return f"category IN ({', '.join('?' * len(CATEGORIES))})", list(CATEGORIES)
+
+
+def category_totals(start, end, category=None):
+    # Cents per category for dates in [start, end]: from the columnar store when it is current,
+    # otherwise one grouped SQL query. Archived years in the range are summed from their files (the
+    # store only mirrors the hot table). Returns {category: cents}.
+    store = get_columnar()
+    filter_clause, filter_params = category_filter(category)
+    query = ("SELECT category, SUM(CAST(ROUND(cost * 100) AS INTEGER)) FROM {expenses} "
+             f"WHERE {filter_clause} AND date BETWEEN ? AND ? GROUP BY category")
+    params = [*filter_params, start.isoformat(), end.isoformat()]
+    with db_connection() as conn:
+        totals, hot = {}, True
+        if store is not None and store.sync(conn):
+            totals = {name: cents for name, (cents, _) in store.category_totals(start, end, category).items()}
+            hot = False
+        with closing(archive_batches(conn, (start.year, end.year), hot=hot)) as batches:
+            for tables in batches:
+                for name, cents in conn.execute(query.format_map(tables), params) if hot or tables["years"] else ():
+                    totals[name] = totals.get(name, 0) + cents
+        return totals
+
+
+def totals_payload(totals):
+    # {category: cents} as the category_totals / overall_total JSON the summary endpoints share
+    return {
+        "category_totals": [{"category": name, "total_cost": cents / 100} for name, cents in sorted(totals.items())],
+        "overall_total": sum(totals.values()) / 100
+    }
+
+
+def invalidate_cache(version, rows):
+    # Drops cached responses overlapping the (date, category) pairs a committed write touched.
+    if version is None:
+        return
+    response_cache = get_response_cache()
+    try:
+        partitions = {(int(date[:4]), int(date[5:7]), category) for date, category in rows}
+    except (TypeError, ValueError):
+        response_cache.clear()  # A date we cannot place could belong to any month
+        partitions = set()
+    response_cache.invalidate(partitions, version)
+
+
+def conditional(view):
+    # Tags GET responses with a weak ETag built from the data version and the normalized request,
+    # and answers 304 Not Modified without running the view when the client's copy is still current.
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        etag = make_etag(current_data_version(), normalized_request())
+
+        if request.if_none_match.contains_weak(etag):
+            response = current_app.response_class(status=304)
         else:
-            return jsonify({"error": "Invalid date type. Expected string or timestamp."}), 400
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+        response.set_etag(etag, weak=True)
+        return response
+    return wrapper
+
 
-        # Insert into database
-        conn = get_db_connection()
+def cached(partition):
+    # Serves repeat GETs from the response cache. `partition(args)` returns the (months, category)
+    # the response depends on, used for invalidation, or None when the response should not be cached.
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            response_cache = get_response_cache()
+            scope = partition(request.args) if response_cache.enabled else None
+            if scope is None:
+                return view(*args, **kwargs)
+
+            key, version = normalized_request(), current_data_version()
+            entry = response_cache.get(key, version)
+            if entry is not None:
+                return current_app.response_class(entry.body, mimetype=entry.mimetype)
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200 and not response.is_streamed:
+                response_cache.put(key, response.get_data(), response.mimetype, version, *scope)
+            return response
+        return wrapper
+    return decorator
+
+
+def summary_partition(args):
+    # A monthly summary depends on every category in one month
+    try:
+        return frozenset({(int(args['year']), int(args['month']))}), None
+    except (KeyError, ValueError):
+        return None
+
+
+def dashboard_partition(args):
+    # The dashboard aggregates every category of its month, whatever the table filter
+    scope = expenses_partition({'month': args.get('month'), 'year': args.get('year')})
+    return (scope[0], None) if scope else None
+
+
+def expenses_partition(args):
+    # Only filtered, non-streamed listings are cached; a full dump is too big to be worth keeping
+    if args.get('stream'):
+        return None
+    month, year, category = args.get('month'), args.get('year'), args.get('category') or None
+    months = None
+    if month and year:
         try:
-            cursor = conn.cursor()
-            cursor.execute("INSERT INTO expenses (cost, date, category, description) VALUES (?, ?, ?, ?)",
-                           (cost, formatted_date, category, description))
+            months = frozenset({(int(year), int(month))})
+        except ValueError:
+            return None
+    if months is None and category is None:
+        return None
+    return months, category
 
-            expense_id = cursor.lastrowid
-            conn.commit()
-            return jsonify({"message": "Expense added successfully", "id": expense_id}), 201
-        except sqlite3.Error as e:
-            return jsonify({"error": f"Database error: {str(e)}"}), 500
-        finally:
-            conn.close()
 
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+def trends_partition(args):
+    # A trend series depends on every month in its range (every month, for very long ranges)
+    start, end = validate_date(args.get('start') or ''), validate_date(args.get('end') or '')
+    if start is None or end is None:
+        return None
+    start, end = datetime.strptime(start, "%Y-%m-%d").date(), datetime.strptime(end, "%Y-%m-%d").date()
+    first, last = start.year * 12 + start.month - 1, end.year * 12 + end.month
+    months = frozenset((month // 12, month % 12 + 1) for month in range(first, last)) if last - first <= 1200 else None
+    return months, args.get('category') or None
 
-@app.route('/bulk_expense', methods=['POST'])
-def add_bulk_expenses():
-    data = request.json  # Expecting a list of expense objects
+
+def build_expense_filters(args):
+    # Translates the month/year/category query parameters into WHERE clauses and their parameters.
+    month, year, category = args.get('month'), args.get('year'), args.get('category')
+    clauses, params = [], []
+
+    if month and year:
+        clauses.append("date BETWEEN ? AND ?")
+        params.extend([f"{int(year):04d}-{int(month):02d}-01", f"{int(year):04d}-{int(month):02d}-31"])
+
+    if category:
+        clauses.append("category = ?")
+        params.append(category)
+
+    return clauses, params
+
+
+def expense_rows(rows, args):
+    # Result rows as a list of objects, or with ?format=columns as parallel arrays ({column: [values]})
+    if args.get('format') == "columns":
+        return rows_to_columns(rows, rows[0].keys() if rows else EXPORT_COLUMNS)
+    return [dict(row) for row in rows]
+
+
+class MergedCursor:
+    """Rows from several cursors, each sorted by `key`, read as one sorted cursor of at most `limit` rows."""
+
+    def __init__(self, cursors, key, limit=None):
+        self.rows = islice(heapq.merge(*cursors, key=key), limit)
+
+    def fetchmany(self, size):
+        return list(islice(self.rows, size))
+
+
+@contextmanager
+def span_cursor(pool, query, params, span=None, archive=None, key=None, limit=None):
+    # A cursor over a streamed query's rows, for the life of the block, on a pooled connection with the
+    # span's archived years attached. A span read in several batches (see archive_batches) runs each
+    # further batch on a connection of its own and merges the batches' rows by `key`, the query's sort
+    # key, keeping the first `limit` of them.
+    with ExitStack() as stack:
+        conn = stack.enter_context(pool.connection())
+        archive = archive or get_archive()
+        runs = [None] if span is None else archive.batches(conn, *span)
+        cursors = []
+        for run in runs:
+            if cursors:
+                conn = stack.enter_context(closing(get_db_connection(pool.db_name, pool.profiler)))
+            tables = stack.enter_context(archive.tables(conn, *run, clip=len(runs) > 1)) if run else None
+            with db_timer():
+                cursors.append(conn.execute(query.format_map(tables) if tables else query, params))
+            stack.callback(cursors[-1].close)  # Closed before its archives are detached
+        yield MeasuredCursor(cursors[0] if len(cursors) == 1 else MergedCursor(cursors, key, limit))
+
+
+def primed(stream):
+    # Runs a streaming generator to its first (empty) chunk, by which point its query is running, so that
+    # a failure to open the connection, attach an archive or start the query is raised to the view (and
+    # answered with an error status) instead of cutting short a response already sent as 200 OK.
+    next(stream)
+    return stream
+
+
+def stream_json_rows(query, params, span=None, archive=None, pool=None, key=None, limit=None):
+    # Yields a JSON array straight from the cursor in fetchmany() chunks, so memory stays
+    # constant no matter how many rows match. The pooled connection (and any archives the
+    # span reaches) is held until the generator is exhausted or closed by a client disconnect.
+    # Streams run after the request's app context ends, so callers pass the app's pool and archive.
+    with span_cursor(pool or get_pool(), query, params, span, archive, key, limit) as cursor:
+        yield ""
+        yield "["
+        separator = ""
+        while True:
+            rows = cursor.fetchmany(STREAM_CHUNK_SIZE)
+            if not rows:
+                break
+            with serialize_timer():
+                chunk = separator + ",".join(json.dumps(dict(row)) for row in rows)
+            yield chunk
+            separator = ","
+        yield "]"
+
+
+# Route Logic
+# Each function takes plain arguments and returns (payload, status), so the Flask views below and
+# the async views in asgi.py share one implementation. A generator payload is streamed as JSON.
+def create_expense(data):
+    row, error = validate_expense(data)
+    if error:
+        return {"error": error}, 400
+
+    # Insert into database
+    try:
+        result = execute_write(INSERT_EXPENSE, row)
+    except sqlite3.Error as e:
+        return {"error": f"Database error: {str(e)}"}, 500
+    invalidate_cache(result.version, [(row[1], row[2])])
+    sync_columnar(result.version, [(result.lastrowid, row[0], row[1], row[2])])
+    return {"message": "Expense added successfully", "id": result.lastrowid}, 201
+
+
+def create_bulk_expenses(data):
+    # Expecting a list of expense objects
     if not isinstance(data, list) or len(data) == 0:
-        return jsonify({"error": "Invalid input format. Expected a list of expenses."}), 400
+        return {"error": "Invalid input format. Expected a list of expenses."}, 400
 
     formatted_data = []
     for expense in data:
@@ -154,104 +718,909 @@ def add_bulk_expenses():
             if cost is None or date is None or category is None:
                 continue  # Skip invalid records
 
-            formatted_date = datetime.strptime(date, "%Y-%m-%d").strftime("%Y-%m-%d")
+            formatted_date = datetime.strptime(date, "%Y-%m-%d").date().isoformat()
             formatted_data.append((cost, formatted_date, category, description))
 
-        except ValueError:
-            continue  # Skip invalid date formats
+        except (AttributeError, TypeError, ValueError):
+            continue  # Skip non-objects and invalid date formats
+
+    if not formatted_data:
+        return {"error": "No valid expenses to insert"}, 400
+
+    # Nested `with` returns the connection to the pool and commits (or rolls back) the batch
+    try:
+        with db_connection() as conn, conn:
+            conn.executemany(INSERT_EXPENSE, formatted_data)
+            version = bump_data_version(conn)
+            added = recent_inserts(conn, len(formatted_data))
+    except sqlite3.Error as e:
+        return {"error": f"Database error: {str(e)}"}, 500
+    invalidate_cache(version, [(date, category) for _, date, category, _ in formatted_data])
+    sync_columnar(version, added)
+
+    return {"message": f"Successfully inserted {len(formatted_data)} expenses"}, 201
+
+
+def search_expression(q):
+    # Turns free text into an FTS5 query that cannot be a syntax error: "quoted phrases" stay phrases,
+    # word* is a prefix search and every term must match. None when q has nothing to search for.
+    terms = []
+    for phrase, word in SEARCH_TERMS.findall(q):
+        prefix = not phrase and word.endswith("*")
+        text = phrase or word.rstrip("*")
+        if any(char.isalnum() for char in text):
+            terms.append('"' + text.replace('"', '""') + '"' + ("*" if prefix else ""))
+    return " ".join(terms) or None
+
+
+def search_expenses(args):
+    # Full-text search over descriptions (?q=), narrowed by the month/year/category filters. Newest
+    # matches come first, paged by keyset (?limit=N&after_id=X) straight off the index's rowid order.
+    # ?order=rank sorts by bm25 relevance instead, paged with ?offset=M: every match must be scored,
+    # so it costs time in proportion to how common the terms are.
+    expression = search_expression(args.get('q', ''))
+    if expression is None:
+        return {"error": "q must contain at least one word to search for"}, 400
+    by_rank = args.get('order') == "rank"
+
+    try:
+        clauses, params = build_expense_filters(args)
+        limit = int(args['limit']) if args.get('limit') is not None else None
+        after_id = int(args['after_id']) if args.get('after_id') is not None else None
+        offset = int(args.get('offset', 0))
+        year = int(args['year']) if args.get('month') and args.get('year') else None
+    except ValueError:
+        return {"error": "month, year, limit, after_id and offset must be integers"}, 400
+    if limit is not None and not 0 < limit <= MAX_PAGE_SIZE:
+        return {"error": f"limit must be between 1 and {MAX_PAGE_SIZE}"}, 400
+    if offset < 0 or (offset and not by_rank) or (after_id is not None and by_rank):
+        return {"error": "Ranked results are paged with offset, newest-first results with after_id"}, 400
+
+    if after_id is not None:
+        clauses.append("expenses_fts.rowid < ?")
+        params.append(after_id)
+    # An archived year in the span is searched on its own, with {schema} naming its tables: an FTS5 index
+    # cannot be read through a UNION ALL. The sources' rows are then merged in the requested order; ranks
+    # are compared as they are, though each archive scores against its own year's term statistics.
+    query = ("SELECT {columns} FROM {schema}expenses_fts JOIN {schema}expenses ON expenses.id = expenses_fts.rowid "
+             "WHERE expenses_fts MATCH ?")
+    query += "".join(f" AND {clause}" for clause in clauses)
+    query += " ORDER BY rank, expenses_fts.rowid" if by_rank else " ORDER BY expenses_fts.rowid DESC"
+    params = [expression, *params]
+    archive = get_archive()
+    try:
+        with db_connection() as conn:
+            years = sorted(archive.catalog(conn, year, year))
+            columns = "expenses.*, expenses_fts.rank AS search_rank" if by_rank and years else "expenses.*"
+            # One extra row tells us whether another page exists
+            if years:
+                suffix = f" LIMIT {offset + limit + 1}" if limit is not None else ""
+            else:
+                suffix = f" LIMIT {limit + 1}" if limit is not None else ""
+                if by_rank and offset:
+                    suffix += f" OFFSET {offset}" if limit is not None else f" LIMIT -1 OFFSET {offset}"
+            results = [conn.execute(query.format(columns=columns, schema="") + suffix, params).fetchall()]
+            for archived in years:
+                with archive.tables(conn, archived, archived, hot=False):
+                    results.append(conn.execute(
+                        query.format(columns=columns, schema=f"{schema_name(archived)}.") + suffix, params).fetchall())
+    except (sqlite3.Error, ArchiveError) as e:
+        if "no such table: expenses_fts" in str(e):
+            return {"error": "Description search is unavailable: SQLite was built without FTS5"}, 501
+        return {"error": f"Database error: {str(e)}"}, 500
+    expenses = results[0]
+    if years:
+        merged = heapq.merge(*results, key=itemgetter("search_rank", "id") if by_rank else lambda row: -row["id"])
+        expenses = [{name: row[name] for name in row.keys() if name != "search_rank"}
+                    for row in islice(merged, offset, None if limit is None else offset + limit + 1)]
+    if limit is None:
+        return expense_rows(expenses, args), 200
+
+    rows = expenses[:limit]
+    next_cursor = None
+    if len(expenses) > limit:
+        next_cursor = {"offset": offset + limit} if by_rank else {"after_id": rows[-1]["id"]}
+    return {"expenses": expense_rows(rows, args), "next_cursor": next_cursor}, 200
+
+
+def list_expenses(args):
+    # Optional keyset pagination: ?limit=N&after_id=X, or ?limit=N&after_date=D&after_id=X for date order.
+    # Optional streaming: ?stream=1 sends the rows as a chunked JSON array instead of building the list in memory.
+    # Optional search: ?q= ranks matching descriptions (see search_expenses).
+    # Optional ?format=columns: rows as parallel arrays per column (not with stream).
+    # A month in an archived year is read from that year's archive as well; other listings span them all.
+    if args.get('format', 'rows') not in ROW_FORMATS:
+        return {"error": f"format must be one of: {', '.join(ROW_FORMATS)}"}, 400
+    if args.get('q') is not None:
+        return search_expenses(args)
+    limit = args.get('limit')
+    after_id = args.get('after_id')
+    after_date = args.get('after_date')
+    order = "date" if after_date is not None or args.get('order') == "date" else "id"
+    stream = args.get('stream', '').lower() in ("1", "true")
+
+    try:
+        clauses, params = build_expense_filters(args)
+        limit = int(limit) if limit is not None else None
+        after_id = int(after_id) if after_id is not None else None
+        year = int(args['year']) if args.get('month') and args.get('year') else None
+    except ValueError:
+        return {"error": "month, year, limit and after_id must be integers"}, 400
+    span = (year, year)
+
+    if limit is not None and not 0 < limit <= MAX_PAGE_SIZE:
+        return {"error": f"limit must be between 1 and {MAX_PAGE_SIZE}"}, 400
+    if after_date is not None and after_id is None:
+        return {"error": "after_date requires after_id"}, 400
+    if stream and args.get('format') == "columns":
+        return {"error": "format=columns cannot be streamed"}, 400
 
-    if formatted_data:
-        # Use `with` statement to ensure commit and close happen properly
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.executemany("INSERT INTO expenses (cost, date, category, description) VALUES (?, ?, ?, ?)",
-                               formatted_data)
-            conn.commit()
+    # Keyset cursor: seek past the last row of the previous page instead of using OFFSET
+    if after_date is not None:
+        clauses.append("(date, id) > (?, ?)")
+        params.extend([after_date, after_id])
+    elif after_id is not None:
+        clauses.append("id > ?")
+        params.append(after_id)
 
-        return jsonify({"message": f"Successfully inserted {len(formatted_data)} expenses"}), 201
+    query = "SELECT * FROM {expenses}"
+    if clauses:
+        query += " WHERE " + " AND ".join(clauses)
+    key = itemgetter("date", "id") if order == "date" else itemgetter("id")
+    if limit is not None or after_id is not None or stream:
+        query += " ORDER BY date, id" if order == "date" else " ORDER BY id"
+
+    if stream:
+        if limit is not None:
+            query += f" LIMIT {limit}"
+        try:
+            return primed(stream_json_rows(query, params, span, get_archive(), get_pool(), key, limit)), 200
+        except (sqlite3.Error, ArchiveError) as e:
+            return {"error": f"Database error: {str(e)}"}, 500
+
+    if limit is None:
+        expenses = execute_query(query, params, fetch_all=True, span=span)
+        if isinstance(expenses, dict):
+            return expenses, 500
+        return expense_rows(expenses, args), 200
+
+    # Fetch one extra row to learn whether another page exists
+    expenses = execute_query(query + f" LIMIT {limit + 1}", params, fetch_all=True, span=span, key=key)
+    if isinstance(expenses, dict):
+        return expenses, 500
+
+    rows = expenses[:limit]
+    next_cursor = None
+    if len(expenses) > limit:
+        last = rows[-1]
+        next_cursor = {"after_date": last["date"], "after_id": last["id"]} if order == "date" else {"after_id": last["id"]}
+
+    return {"expenses": expense_rows(rows, args), "next_cursor": next_cursor}, 200
+
+
+def summarize_month(args):
+    month, year = args.get('month'), args.get('year')
+    if not month or not year:
+        return {"error": "Month and Year parameters are required"}, 400
+
+    try:
+        month, year = int(month), int(year)
+    except ValueError:
+        return {"error": "Month and Year must be integers"}, 400
+
+    # Category-wise totals come from the columnar store when it is enabled, otherwise straight from the
+    # trigger-maintained rollups (a primary-key range lookup). An archived year adds its archive's rollups
+    # to whatever was written to that year since.
+    if get_columnar() is not None and 1 <= month <= 12 and 1 <= year <= 9999:
+        start = datetime(year, month, 1).date()
+        try:
+            totals = category_totals(start, start.replace(day=calendar.monthrange(year, month)[1]))
+        except (sqlite3.Error, ArchiveError) as e:
+            return {"error": f"Database error: {str(e)}"}, 500
+        return totals_payload(totals), 200
+
+    query = "SELECT category, total_cents FROM {rollups} WHERE year = ? AND month = ? ORDER BY category"
+    rows = execute_query(query, (year, month), fetch_all=True, span=(year, year))
+    if isinstance(rows, dict):
+        return rows, 500
+    totals = {}
+    for name, cents in rows:
+        totals[name] = totals.get(name, 0) + cents
+    return totals_payload(totals), 200
+
+
+def summarize_range(args):
+    # Per-category and overall totals for any date range: ?start=YYYY-MM-DD&end=YYYY-MM-DD[&category=]
+    start, end, category = args.get('start'), args.get('end'), args.get('category')
+    if not start or not end:
+        return {"error": "start and end parameters are required"}, 400
+    start, end = validate_date(start), validate_date(end)
+    if start is None or end is None:
+        return {"error": "start and end must be dates in YYYY-MM-DD format"}, 400
+    if category is not None and category not in CATEGORIES:
+        return {"error": f"Invalid category. Expected one of: {', '.join(CATEGORIES)}."}, 400
+
+    try:
+        totals = category_totals(datetime.strptime(start, "%Y-%m-%d").date(),
+                                 datetime.strptime(end, "%Y-%m-%d").date(), category)
+    except (sqlite3.Error, ArchiveError) as e:
+        return {"error": f"Database error: {str(e)}"}, 500
+    return {"start": start, "end": end, **totals_payload(totals)}, 200
+
+
+def summarize_trends(args):
+    # Per-period totals by category over ?start=&end= for period=day|week|month|year (default month),
+    # optionally narrowed to one category, with an optional trailing moving average (?window=N) and
+    # period-over-period deltas (?deltas=1). Missing periods are zero-filled.
+    start, end, category = args.get('start'), args.get('end'), args.get('category')
+    period = args.get('period', 'month')
+    if period not in PERIODS:
+        return {"error": f"Invalid period. Expected one of: {', '.join(PERIODS)}."}, 400
+    if not start or not end:
+        return {"error": "start and end parameters are required"}, 400
+    start, end = validate_date(start), validate_date(end)
+    if start is None or end is None:
+        return {"error": "start and end must be dates in YYYY-MM-DD format"}, 400
+    if category is not None and category not in CATEGORIES:
+        return {"error": f"Invalid category. Expected one of: {', '.join(CATEGORIES)}."}, 400
+    try:
+        window = int(args['window']) if args.get('window') else None
+    except ValueError:
+        return {"error": "window must be an integer"}, 400
+    if window is not None and window < 1:
+        return {"error": "window must be at least 1"}, 400
+
+    first, last = datetime.strptime(start, "%Y-%m-%d").date(), datetime.strptime(end, "%Y-%m-%d").date()
+    if first > last:
+        return {"error": "start must not be after end"}, 400
+    if period_count(first, last, period) > MAX_TREND_PERIODS:
+        return {"error": f"At most {MAX_TREND_PERIODS} periods per request; use a longer period or a shorter range"}, 400
+
+    labels = period_labels(first, last, period)
+    index = {label: i for i, label in enumerate(labels)}
+    cents = {}
+    filter_clause, filter_params = category_filter(category)
+
+    # Month and year series read whole months from the rollups (a primary-key range). Every other
+    # day is summed per (category, day) from one covering index range scan and folded into periods.
+    scans = [(first, last)]
+    span = whole_months(first, last) if period in ("month", "year") else None
+    if span is not None:
+        query = ("SELECT year, month, category, total_cents FROM {rollups} "
+                 f"WHERE (year, month) BETWEEN (?, ?) AND (?, ?) AND {filter_clause}")
+        rows = execute_query(query, [span[0].year, span[0].month, span[1].year, span[1].month, *filter_params],
+                             fetch_all=True, span=(first.year, last.year))
+        if isinstance(rows, dict):
+            return rows, 500
+        for year, month, name, total in rows:
+            cents.setdefault(name, [0] * len(labels))[index[period_key(f"{year:04d}-{month:02d}", period)]] += total
+        # The days before and after the whole months (never stepping past date.min or date.max)
+        scans = []
+        if first < span[0]:
+            scans.append((first, span[0] - timedelta(days=1)))
+        if span[1] < last:
+            scans.append((span[1] + timedelta(days=1), last))
+
+    query = ("SELECT date, category, SUM(CAST(ROUND(cost * 100) AS INTEGER)) FROM {expenses} "
+             f"WHERE {filter_clause} AND date BETWEEN ? AND ? GROUP BY category, date")
+    for lo, hi in scans:
+        rows = execute_query(query, [*filter_params, lo.isoformat(), hi.isoformat()], fetch_all=True,
+                             span=(lo.year, hi.year))
+        if isinstance(rows, dict):
+            return rows, 500
+        for day, name, total in rows:
+            cents.setdefault(name, [0] * len(labels))[index[period_key(day, period)]] += total
+    overall = [sum(column) for column in zip(*cents.values())] if cents else [0] * len(labels)
+
+    def series(values):
+        totals = [value / 100 for value in values]
+        entry = {"totals": totals}
+        if window is not None:
+            entry["moving_average"] = moving_average(totals, window)
+        if args.get('deltas', '').lower() in ("1", "true"):
+            entry["deltas"] = deltas(totals)
+        return entry
+
+    return {
+        "period": period,
+        "start": start,
+        "end": end,
+        "periods": labels,
+        "categories": [{"category": name, **series(values)} for name, values in sorted(cents.items())],
+        "overall": series(overall),
+    }, 200
+
+
+def fetch_expense(id):
+    # An id missing from the hot table may belong to an archived year; those are looked up in every archive
+    expense = execute_query("SELECT * FROM expenses WHERE id=?", (id,), fetch_one=True)
+    if expense is None:
+        expense = execute_query("SELECT * FROM {expenses} WHERE id=?", (id,), fetch_one=True, span=(None, None))
+    if isinstance(expense, dict):
+        return expense, 500
+    return (dict(expense), 200) if expense else ({"error": "Expense not found"}, 404)
+
+
+def replace_expense(id, data):
+    row, error = validate_expense(data)
+    if error:
+        return {"error": error}, 400
+    cost, formatted_date, category, description = row
+
+    query = "UPDATE expenses SET cost=?, date=?, category=?, description=? WHERE id=? RETURNING id, cost, date, category"
+    try:
+        # The old partition is read first so cached responses for the month it leaves are dropped too
+        old = execute_query("SELECT date, category FROM expenses WHERE id=?", (id,), fetch_one=True)
+        result = execute_write(query, (cost, formatted_date, category, description, id))
+        touched = [(formatted_date, category)] + ([tuple(old)] if old and not isinstance(old, dict) else [])
+        invalidate_cache(result.version, touched)
+        sync_columnar(result.version, result.rows)
+    except sqlite3.Error as e:
+        return {"error": f"Database error: {str(e)}"}, 500
+
+    return {"message": "Expense updated successfully"}, 200
+
+
+def remove_expense(id):
+    # A single DELETE; the affected row count tells us whether the expense existed
+    try:
+        result = execute_write("DELETE FROM expenses WHERE id=? RETURNING date, category", (id,))
+    except sqlite3.Error as e:
+        return {"error": f"Database error: {str(e)}"}, 500
+    invalidate_cache(result.version, result.rows)
+    sync_columnar(result.version, deletes=[id] if result.rowcount else [])
+    if not result.rowcount:
+        return {"error": f"Expense with ID {id} not found."}, 404
+
+    return {"message": f"Expense with ID {id} deleted successfully."}, 200
+
+
+def delete_chunk(conn, condition, params):
+    # Deletes the matching rows in one transaction and feeds them to the caches. Returns the count.
+    with conn:
+        rows = conn.execute(f"DELETE FROM expenses WHERE {condition} RETURNING id, date, category", params).fetchall()
+        version = bump_data_version(conn) if rows else None
+    invalidate_cache(version, [(row['date'], row['category']) for row in rows])
+    sync_columnar(version, deletes=[row['id'] for row in rows])
+    return len(rows)
+
+
+def selection_filters(data, required=True):
+    # WHERE clauses for an id range {"min_id", "max_id"} and/or the /expenses filters {"month", "year",
+    # "category"}, combined with AND. Returns (clauses, params, error message or None).
+    min_id, max_id = data.get('min_id'), data.get('max_id')
+    filters = {key: data.get(key) for key in ('month', 'year', 'category')}
+    if any(bound is not None and type(bound) is not int for bound in (min_id, max_id)):
+        return None, None, "min_id and max_id must be integers"
+    if (filters['month'] is None) != (filters['year'] is None):
+        return None, None, "month and year must be given together"
+    if filters['category'] is not None and filters['category'] not in CATEGORIES:
+        return None, None, f"Invalid category. Expected one of: {', '.join(CATEGORIES)}."
+    try:
+        if filters['month'] is not None:
+            filters['month'], filters['year'] = int(filters['month']), int(filters['year'])
+    except (TypeError, ValueError):
+        return None, None, "month and year must be integers"
+    if required and min_id is None and max_id is None and not any(filters.values()):
+        return None, None, "Specify ids, an id range (min_id/max_id), or month/year/category filters."
+
+    clauses, params = build_expense_filters(filters)
+    for bound, op in ((min_id, ">="), (max_id, "<=")):
+        if bound is not None:
+            clauses.append(f"id {op} ?")
+            params.append(bound)
+    return clauses, params, None
+
+
+def delete_expenses(data):
+    # Deletes by {"ids": [...]}, an id range {"min_id", "max_id"} and/or the /expenses filters
+    # {"month", "year", "category"}; criteria combine with AND. Rows go DELETE_CHUNK_SIZE per
+    # transaction, so other writers get the lock between chunks, and RETURNING supplies what the
+    # caches need without a pre-read.
+    if not isinstance(data, dict):
+        return {"error": "Invalid input format. Expected a JSON object."}, 400
+
+    ids = data.get('ids')
+    if ids is not None and (not isinstance(ids, list) or not all(type(i) is int for i in ids)):
+        return {"error": "ids must be a list of integers"}, 400
+    clauses, params, error = selection_filters(data, required=ids is None)
+    if error:
+        return {"error": error}, 400
+    where = " AND ".join(clauses)
+
+    deleted = 0
+    try:
+        with db_connection() as conn:
+            if ids is not None:
+                # One IN list per chunk; duplicates would only inflate the bound parameters
+                unique = sorted(set(ids))
+                for start in range(0, len(unique), DELETE_CHUNK_SIZE):
+                    part = unique[start:start + DELETE_CHUNK_SIZE]
+                    condition = f"id IN ({', '.join('?' * len(part))})" + (f" AND {where}" if where else "")
+                    deleted += delete_chunk(conn, condition, [*part, *params])
+            else:
+                # Re-seek the first chunk of matching ids until one comes back short
+                condition = f"id IN (SELECT id FROM expenses WHERE {where} LIMIT {DELETE_CHUNK_SIZE})"
+                while True:
+                    count = delete_chunk(conn, condition, params)
+                    deleted += count
+                    if count < DELETE_CHUNK_SIZE:
+                        break
+    except sqlite3.Error as e:
+        return {"error": f"Database error: {str(e)}", "deleted": deleted}, 500
+
+    return {"message": f"Successfully deleted {deleted} expenses", "deleted": deleted}, 200
+
+
+def validate_patch(patch):
+    # Validates one {"id": ..., field: value, ...} patch. Returns (id, {column: value}, None) or
+    # (id or None, None, error message).
+    if not isinstance(patch, dict):
+        return None, None, "Expected a patch object."
+    id = patch.get('id')
+    if type(id) is not int:
+        return None, None, "id must be an integer"
+    values, error = validate_fields({key: value for key, value in patch.items() if key != 'id'})
+    return (id, None, error) if error else (id, values, None)
+
+
+def validate_fields(fields):
+    # Validates the columns a patch sets; returns ({column: value}, None) or (None, error message)
+    if not isinstance(fields, dict):
+        return None, "Expected an object of fields to set."
+    unknown = sorted(set(fields) - set(PATCH_FIELDS))
+    if unknown:
+        return None, f"Unknown fields: {', '.join(unknown)}. Expected any of: {', '.join(PATCH_FIELDS)}."
+    if not fields:
+        return None, f"Nothing to update. Expected any of: {', '.join(PATCH_FIELDS)}."
+    values = {}
+    for name in PATCH_FIELDS:
+        if name in fields:
+            values[name], error = check_field(name, fields[name])
+            if error:
+                return None, error
+    return values, None
+
+
+def rows_by_id(conn, columns, ids):
+    # The rows for `ids`, read with one IN list per ID_LIST_SIZE ids
+    rows = []
+    for start in range(0, len(ids), ID_LIST_SIZE):
+        part = ids[start:start + ID_LIST_SIZE]
+        rows += conn.execute(f"SELECT {columns} FROM expenses WHERE id IN ({', '.join('?' * len(part))})", part)
+    return rows
+
+
+def apply_patches(conn, patches=(), selection=None):
+    # Applies [(id, {column: value})] patches, or one {column: value} to every row matching
+    # selection = (where, params, values), in a single transaction: one executemany per run of
+    # consecutive patches with the same columns, so patches to one id still land in request order.
+    # Returns the ids that existed (and so were updated).
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")  # Hold the write lock from the first read, so old rows stay accurate
+        if selection is not None:
+            where, params, values = selection
+            patches = [(row[0], values) for row in conn.execute(f"SELECT id FROM expenses WHERE {where}", params)]
+        old = {row['id']: row for row in rows_by_id(conn, "id, date, category", sorted({id for id, _ in patches}))}
+
+        found = [(id, values) for id, values in patches if id in old]
+        for columns, run in groupby(found, key=lambda patch: tuple(patch[1])):
+            conn.executemany(f"UPDATE expenses SET {', '.join(f'{column} = ?' for column in columns)} WHERE id = ?",
+                             [(*values.values(), id) for id, values in run])
+        new = rows_by_id(conn, "id, cost, date, category", sorted(old))
+        version = bump_data_version(conn) if old else None
+
+    # A row that moved leaves its old month and category too
+    invalidate_cache(version, [(row['date'], row['category']) for row in (*old.values(), *new)])
+    sync_columnar(version, new)
+    return set(old)
+
+
+def patch_expenses(data):
+    # Partial updates in one transaction, either a list of {"id": ..., field: value, ...} patches or
+    # {"filter": {same keys as /bulk_delete except ids}, "set": {field: value, ...}}.
+    # Every patch is validated first; invalid ones are reported and skipped, the rest applied.
+    if isinstance(data, dict) and 'set' in data:
+        selection_data = data.get('filter')
+        if not isinstance(selection_data, dict):
+            return {"error": "filter must be an object"}, 400
+        clauses, params, error = selection_filters(selection_data)
+        if error:
+            return {"error": error}, 400
+        values, error = validate_fields(data['set'])
+        if error:
+            return {"error": error}, 400
+        try:
+            with db_connection() as conn:
+                updated = apply_patches(conn, selection=(" AND ".join(clauses), params, values))
+        except sqlite3.Error as e:
+            return {"error": f"Database error: {str(e)}"}, 500
+        results = [{"id": id, "status": "updated"} for id in sorted(updated)]
+        return {"updated": len(updated), "results": results}, 200
+
+    if not isinstance(data, list) or len(data) == 0:
+        return {"error": "Invalid input format. Expected a list of patches or a filter and set."}, 400
+    if len(data) > MAX_PATCHES:
+        return {"error": f"At most {MAX_PATCHES} patches per request"}, 400
+
+    results, patches = [], []
+    for index, patch in enumerate(data):
+        id, values, error = validate_patch(patch)
+        if error:
+            results.append({"index": index, "id": id, "status": "invalid", "error": error})
+        else:
+            results.append({"index": index, "id": id})
+            patches.append((id, values))
+
+    try:
+        with db_connection() as conn:
+            updated = apply_patches(conn, patches) if patches else set()
+    except sqlite3.Error as e:
+        return {"error": f"Database error: {str(e)}"}, 500
+
+    for result in results:
+        if "status" not in result:
+            result["status"] = "updated" if result["id"] in updated else "not_found"
+    count = sum(result["status"] == "updated" for result in results)
+    if count:
+        status = 200
     else:
-        return jsonify({"error": "No valid expenses to insert"}), 400
+        status = 400 if any(result["status"] == "invalid" for result in results) else 404
+    return {"updated": count, "results": results}, status
 
 
+def modify_expense(id, data):
+    # A partial update of one expense: only the fields given are changed
+    if not isinstance(data, dict):
+        return {"error": f"Expected an object with any of: {', '.join(PATCH_FIELDS)}."}, 400
+    values, error = validate_fields(data)
+    if error:
+        return {"error": error}, 400
+    try:
+        with db_connection() as conn:
+            updated = apply_patches(conn, [(id, values)])
+    except sqlite3.Error as e:
+        return {"error": f"Database error: {str(e)}"}, 500
+    if not updated:
+        return {"error": f"Expense with ID {id} not found."}, 404
+    return {"message": "Expense updated successfully"}, 200
 
-@app.route('/expenses', methods=['GET'])
-def get_expenses():
-    month, year, category = request.args.get('month'), request.args.get('year'), request.args.get('category')
 
-    query = "SELECT * FROM expenses WHERE 1=1"
-    params = []
+def respond(payload, status):
+    # Turns a route-logic result into a Flask response
+    if isinstance(payload, GeneratorType):
+        return Response(payload, status=status, mimetype="application/json")
+    return jsonify(payload), status
 
-    if month and year:
-        query += " AND date BETWEEN ? AND ?"
-        params.extend([f"{year}-{int(month):02d}-01", f"{year}-{int(month):02d}-31"])
 
-    if category:
-        query += " AND category = ?"
-        params.append(category)
+# Routes
+@bp.route('/')
+def home():
+    return jsonify({"message": "Expense Tracker API is running"}), 200
 
-    expenses = execute_query(query, params, fetch_all=True)
-    return jsonify([dict(exp) for exp in expenses])
+
+@bp.route('/expense', methods=['POST'])
+def add_expense():
+    return respond(*create_expense(request.get_json(silent=True)))
+
+
+@bp.route('/bulk_expense', methods=['POST'])
+def add_bulk_expenses():
+    return respond(*create_bulk_expenses(request.get_json(silent=True)))
 
 
-@app.route('/summary', methods=['GET'])
+@bp.route('/expenses', methods=['GET'])
+@conditional
+@cached(expenses_partition)
+def get_expenses():
+    return respond(*list_expenses(request.args))
+
+
+@bp.route('/summary', methods=['GET'])
+@conditional
+@cached(summary_partition)
 def get_summary():
-    month, year = request.args.get('month'), request.args.get('year')
-    if not month or not year:
-        return jsonify({"error": "Month and Year parameters are required"}), 400
-
-    # Get category-wise totals
-    query = """
-        SELECT category, SUM(cost) as total_cost 
-        FROM expenses 
-        WHERE strftime('%m', date) = ? AND strftime('%Y', date) = ?
-        GROUP BY category
-    """
-    category_totals = execute_query(query, (month.zfill(2), year), fetch_all=True)
+    return respond(*summarize_month(request.args))
 
-    # Get overall total
-    total_query = "SELECT SUM(cost) as total_cost FROM expenses WHERE strftime('%m', date) = ? AND strftime('%Y', date) = ?"
-    overall_total = execute_query(total_query, (month.zfill(2), year), fetch_one=True)
 
-    return jsonify({
-        "category_totals": [{"category": row[0], "total_cost": row[1]} for row in category_totals],
-        "overall_total": overall_total[0] if overall_total else 0
-    })
+@bp.route('/totals', methods=['GET'])
+@conditional
+def get_totals():
+    return respond(*summarize_range(request.args))
+
 
+@bp.route('/trends', methods=['GET'])
+@conditional
+@cached(trends_partition)
+def get_trends():
+    return respond(*summarize_trends(request.args))
 
-@app.route('/expense/<int:id>', methods=['GET'])
+
+@bp.route('/expense/<int:id>', methods=['GET'])
+@conditional
 def get_expense(id):
-    expense = execute_query("SELECT * FROM expenses WHERE id=?", (id,), fetch_one=True)
-    return jsonify(dict(expense)) if expense else jsonify({"error": "Expense not found"}), 404
+    return respond(*fetch_expense(id))
 
 
-@app.route('/expense/<int:id>', methods=['PUT'])
+@bp.route('/expense/<int:id>', methods=['PUT'])
 def update_expense(id):
-    data = request.json
-    cost, date, category = data.get('cost'), data.get('date'), data.get('category')
-    description = data.get('description', '')
+    return respond(*replace_expense(id, request.get_json(silent=True)))
 
-    if None in [cost, date, category]:
-        return jsonify({"error": "Missing required fields: cost, date, category"}), 400
 
-    formatted_date = validate_date(date) if isinstance(date, str) else datetime.fromtimestamp(date).strftime("%Y-%m-%d")
-    if not formatted_date:
-        return jsonify({"error": "Invalid date format"}), 400
+@bp.route('/expense/<int:id>', methods=['DELETE'])
+def delete_expense(id):
+    return respond(*remove_expense(id))
 
-    query = "UPDATE expenses SET cost=?, date=?, category=?, description=? WHERE id=?"
-    execute_query(query, (cost, formatted_date, category, description, id), commit=True)
 
-    return jsonify({"message": "Expense updated successfully"})
+@bp.route('/expense/<int:id>', methods=['PATCH'])
+def patch_expense(id):
+    return respond(*modify_expense(id, request.get_json(silent=True)))
 
 
-@app.route('/expense/<int:id>', methods=['DELETE'])
-def delete_expense(id):
-    expense = execute_query("SELECT * FROM expenses WHERE id=?", (id,), fetch_one=True)
-    if not expense:
-        return jsonify({"error": f"Expense with ID {id} not found."}), 404
+@bp.route('/expenses', methods=['PATCH'])
+def patch_expense_batch():
+    return respond(*patch_expenses(request.get_json(silent=True)))
+
+
+@bp.route('/bulk_delete', methods=['POST'])
+def delete_bulk_expenses():
+    return respond(*delete_expenses(request.get_json(silent=True)))
+
+
+class RawInput(io.RawIOBase):
+    # Adapts a WSGI input stream that only offers read(n) (e.g. Gunicorn's) to the io stack
+    def __init__(self, stream):
+        self.stream = stream
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self.stream.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def iter_import_records(stream, fmt):
+    # Lazily yields (line_number, record or None, parse error or None) from an NDJSON or CSV body.
+    text = io.TextIOWrapper(io.BufferedReader(RawInput(stream)), encoding="utf-8", newline="")
+    if fmt == "csv":
+        reader = csv.DictReader(text)
+        for record in reader:
+            # Empty cells count as missing fields
+            yield reader.line_num, {key: (value if value != "" else None) for key, value in record.items()}, None
+        return
+
+    for line_number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line), None
+        except json.JSONDecodeError as e:
+            yield line_number, None, f"Invalid JSON: {e.msg}"
+
+
+def insert_import_chunk(conn, chunk, rejected):
+    # Commits one chunk of validated rows. If the batch insert trips a constraint, the chunk is
+    # retried row by row so only the offending rows are rejected. Returns the number inserted.
+    rows = [row for _, row in chunk]
+    touched = [(date, category) for _, date, category, _ in rows]
+    try:
+        with conn:
+            conn.executemany(INSERT_EXPENSE, rows)
+            version = bump_data_version(conn)
+            added = recent_inserts(conn, len(rows))
+        invalidate_cache(version, touched)
+        sync_columnar(version, added)
+        return len(rows)
+    except sqlite3.IntegrityError:
+        pass
+
+    inserted = 0
+    with conn:
+        for line_number, row in chunk:
+            try:
+                conn.execute(INSERT_EXPENSE, row)
+                inserted += 1
+            except sqlite3.IntegrityError as e:
+                rejected.append({"line": line_number, "error": f"Database error: {str(e)}"})
+        version = bump_data_version(conn) if inserted else None
+        added = recent_inserts(conn, inserted)
+    invalidate_cache(version, touched)
+    sync_columnar(version, added)
+    return inserted
+
+
+def import_records(stream, args, mimetype):
+    # Route logic for POST /import (shared with asgi.py): streams an NDJSON (default) or CSV body
+    # (?format=csv or Content-Type: text/csv) from `stream`, anything with a blocking read(n), into the
+    # database, committing every chunk_size rows so memory is bounded by the chunk, not the file.
+    fmt = args.get('format') or ("csv" if mimetype == "text/csv" else "ndjson")
+    if fmt not in ("ndjson", "csv"):
+        return {"error": "Unsupported format. Expected ndjson or csv."}, 400
+
+    try:
+        chunk_size = int(args.get('chunk_size', IMPORT_CHUNK_SIZE))
+    except ValueError:
+        return {"error": "chunk_size must be an integer"}, 400
+    if not 0 < chunk_size <= MAX_IMPORT_CHUNK_SIZE:
+        return {"error": f"chunk_size must be between 1 and {MAX_IMPORT_CHUNK_SIZE}"}, 400
+
+    inserted, rejected, chunk = 0, [], []
+    try:
+        with pooled_connection() as conn:
+            for line_number, record, parse_error in iter_import_records(stream, fmt):
+                row, error = (None, parse_error) if parse_error else validate_expense(record)
+                if error:
+                    rejected.append({"line": line_number, "error": error})
+                    continue
+
+                chunk.append((line_number, row))
+                if len(chunk) >= chunk_size:
+                    with db_timer():
+                        inserted += insert_import_chunk(conn, chunk, rejected)
+                    chunk = []
+
+            if chunk:
+                with db_timer():
+                    inserted += insert_import_chunk(conn, chunk, rejected)
+    except (UnicodeDecodeError, csv.Error) as e:
+        return {"error": f"Unreadable input: {str(e)}", "inserted": inserted,
+                "rejected_count": len(rejected), "rejected": rejected}, 400
+    except sqlite3.Error as e:
+        return {"error": f"Database error: {str(e)}", "inserted": inserted,
+                "rejected_count": len(rejected), "rejected": rejected}, 500
+
+    report = {"inserted": inserted, "rejected_count": len(rejected), "rejected": rejected}
+    return report, 201 if inserted else 400
+
+
+@bp.route('/import', methods=['POST'])
+def import_expenses():
+    return respond(*import_records(request.stream, request.args, request.mimetype))
+
+
+def stream_export(query, params, fmt, span=None, archive=None, pool=None, key=None):
+    # Runs the export query on a pooled connection held for the life of the response (with any
+    # archived years in span attached) and yields the encoded chunks, so memory is bounded by one
+    # batch however many rows match
+    with span_cursor(pool or get_pool(), query, params, span, archive, key) as cursor:
+        yield ""
+        chunks = EXPORT_WRITERS[fmt](cursor)
+        while True:
+            with serialize_timer():  # Encoding time, less the fetches the writer makes
+                chunk = next(chunks, None)
+            if chunk is None:
+                break
+            if chunk:
+                yield chunk
+
+
+@bp.route('/export', methods=['GET'])
+@conditional
+def export_expenses():
+    # Full or filtered history as CSV (default), Parquet or an Arrow IPC stream:
+    # ?format=csv|parquet|arrow&start=YYYY-MM-DD&end=YYYY-MM-DD&category=
+    fmt = request.args.get('format', 'csv')
+    start, end, category = request.args.get('start'), request.args.get('end'), request.args.get('category')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({"error": f"Unsupported format. Expected one of: {', '.join(EXPORT_FORMATS)}."}), 400
+    if fmt != "csv" and not arrow_available():
+        return jsonify({"error": f"{fmt} export requires pyarrow, which is not installed"}), 501
+
+    clauses, params, bounds = [], [], {}
+    for name, bound, op in (("start", start, ">="), ("end", end, "<=")):
+        if bound is None:
+            continue
+        # Dates compare as text, so the normalized (zero-padded) date is what gets bound
+        bounds[name] = validate_date(bound)
+        if bounds[name] is None:
+            return jsonify({"error": "start and end must be dates in YYYY-MM-DD format"}), 400
+        clauses.append(f"date {op} ?")
+        params.append(bounds[name])
+    start, end = bounds.get("start"), bounds.get("end")
+    if category:
+        if category not in CATEGORIES:
+            return jsonify({"error": f"Invalid category. Expected one of: {', '.join(CATEGORIES)}."}), 400
+        clauses.append("category = ?")
+        params.append(category)
+
+    query = f"SELECT {', '.join(EXPORT_COLUMNS)} FROM {{expenses}}"
+    if clauses:
+        query += " WHERE " + " AND ".join(clauses)
+    query += " ORDER BY date, id"
+    span = (int(start[:4]) if start else None, int(end[:4]) if end else None)
+
+    try:
+        stream = primed(stream_export(query, params, fmt, span, get_archive(), get_pool(), itemgetter("date", "id")))
+    except (sqlite3.Error, ArchiveError) as e:
+        return jsonify({"error": f"Database error: {str(e)}"}), 500
+    mimetype, extension = EXPORT_FORMATS[fmt]
+    return Response(stream, mimetype=mimetype,
+                    headers={"Content-Disposition": f"attachment; filename=expenses.{extension}"})
+
+
+@bp.route('/dashboard', methods=['GET'])
+@conditional
+@cached(dashboard_partition)
+def get_dashboard():
+    # Everything the UI shows for one month in one query and one pass over the rows: the table
+    # (optionally narrowed to a category, and as parallel arrays with ?format=columns), the per-category
+    # totals and the overall total.
+    category, month, year = request.args.get('category'), request.args.get('month'), request.args.get('year')
+    if request.args.get('format', 'rows') not in ROW_FORMATS:
+        return jsonify({"error": f"format must be one of: {', '.join(ROW_FORMATS)}"}), 400
+    try:
+        clauses, params = build_expense_filters({'month': month, 'year': year})
+        span = (int(year), int(year)) if month and year else (None, None)
+    except ValueError:
+        return jsonify({"error": "Month and Year must be integers"}), 400
+
+    query = "SELECT * FROM {expenses}"
+    if clauses:
+        query += " WHERE " + " AND ".join(clauses)
+    rows = execute_query(query, params, fetch_all=True, span=span)
+    if isinstance(rows, dict):
+        return jsonify(rows), 500
+
+    expenses, totals = [], {}
+    for row in rows:
+        totals[row['category']] = totals.get(row['category'], 0) + to_cents(row['cost'])
+        if not category or row['category'] == category:
+            expenses.append(row)
+
+    return jsonify({
+        "expenses": expense_rows(expenses, request.args),
+        "category_totals": [{"category": name, "total_cost": cents / 100} for name, cents in sorted(totals.items())],
+        "overall_total": sum(totals.values()) / 100
+    })
+
+
+@bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    # Per-route latency histograms, in-flight requests, database vs serialization time and rows
+    # returned, in the Prometheus text format
+    metrics = current_app.extensions['metrics']
+    if metrics is None:
+        return jsonify({"error": "Metrics are disabled"}), 404
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+@bp.route('/admin/slow_queries', methods=['GET'])
+def get_slow_queries():
+    # The top statements by total time (or ?order=mean|max|calls) and the latest slow ones: ?limit=N
+    profiler = get_profiler()
+    if profiler is None:
+        return jsonify({"error": "SQL profiling is disabled"}), 404
+    order = request.args.get('order', 'total')
+    if order not in ("total", "mean", "max", "calls"):
+        return jsonify({"error": "order must be one of: total, mean, max, calls"}), 400
+    try:
+        limit = int(request.args.get('limit', 20))
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    if not 0 < limit <= MAX_PAGE_SIZE:
+        return jsonify({"error": f"limit must be between 1 and {MAX_PAGE_SIZE}"}), 400
+
+    return jsonify({
+        "threshold_ms": profiler.threshold * 1000,
+        "statements": profiler.top(limit, order),
+        "recent_slow": profiler.recent(limit),
+    })
+
 
-    execute_query("DELETE FROM expenses WHERE id=?", (id,), commit=True)
-    return jsonify({"message": f"Expense with ID {id} deleted successfully."}), 200
+@bp.route('/stats', methods=['GET'])
+def get_stats():
+    # Connection pool health, group-commit batching and response cache counters for monitoring
+    stats = {"pool": get_pool().stats()}
+    if current_app.config['GROUP_COMMIT']:
+        stats["write_queue"] = get_write_queue().stats()
+    stats["cache"] = get_response_cache().stats()
+    if get_columnar() is not None:
+        stats["columnar"] = get_columnar().stats()
+    return jsonify(stats)
 
 
 if __name__ == "__main__":
-    app.run(debug=True)
+    suppress_server_header()
+    create_app().run(debug=True)
@@ -0,0 +1,98 @@
+"""Production launcher for the Expense Tracker API: a pre-forking Gunicorn server.
+
+Each worker is a separate process with its own app, connection pool and response cache (built with
+routes.create_app after the fork), so request handling scales across CPU cores. Workers are recycled
+after a jittered number of requests, and `kill -HUP <master pid>` reloads them gracefully. With more than
+one worker the in-memory columnar store is off unless EXPENSE_COLUMNAR=true.
+
+Run with:  python server.py [--bind 127.0.0.1:5000] [--workers N] [--worker-class gthread|uvicorn]
+"""
+import argparse
+import multiprocessing
+import os
+
+from gunicorn.app.base import BaseApplication
+import gunicorn.http.wsgi
+
+from database import reset_after_fork
+
+DEFAULT_BIND = "127.0.0.1:5000"
+DEFAULT_THREADS = 4           # Threads per gthread worker; SQLite work releases the GIL
+MAX_REQUESTS = 10000          # Recycle a worker after this many requests...
+MAX_REQUESTS_JITTER = 1000    # ...plus up to this many, so workers do not all restart together
+GRACEFUL_TIMEOUT = 30         # Seconds a worker gets to finish in-flight requests on reload/shutdown
+KEEPALIVE = 75
+
+
+def default_workers():
+    return multiprocessing.cpu_count()
+
+
+def post_fork(server, worker):
+    # Never share SQLite connections or the writer thread with the master
+    reset_after_fork()
+
+
+class ExpenseServer(BaseApplication):
+    """Gunicorn application that builds a fresh API app in every worker."""
+
+    def __init__(self, options, config=None):
+        self.options = options
+        self.app_config = config
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            if key in self.cfg.settings and value is not None:
+                self.cfg.set(key, value)
+
+    def load(self):
+        from routes import create_app
+        return create_app(self.app_config)
+
+
+class ExpenseASGIServer(ExpenseServer):
+    """Same launcher, serving the async (ASGI) app in each worker."""
+
+    def load(self):
+        from asgi import application
+        return application
+
+
+def build_options(args):
+    options = {
+        "bind": args.bind,
+        "workers": args.workers,
+        "worker_class": "gthread",
+        "threads": args.threads,
+        "max_requests": args.max_requests,
+        "max_requests_jitter": args.max_requests_jitter,
+        "graceful_timeout": args.graceful_timeout,
+        "keepalive": KEEPALIVE,
+        "post_fork": post_fork,
+    }
+    if args.worker_class == "uvicorn":
+        # ASGI workers serve asgi.application (needs uvicorn); threads do not apply
+        options["worker_class"] = "uvicorn.workers.UvicornWorker"
+        options.pop("threads")
+    return options
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the Expense Tracker API on a multi-process server")
+    parser.add_argument("--bind", default=DEFAULT_BIND)
+    parser.add_argument("--workers", type=int, default=default_workers())
+    parser.add_argument("--threads", type=int, default=DEFAULT_THREADS)
+    parser.add_argument("--worker-class", choices=["gthread", "uvicorn"], default="gthread")
+    parser.add_argument("--max-requests", type=int, default=MAX_REQUESTS)
+    parser.add_argument("--max-requests-jitter", type=int, default=MAX_REQUESTS_JITTER)
+    parser.add_argument("--graceful-timeout", type=int, default=GRACEFUL_TIMEOUT)
+    args = parser.parse_args()
+
+    if args.workers > 1:
+        # Every worker's columnar store would see the other workers' writes as foreign and keep reloading
+        # itself, so totals come from SQL here unless EXPENSE_COLUMNAR asks for the store
+        os.environ.setdefault("EXPENSE_COLUMNAR", "false")
+    gunicorn.http.wsgi.SERVER = "Secure-Server"  # Same "Server" header policy as routes.py
+    server = ExpenseASGIServer if args.worker_class == "uvicorn" else ExpenseServer
+    server(build_options(args)).run()
@@ -0,0 +1,21 @@
+import pytest
+from database import build_db
+from routes import close_app, create_app
+
+
+@pytest.fixture(scope="module")
+def make_app(tmp_path_factory):
+    # Builds apps over fresh databases: make_app(config) -> app. The slow-query log stays in memory unless
+    # config names a file, and every app's writer, pool and profiler are closed once the module is done.
+    apps = []
+
+    def make(config=None):
+        path = str(tmp_path_factory.mktemp("app") / "expenses.db")
+        build_db(path)
+        app = create_app({"DATABASE": path, "SLOW_QUERY_LOG": "", **(config or {})})
+        apps.append(app)
+        return app
+
+    yield make
+    for app in apps:
+        close_app(app)
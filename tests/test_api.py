@@ -1,8 +1,13 @@
+import csv
+import io
+import os
 import pytest
 import requests
 import time
 
-API_URL = "http://127.0.0.1:5000"  # Ensure Flask server is running
+# Ensure the API is running: `python routes.py` (Flask) or `python asgi.py` (async);
+# set EXPENSE_API_URL to test a server on another address
+API_URL = os.environ.get("EXPENSE_API_URL", "http://127.0.0.1:5000")
 
 # Test fetching expenses (GET /expenses)
 def test_get_expenses():
@@ -22,12 +27,91 @@ def test_add_expense():
     assert response.status_code == 201
     assert "message" in response.json()
 
+# Test replacing an expense (PUT /expense/<id>), validated like a new one
+def test_replace_expense():
+    expense = {"description": "Replace Test", "category": "Food", "cost": 4.00, "date": "1993-02-03"}
+    expense_id = requests.post(f"{API_URL}/expense", json=expense).json()["id"]
+
+    for invalid in ({"cost": 10**30 * -1}, {"cost": "lots"}, {"category": "Travel"}, {"date": ["1993-02-03"]},
+                    {"date": "1993-02-30"}, {"description": "x" * 26}, {"cost": None}):
+        response = requests.put(f"{API_URL}/expense/{expense_id}", json={**expense, **invalid})
+        assert response.status_code == 400, invalid
+        assert "error" in response.json()
+
+    response = requests.put(f"{API_URL}/expense/{expense_id}", json={**expense, "cost": 5.5, "date": "1993-2-4"})
+    assert response.status_code == 200
+    assert requests.get(f"{API_URL}/expense/{expense_id}").json()["date"] == "1993-02-04"
+    requests.delete(f"{API_URL}/expense/{expense_id}")
+
 # Test filtering expenses (GET /expenses with params)
 def test_filter_expenses():
     response = requests.get(f"{API_URL}/expenses", params={"month": "3", "year": "2025"})
     assert response.status_code == 200
     assert isinstance(response.json(), list)
 
+# Test keyset pagination and streaming (GET /expenses with limit/after_id/stream)
+def test_paginate_and_stream_expenses():
+    ids = []
+    for day in ("03", "01", "02"):
+        response = requests.post(f"{API_URL}/expense", json={
+            "description": "Pagination Test", "category": "Savings", "cost": 5.00, "date": f"1998-07-{day}"})
+        ids.append(response.json()["id"])
+    params = {"month": "7", "year": "1998", "category": "Savings", "limit": 2}
+
+    # Walk the pages in id order, following next_cursor until it runs out
+    seen, cursor = [], {}
+    while True:
+        page = requests.get(f"{API_URL}/expenses", params={**params, **cursor}).json()
+        seen.extend(exp["id"] for exp in page["expenses"])
+        if page["next_cursor"] is None:
+            break
+        cursor = page["next_cursor"]
+    assert seen == sorted(ids)
+
+    # Date order uses an (after_date, after_id) cursor
+    first_page = requests.get(f"{API_URL}/expenses", params={**params, "order": "date"}).json()
+    assert [exp["date"] for exp in first_page["expenses"]] == ["1998-07-01", "1998-07-02"]
+    assert first_page["next_cursor"] == {"after_date": "1998-07-02", "after_id": ids[2]}
+
+    # Streaming returns the same rows as a plain JSON array
+    streamed = requests.get(f"{API_URL}/expenses", params={"month": "7", "year": "1998", "stream": "1"})
+    assert streamed.status_code == 200
+    assert [exp["id"] for exp in streamed.json() if exp["description"] == "Pagination Test"] == sorted(ids)
+
+    for expense_id in ids:
+        requests.delete(f"{API_URL}/expense/{expense_id}")
+
+
+# Test streaming NDJSON and CSV imports with a per-row error report (POST /import)
+def test_import_expenses():
+    ndjson = "\n".join([
+        '{"cost": 4.50, "date": "1997-05-01", "category": "Food", "description": "Import Test"}',
+        '{"cost": 4.50, "date": "1997-02-30", "category": "Food", "description": "Import Test"}',
+        'not json',
+        '{"cost": 4.50, "date": "1997-05-02", "category": "Food", "description": "Import Test"}',
+    ])
+    response = requests.post(f"{API_URL}/import", params={"chunk_size": 1}, data=ndjson,
+                             headers={"Content-Type": "application/x-ndjson"})
+    assert response.status_code == 201
+    report = response.json()
+    assert report["inserted"] == 2
+    assert [row["line"] for row in report["rejected"]] == [2, 3]
+    assert "Invalid date format" in report["rejected"][0]["error"]
+
+    csv_body = ("cost,date,category,description\n"
+                "4.50,1997-05-03,Food,Import Test\n"
+                "4.50,1997-05-03,Toys,Import Test\n")
+    response = requests.post(f"{API_URL}/import", data=csv_body, headers={"Content-Type": "text/csv"})
+    assert response.status_code == 201
+    assert response.json()["inserted"] == 1
+    assert response.json()["rejected"][0]["line"] == 3
+
+    imported = requests.get(f"{API_URL}/expenses", params={"month": "5", "year": "1997"}).json()
+    for expense in imported:
+        if expense["description"] == "Import Test":
+            requests.delete(f"{API_URL}/expense/{expense['id']}")
+
+
 # Test deleting an expense (DELETE /expense/<id>)
 
 def test_delete_expense():
@@ -71,8 +155,325 @@ def test_delete_nonexistent_expense():
     assert error_message == expected_message
 
 
+# Test deleting by id list, id range and month/category filter (POST /bulk_delete)
+def test_bulk_delete():
+    def add(date, category):
+        response = requests.post(f"{API_URL}/expense", json={
+            "description": "Bulk Delete Test", "category": category, "cost": 3.0, "date": date})
+        assert response.status_code == 201
+        return response.json()["id"]
+
+    ids = [add("1999-07-0" + str(day), "Gas") for day in range(1, 7)] + [add("1999-07-09", "Food")]
+    params = {"month": "7", "year": "1999"}
+    assert requests.get(f"{API_URL}/summary", params=params).json()["overall_total"] == 21.0
+
+    response = requests.post(f"{API_URL}/bulk_delete", json={"ids": [ids[0], ids[0], ids[1], 99999999]})
+    assert response.status_code == 200 and response.json()["deleted"] == 2
+    response = requests.post(f"{API_URL}/bulk_delete", json={"min_id": ids[2], "max_id": ids[3]})
+    assert response.json()["deleted"] == 2
+    response = requests.post(f"{API_URL}/bulk_delete", json={"month": 7, "year": 1999, "category": "Gas"})
+    assert response.json()["deleted"] == 2
+    assert requests.get(f"{API_URL}/summary", params=params).json()["overall_total"] == 3.0
+    assert requests.post(f"{API_URL}/bulk_delete", json=params).json()["deleted"] == 1
+
+    assert requests.post(f"{API_URL}/bulk_delete", json={}).status_code == 400
+    assert requests.post(f"{API_URL}/bulk_delete", json={"ids": ["1"]}).status_code == 400
+    assert requests.post(f"{API_URL}/bulk_delete", json={"month": 7}).status_code == 400
+    assert requests.post(f"{API_URL}/bulk_delete", json={"category": "Snacks"}).status_code == 400
+
+
+# Test partial updates: a batch of patches, a filter plus assignments, and one expense (PATCH)
+def test_patch_expenses():
+    ids = []
+    for day in ("01", "02", "03"):
+        response = requests.post(f"{API_URL}/expense", json={
+            "description": "Patch Test", "category": "Other", "cost": 2.0, "date": f"1998-05-{day}"})
+        ids.append(response.json()["id"])
+    params = {"month": "5", "year": "1998"}
+    assert requests.get(f"{API_URL}/summary", params=params).json()["category_totals"] == [
+        {"category": "Other", "total_cost": 6.0}]
+
+    response = requests.patch(f"{API_URL}/expenses", json=[
+        {"id": ids[0], "category": "Food"},
+        {"id": ids[1], "cost": 5.5, "description": "Patched"},
+        {"id": ids[2], "category": "Snacks"},
+        {"id": 99999999, "cost": 1.0},
+    ])
+    assert response.status_code == 200
+    assert response.json()["updated"] == 2
+    assert [result["status"] for result in response.json()["results"]] == ["updated", "updated", "invalid", "not_found"]
+    rows = {row["id"]: row for row in requests.get(f"{API_URL}/expenses", params=params).json()}
+    assert rows[ids[0]]["category"] == "Food" and rows[ids[0]]["cost"] == 2.0
+    assert rows[ids[1]]["cost"] == 5.5 and rows[ids[1]]["description"] == "Patched"
+    assert rows[ids[1]]["category"] == "Other"
+
+    response = requests.patch(f"{API_URL}/expenses", json={"filter": {**params, "category": "Other"},
+                                                           "set": {"category": "Gas"}})
+    assert response.json()["updated"] == 2
+    response = requests.patch(f"{API_URL}/expense/{ids[2]}", json={"date": "1998-06-01"})
+    assert response.status_code == 200
+    assert requests.get(f"{API_URL}/summary", params=params).json()["category_totals"] == [
+        {"category": "Food", "total_cost": 2.0}, {"category": "Gas", "total_cost": 5.5}]
+
+    # Patches to one id apply in request order, whichever columns each one sets
+    response = requests.patch(f"{API_URL}/expenses", json=[
+        {"id": ids[0], "cost": 5}, {"id": ids[0], "cost": 7, "category": "Gas"}, {"id": ids[0], "cost": 9}])
+    assert [result["status"] for result in response.json()["results"]] == ["updated"] * 3
+    assert requests.get(f"{API_URL}/expense/{ids[0]}").json()["cost"] == 9
+    requests.patch(f"{API_URL}/expenses", json=[{"id": ids[0], "cost": 2.0, "category": "Food"}])
+
+    assert requests.patch(f"{API_URL}/expense/99999999", json={"cost": 1}).status_code == 404
+    assert requests.patch(f"{API_URL}/expense/{ids[0]}", json={"colour": "red"}).status_code == 400
+    assert requests.patch(f"{API_URL}/expenses", json={"filter": {}, "set": {"cost": 1}}).status_code == 400
+    requests.post(f"{API_URL}/bulk_delete", json={"ids": ids})
+
+
+# Test description search: words, prefixes, phrases, filters, paging and index upkeep (GET /expenses?q=)
+def test_search_expenses():
+    ids = []
+    for description, category, day in (("Zyx bakery run", "Food", "01"), ("Zyx bakery cake", "Food", "02"),
+                                       ("Zyx hardware", "Other", "03"), ("Bakery zyx", "Food", "04")):
+        response = requests.post(f"{API_URL}/expense", json={
+            "description": description, "category": category, "cost": 4.0, "date": f"1997-02-{day}"})
+        ids.append(response.json()["id"])
+
+    def search(**params):
+        response = requests.get(f"{API_URL}/expenses", params=params)
+        assert response.status_code == 200, response.text
+        return response.json()
+
+    assert [row["id"] for row in search(q="zyx bakery")] == [ids[3], ids[1], ids[0]]  # Newest first
+    assert [row["id"] for row in search(q='"zyx bakery"')] == [ids[1], ids[0]]
+    assert {row["id"] for row in search(q="zyx hard*")} == {ids[2]}
+    assert {row["id"] for row in search(q="zyx", month="2", year="1997", category="Other")} == {ids[2]}
+    assert len(search(q="zyx bakery", order="rank")) == 3
+    assert search(q='zyx "unbalanced OR NOT (') == []  # Operators and stray quotes are plain text
+
+    first = search(q="zyx", limit="3")
+    second = search(q="zyx", limit="3", **first["next_cursor"])
+    assert [row["id"] for row in first["expenses"] + second["expenses"]] == ids[::-1]
+    assert second["next_cursor"] is None
+    ranked = search(q="zyx", limit="2", order="rank")
+    assert ranked["next_cursor"] == {"offset": 2}
+    assert len(search(q="zyx", limit="2", order="rank", offset="2")["expenses"]) == 2
+
+    # Edits and deletes keep the index in step
+    requests.patch(f"{API_URL}/expense/{ids[2]}", json={"description": "Zyx plumber"})
+    assert search(q="zyx hardware") == [] and len(search(q="zyx plumber")) == 1
+    requests.post(f"{API_URL}/bulk_delete", json={"ids": ids})
+    assert search(q="zyx") == []
+
+    assert requests.get(f"{API_URL}/expenses", params={"q": "  * "}).status_code == 400
+    assert requests.get(f"{API_URL}/expenses", params={"q": "zyx", "offset": "2"}).status_code == 400
+
+
 # Test retrieving monthly summary (GET /summary)
 def test_get_summary():
     response = requests.get(f"{API_URL}/summary", params={"month": "3", "year": "2025"})
     assert response.status_code == 200
-    assert "category_totals" in response.json()
\ No newline at end of file
+    assert "category_totals" in response.json()
+
+
+# Test that the monthly summary reflects a newly added expense
+def test_summary_includes_new_expense():
+    params = {"month": "3", "year": "2025"}
+    before = requests.get(f"{API_URL}/summary", params=params).json()["overall_total"]
+
+    new_expense = {"description": "Summary Test", "category": "Utilities", "cost": 12.34, "date": "2025-03-15"}
+    create_response = requests.post(f"{API_URL}/expense", json=new_expense)
+    assert create_response.status_code == 201
+
+    after = requests.get(f"{API_URL}/summary", params=params).json()["overall_total"]
+    assert round(after - before, 2) == 12.34
+
+    requests.delete(f"{API_URL}/expense/{create_response.json()['id']}")
+
+
+# Test date-range totals (GET /totals)
+def test_range_totals():
+    params = {"start": "1993-02-10", "end": "1993-03-05"}
+    created = [requests.post(f"{API_URL}/expense", json=expense).json()["id"] for expense in (
+        {"description": "Range Test", "category": "Food", "cost": 4.10, "date": "1993-02-10"},
+        {"description": "Range Test", "category": "Food", "cost": 1.15, "date": "1993-03-05"},
+        {"description": "Range Test", "category": "Gas", "cost": 9.99, "date": "1993-03-06"},
+    )]
+
+    data = requests.get(f"{API_URL}/totals", params=params).json()
+    assert data["category_totals"] == [{"category": "Food", "total_cost": 5.25}]
+    assert data["overall_total"] == 5.25
+    assert requests.get(f"{API_URL}/totals", params={**params, "category": "Gas"}).json()["overall_total"] == 0
+    assert requests.get(f"{API_URL}/totals", params={"start": "1993-02-30", "end": "1993-03-01"}).status_code == 400
+
+    for expense_id in created:
+        requests.delete(f"{API_URL}/expense/{expense_id}")
+    assert requests.get(f"{API_URL}/totals", params=params).json()["overall_total"] == 0
+
+
+# Test per-period trends (GET /trends), from the rollups (whole months) and from a grouped scan
+def test_trends():
+    created = [requests.post(f"{API_URL}/expense", json=expense).json()["id"] for expense in (
+        {"description": "Trend Test", "category": "Food", "cost": 10.00, "date": "1991-01-15"},
+        {"description": "Trend Test", "category": "Food", "cost": 4.00, "date": "1991-03-02"},
+        {"description": "Trend Test", "category": "Gas", "cost": 6.00, "date": "1991-03-31"},
+    )]
+
+    params = {"start": "1991-01-01", "end": "1991-03-31", "window": "2", "deltas": "1"}
+    data = requests.get(f"{API_URL}/trends", params=params).json()
+    assert data["periods"] == ["1991-01", "1991-02", "1991-03"]
+    assert data["overall"] == {"totals": [10.0, 0.0, 10.0], "moving_average": [None, 5.0, 5.0],
+                               "deltas": [None, -10.0, 10.0]}
+    assert [entry["category"] for entry in data["categories"]] == ["Food", "Gas"]
+    assert requests.get(f"{API_URL}/trends", params={**params, "start": "1991-01-02"}).json()["overall"] == data["overall"]
+
+    weekly = requests.get(f"{API_URL}/trends", params={"start": "1991-03-01", "end": "1991-03-31",
+                                                       "period": "week", "category": "Food"}).json()
+    assert weekly["periods"][0] == "1991-02-25"
+    assert weekly["overall"]["totals"][0] == 4.0
+    assert requests.get(f"{API_URL}/trends", params={"start": "1991-01-01", "end": "1991-03-31",
+                                                     "period": "hour"}).status_code == 400
+
+    for expense_id in created:
+        requests.delete(f"{API_URL}/expense/{expense_id}")
+
+
+# Test the streamed export (GET /export) as CSV and, when pyarrow is installed, Parquet and Arrow
+def test_export():
+    created = [requests.post(f"{API_URL}/expense", json=expense).json()["id"] for expense in (
+        {"description": "Export Test", "category": "Food", "cost": 2.75, "date": "1992-05-01"},
+        {"description": "Export Test", "category": "Gas", "cost": 8.00, "date": "1992-05-02"},
+    )]
+    params = {"start": "1992-05-01", "end": "1992-05-31"}
+
+    response = requests.get(f"{API_URL}/export", params=params)
+    assert response.status_code == 200
+    assert response.headers["Content-Type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [(row["id"], row["category"], row["cost"]) for row in rows] == [
+        (str(created[0]), "Food", "2.75"), (str(created[1]), "Gas", "8.0")]
+    unpadded = requests.get(f"{API_URL}/export", params={"start": "1992-5-1", "end": "1992-5-31"})
+    assert unpadded.text == response.text
+    assert requests.get(f"{API_URL}/export", params={"format": "xml"}).status_code == 400
+
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        pa = None
+    if pa is not None:
+        response = requests.get(f"{API_URL}/export", params={**params, "format": "parquet"})
+        assert pq.read_table(io.BytesIO(response.content)).column("id").to_pylist() == created
+        response = requests.get(f"{API_URL}/export", params={**params, "category": "Gas", "format": "arrow"})
+        assert pa.ipc.open_stream(response.content).read_all().column("cost").to_pylist() == [8.0]
+
+    for expense_id in created:
+        requests.delete(f"{API_URL}/expense/{expense_id}")
+
+
+# Test connection pool stats (GET /stats)
+def test_get_stats():
+    response = requests.get(f"{API_URL}/stats")
+    assert response.status_code == 200
+    pool = response.json()["pool"]
+    assert pool["open"] <= pool["size"]
+
+
+
+# Test conditional GETs: unchanged data answers 304, any write changes the ETag
+def test_etag_revalidation():
+    params = {"month": "3", "year": "2025"}
+    first = requests.get(f"{API_URL}/summary", params=params)
+    etag = first.headers["ETag"]
+    assert etag.startswith('W/"')
+
+    not_modified = requests.get(f"{API_URL}/summary", params=params, headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+
+    # Different query parameters never share a validator
+    other = requests.get(f"{API_URL}/summary", params={"month": "4", "year": "2025"})
+    assert other.headers["ETag"] != etag
+
+    create_response = requests.post(f"{API_URL}/expense", json={
+        "description": "ETag Test", "category": "Food", "cost": 1.00, "date": "2025-03-11"})
+    changed = requests.get(f"{API_URL}/summary", params=params, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+
+    expense_id = create_response.json()["id"]
+    assert requests.get(f"{API_URL}/expense/{expense_id}").status_code == 200
+    requests.delete(f"{API_URL}/expense/{expense_id}")
+
+
+
+# Test that repeat summaries are served from the response cache and writes invalidate them
+def test_summary_cache():
+    params = {"month": "6", "year": "1995"}
+    requests.get(f"{API_URL}/summary", params=params)
+    hits_before = requests.get(f"{API_URL}/stats").json()["cache"]["hits"]
+
+    assert requests.get(f"{API_URL}/summary", params={"month": "06", "year": "1995"}).json()["overall_total"] == 0
+    assert requests.get(f"{API_URL}/stats").json()["cache"]["hits"] == hits_before + 1
+
+    create_response = requests.post(f"{API_URL}/expense", json={
+        "description": "Cache Test", "category": "Food", "cost": 2.50, "date": "1995-06-01"})
+    assert requests.get(f"{API_URL}/summary", params=params).json()["overall_total"] == 2.50
+
+    requests.delete(f"{API_URL}/expense/{create_response.json()['id']}")
+    assert requests.get(f"{API_URL}/summary", params=params).json()["overall_total"] == 0
+
+
+
+# Test the single-call dashboard (GET /dashboard): filtered table, month-wide totals
+def test_dashboard():
+    created = [requests.post(f"{API_URL}/expense", json=expense).json()["id"] for expense in (
+        {"description": "Dashboard Test", "category": "Food", "cost": 3.25, "date": "1994-08-02"},
+        {"description": "Dashboard Test", "category": "Gas", "cost": 1.50, "date": "1994-08-09"},
+    )]
+
+    data = requests.get(f"{API_URL}/dashboard", params={"month": "8", "year": "1994", "category": "Gas"}).json()
+    assert [exp["category"] for exp in data["expenses"]] == ["Gas"]
+    assert data["category_totals"] == [{"category": "Food", "total_cost": 3.25}, {"category": "Gas", "total_cost": 1.5}]
+    assert data["overall_total"] == 4.75
+
+    # Sub-cent costs round half away from zero, as the rollups behind /summary do
+    created.append(requests.post(f"{API_URL}/expense", json={
+        "description": "Dashboard Test", "category": "Gas", "cost": 0.125, "date": "1994-08-10"}).json()["id"])
+    data = requests.get(f"{API_URL}/dashboard", params={"month": "8", "year": "1994"}).json()
+    summary = requests.get(f"{API_URL}/summary", params={"month": "8", "year": "1994"}).json()
+    assert data["category_totals"] == summary["category_totals"]
+    assert data["overall_total"] == summary["overall_total"] == 4.88
+
+    for expense_id in created:
+        requests.delete(f"{API_URL}/expense/{expense_id}")
+
+
+# Test column-oriented listings (?format=columns) and negotiated compression of large responses
+def test_columns_format_and_compression():
+    rows = [{"description": f"Format Test {i:02d}", "category": ("Food", "Gas")[i % 2], "cost": i + 0.5,
+             "date": f"1996-05-{i % 28 + 1:02d}"} for i in range(40)]
+    assert requests.post(f"{API_URL}/bulk_expense", json=rows).status_code == 201
+    params = {"month": "5", "year": "1996"}
+
+    listed = requests.get(f"{API_URL}/expenses", params=params).json()
+    columns = requests.get(f"{API_URL}/expenses", params={**params, "format": "columns"}).json()
+    assert sorted(columns) == ["category", "cost", "date", "description", "id"]
+    assert [dict(zip(columns, values)) for values in zip(*columns.values())] == listed
+    page = requests.get(f"{API_URL}/expenses", params={**params, "format": "columns", "limit": 5}).json()
+    assert page["expenses"]["id"] == sorted(row["id"] for row in listed)[:5] and page["next_cursor"]
+    dashboard = requests.get(f"{API_URL}/dashboard", params={**params, "format": "columns", "category": "Gas"}).json()
+    assert set(dashboard["expenses"]["category"]) == {"Gas"} and len(dashboard["expenses"]["id"]) == 20
+    assert requests.get(f"{API_URL}/expenses", params={"format": "xml"}).status_code == 400
+    assert requests.get(f"{API_URL}/expenses", params={"format": "columns", "stream": "1"}).status_code == 400
+
+    # Compressed when accepted and large enough, chunk by chunk when streamed; never when refused
+    compressed = requests.get(f"{API_URL}/expenses", params=params, headers={"Accept-Encoding": "gzip"})
+    assert compressed.headers["Content-Encoding"] == "gzip" and "Accept-Encoding" in compressed.headers["Vary"]
+    assert compressed.json() == listed
+    streamed = requests.get(f"{API_URL}/expenses", params={**params, "stream": "1"}, headers={"Accept-Encoding": "gzip"})
+    assert streamed.headers["Content-Encoding"] == "gzip"
+    assert streamed.json() == sorted(listed, key=lambda row: row["id"])
+    plain = requests.get(f"{API_URL}/expenses", params=params, headers={"Accept-Encoding": "identity"})
+    assert "Content-Encoding" not in plain.headers and plain.json() == listed
+    small = requests.get(f"{API_URL}/summary", params=params, headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in small.headers
+
+    assert requests.post(f"{API_URL}/bulk_delete", json=params).json()["deleted"] == 40
@@ -0,0 +1,48 @@
+from database import reset_after_fork
+
+EXPENSE = {"cost": 12.5, "date": "2025-03-10", "category": "Food", "description": "Factory test"}
+
+
+# create_app should serve the configured database with its own pool and response cache
+def test_create_app_uses_config(make_app):
+    app = make_app({"RESPONSE_CACHE_ENTRIES": 0})
+    assert app.extensions["pool"].db_name == app.config["DATABASE"]
+    assert not app.extensions["response_cache"].enabled
+
+    client = app.test_client()
+    response = client.post("/expense", json=EXPENSE)
+    assert response.status_code == 201
+    assert len(client.get("/expenses?month=3&year=2025").get_json()) == 1
+    assert "Content-Security-Policy" in response.headers
+
+
+# EXPENSE_* environment variables override the defaults, explicit config overrides both
+def test_create_app_env_overrides(make_app, monkeypatch):
+    monkeypatch.setenv("EXPENSE_GROUP_COMMIT", "true")
+    monkeypatch.setenv("EXPENSE_CACHE_ENTRIES", "7")
+    app = make_app({"RESPONSE_CACHE_ENTRIES": 9})
+    assert app.config["GROUP_COMMIT"] is True
+    assert app.config["RESPONSE_CACHE_ENTRIES"] == 9
+
+
+# Building a second app must not redirect the first one's reads or writes to the second's database
+def test_apps_keep_their_own_databases(make_app):
+    first = make_app({"RESPONSE_CACHE_ENTRIES": 0}).test_client()
+    first.post("/expense", json=EXPENSE)
+    second = make_app({"RESPONSE_CACHE_ENTRIES": 0, "GROUP_COMMIT": True}).test_client()
+    second.post("/expense", json={**EXPENSE, "description": "Second app"})
+    first.post("/expense", json=EXPENSE)
+
+    assert [row["description"] for row in first.get("/expenses?month=3&year=2025").get_json()] == ["Factory test"] * 2
+    assert [row["description"] for row in second.get("/expenses?month=3&year=2025").get_json()] == ["Second app"]
+
+
+# A forked worker must not reuse the parent's pooled connections
+def test_reset_after_fork(make_app):
+    pool = make_app().extensions["pool"]
+    with pool.connection() as parent_conn:
+        pass
+    reset_after_fork()
+    assert pool.stats()["open"] == 0
+    with pool.connection() as child_conn:
+        assert child_conn is not parent_conn
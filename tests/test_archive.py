@@ -0,0 +1,154 @@
+import json
+import os
+import sqlite3
+import threading
+import pytest
+from archive import ArchiveError, archive_year
+
+# Listings without a limit or stream have no defined order, so their rows are compared as a set
+UNORDERED = {"/expenses?month=3&year=2019", "/expenses?category=Food", "/expenses?q=archived&order=rank"}
+READS = [
+    "/expenses?month=3&year=2019",
+    "/expenses?category=Food",
+    "/expenses?q=archived&limit=5",
+    "/expenses?q=archived&order=rank",
+    "/expense/2",
+    "/expenses?limit=5&after_id=2",
+    "/expenses?stream=1",
+    "/summary?month=3&year=2019",
+    "/totals?start=2019-03-11&end=2025-12-31&category=Food",
+    "/trends?start=2019-01-01&end=2020-12-31&period=month",
+    "/dashboard?month=3&year=2020",
+    "/export?start=2019-03-11",
+]
+
+
+@pytest.fixture(params=[True, False], ids=["columnar", "sql"])
+def archived(make_app, tmp_path, request):
+    # Four expenses in each of 2019, 2020 and 2025, and the responses READS gave before any archiving
+    directory = str(tmp_path / "archive")
+    app = make_app({"ARCHIVE_DIR": directory, "COLUMNAR": request.param})
+    path, client = app.config["DATABASE"], app.test_client()
+    client.post("/bulk_expense", json=[
+        {"cost": 10 + i, "date": f"{year}-03-{10 + i}", "category": ("Food", "Gas")[i % 2],
+         "description": f"Archived {year}"} for year in (2019, 2020, 2025) for i in range(4)])
+    before = {url: client.get(url).get_data() for url in READS}
+    return client, path, directory, before
+
+
+def by_id(body):
+    return sorted(json.loads(body), key=lambda row: row["id"])
+
+
+# Archived years leave the hot database but every read still sees them, compressed or not
+def test_archived_years_are_read_transparently(archived):
+    client, path, directory, before = archived
+    assert archive_year(path, directory, 2019)["rows"] == 4
+    assert archive_year(path, directory, 2020, compress=True)["rows"] == 4
+    for url in READS:
+        after = client.get(url).get_data()
+        if url in UNORDERED:
+            assert by_id(after) == by_id(before[url]), url
+        else:
+            assert after == before[url], url
+
+    conn = sqlite3.connect(path)
+    assert conn.execute("SELECT COUNT(*) FROM expenses WHERE date < '2021-01-01'").fetchone()[0] == 0
+    assert conn.execute("SELECT year FROM archived_years ORDER BY year").fetchall() == [(2019,), (2020,)]
+    conn.close()
+    assert sorted(os.listdir(directory)) == ["expenses_2019.db", "expenses_2020.db.gz"]
+    assert not os.access(os.path.join(directory, "expenses_2019.db"), os.W_OK) or os.geteuid() == 0
+
+    # Expenses added to an archived year later live in the hot database and are read alongside it
+    client.post("/expense", json={"cost": 5, "date": "2019-03-20", "category": "Food", "description": "Late"})
+    listing = client.get("/expenses?month=3&year=2019").get_json()
+    assert len(listing) == 5 and "Late" in {row["description"] for row in listing}
+    totals = client.get("/summary?month=3&year=2019").get_json()
+    assert totals["overall_total"] == 10 + 11 + 12 + 13 + 5
+
+
+def test_archive_refusals(archived):
+    _, path, directory, _ = archived
+    archive_year(path, directory, 2019)
+    with pytest.raises(ArchiveError, match="already archived"):
+        archive_year(path, directory, 2019)
+    with pytest.raises(ArchiveError, match="not closed"):
+        archive_year(path, directory, 9999)
+
+
+# Runs racing to archive the same year: one archives it, the others are refused and leave its file alone
+def test_concurrent_archive_runs(archived):
+    client, path, directory, before = archived
+    start, outcomes = threading.Barrier(3), []
+
+    def run():
+        start.wait()
+        try:
+            outcomes.append(archive_year(path, directory, 2019)["rows"])
+        except (ArchiveError, sqlite3.OperationalError) as e:
+            outcomes.append(type(e))
+
+    threads = [threading.Thread(target=run) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(outcomes, key=str).count(4) == 1
+    assert os.listdir(directory) == ["expenses_2019.db"]
+    assert by_id(client.get("/expenses?category=Food").get_data()) == by_id(before["/expenses?category=Food"])
+
+
+# Spans over more archived years than SQLite attaches to one connection (10) are read in batches
+WIDE_YEARS = range(2001, 2014)
+WIDE_READS = [
+    "/expenses?category=Food",
+    "/expenses?limit=7&after_id=3",
+    "/expenses?limit=7&after_date=2003-06-11&after_id=6",
+    "/expenses?stream=1",
+    "/expenses?stream=1&limit=9&category=Gas",
+    "/expenses?q=year&limit=5",
+    "/expense/1",
+    "/dashboard",
+    "/totals?start=2001-01-01&end=2025-12-31",
+    "/trends?start=2001-01-01&end=2025-12-31&period=year",
+    "/trends?start=2001-03-05&end=2013-12-31&period=month&category=Food",
+    "/export",
+]
+
+
+def normalized(url, body):
+    # Responses without a defined row order, with their rows sorted by id
+    data = json.loads(body) if not url.startswith("/export") else body
+    if url in ("/expenses?category=Food", "/dashboard"):
+        rows = data["expenses"] if url == "/dashboard" else data
+        rows.sort(key=lambda row: row["id"])
+    return data
+
+
+@pytest.mark.parametrize("columnar", [True, False], ids=["columnar", "sql"])
+def test_more_archived_years_than_can_be_attached(make_app, tmp_path, columnar):
+    directory = str(tmp_path / "archive")
+    app = make_app({"ARCHIVE_DIR": directory, "COLUMNAR": columnar})
+    path, client = app.config["DATABASE"], app.test_client()
+    client.post("/bulk_expense", json=[
+        {"cost": year % 100 + i, "date": f"{year}-06-{10 + i}", "category": ("Food", "Gas")[i % 2],
+         "description": f"Year {year}"} for year in (*WIDE_YEARS, 2025) for i in range(2)])
+    before = {url: client.get(url).get_data() for url in WIDE_READS}
+    for year in WIDE_YEARS:
+        archive_year(path, directory, year, compress=year % 2 == 0)
+
+    for url in WIDE_READS:
+        response = client.get(url)
+        assert response.status_code == 200, url
+        assert normalized(url, response.get_data()) == normalized(url, before[url]), url
+
+
+# A stream whose archive cannot be read fails with an error status rather than a truncated 200
+def test_unreadable_archive_fails_before_streaming(archived):
+    client, path, directory, _ = archived
+    archive_year(path, directory, 2019)
+    os.remove(os.path.join(directory, "expenses_2019.db"))
+    for url in ("/export", "/expenses?stream=1"):
+        response = client.get(url)
+        assert response.status_code == 500, url
+        assert "error" in response.get_json()
@@ -0,0 +1,103 @@
+import asyncio
+import importlib
+import json
+import sqlite3
+import pytest
+from database import build_db
+from routes import close_app
+from test_metrics import sample
+
+
+@pytest.fixture(scope="module")
+def asgi(tmp_path_factory):
+    # asgi.py builds its Flask app on import, from the EXPENSE_* environment
+    pytest.importorskip("quart")
+    path = str(tmp_path_factory.mktemp("asgi") / "expenses.db")
+    build_db(path)
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv("EXPENSE_DATABASE", path)
+        patch.setenv("EXPENSE_SLOW_QUERY_LOG", "")
+        patch.setenv("EXPENSE_CACHE_ENTRIES", "0")
+        module = importlib.import_module("asgi")
+    yield module
+    module.db.shutdown()
+    close_app(module.flask_app)
+
+
+# The native async views are recorded in the same registry as the Flask routes, with DB time,
+# serialization time and rows, streamed listings included
+def test_native_views_are_measured(asgi):
+    async def requests():
+        client = asgi.async_app.test_client()
+        for day in ("2025-03-10", "2025-03-11"):
+            await client.post("/expense", json={"cost": 5, "date": day, "category": "Food", "description": "ASGI"})
+        listing = await client.get("/expenses?month=3&year=2025")
+        streamed = await client.get("/expenses?stream=1")
+        return await listing.get_json(), await streamed.get_data()
+
+    listing, _ = asyncio.run(requests())
+    assert len(listing) == 2
+
+    text = asgi.flask_app.test_client().get("/metrics").get_data(as_text=True)
+    assert sample(text, "expense_http_request_duration_seconds_count", route="/expense", method="POST",
+                  status="201") == 2
+    assert sample(text, "expense_http_request_duration_seconds_count", route="/expenses", status="200") == 2
+    assert sample(text, "expense_rows_returned_sum", route="/expenses") == 4
+    assert sample(text, "expense_db_duration_seconds_sum", route="/expenses") > 0
+    assert sample(text, "expense_serialization_duration_seconds_sum", route="/expenses") > 0
+    assert sample(text, "expense_http_requests_in_flight", route="/expenses") == 0
+
+
+# POST /import is a native view that imports the body as it arrives: rows are committed before the
+# upload has finished, and the report comes back once it has
+def test_import_streams_the_upload(asgi):
+    lines = [json.dumps({"cost": n, "date": "2024-07-01", "category": "Gas", "description": "Streamed"}).encode()
+             + b"\n" for n in range(1, 5)]
+    committed, sent = [], []
+
+    def stored():
+        with sqlite3.connect(asgi.flask_app.config["DATABASE"]) as conn:
+            return conn.execute("SELECT COUNT(*) FROM expenses WHERE description = 'Streamed'").fetchone()[0]
+
+    async def receive():
+        committed.append(stored())
+        if lines:
+            line = lines.pop(0)
+            return {"type": "http.request", "body": line, "more_body": bool(lines)}
+        await asyncio.get_running_loop().create_future()
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+             "scheme": "http", "path": "/import", "raw_path": b"/import", "query_string": b"chunk_size=1",
+             "root_path": "", "headers": [(b"host", b"localhost"), (b"content-type", b"application/x-ndjson")],
+             "client": ("127.0.0.1", 1234), "server": ("localhost", 80)}
+    asyncio.run(asgi.application(scope, receive, send))
+
+    assert sent[0]["status"] == 201
+    report = json.loads(b"".join(message.get("body", b"") for message in sent[1:]))
+    assert report["inserted"] == 4 and report["rejected_count"] == 0
+    assert committed == [0, 1, 2, 3]
+    assert stored() == 4
+
+
+# A body the Flask fallback would refuse gets a JSON 413 instead of a bare 400
+def test_oversized_fallback_body_is_refused(asgi):
+    sent = []
+
+    async def receive():
+        raise AssertionError("The body should not be read")
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "PATCH",
+             "scheme": "http", "path": "/expenses", "raw_path": b"/expenses", "query_string": b"",
+             "root_path": "", "headers": [(b"host", b"localhost"),
+                                          (b"content-length", str(asgi.MAX_FALLBACK_BODY + 1).encode())],
+             "client": ("127.0.0.1", 1234), "server": ("localhost", 80)}
+    asyncio.run(asgi.application(scope, receive, send))
+
+    assert sent[0]["status"] == 413
+    assert "error" in json.loads(sent[1]["body"])
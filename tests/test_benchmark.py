@@ -0,0 +1,38 @@
+import sqlite3
+from benchmark import SCENARIOS, ClientTransport, compare, run_scenario, seed_database, seeded_app
+
+
+# The same size and seed always produce the same database
+def test_seed_is_deterministic(tmp_path):
+    snapshots = []
+    for name in ("a.db", "b.db"):
+        seed_database(str(tmp_path / name), 500, seed=3)
+        conn = sqlite3.connect(str(tmp_path / name))
+        snapshots.append(conn.execute("SELECT * FROM expenses ORDER BY id").fetchall())
+        assert conn.execute("SELECT SUM(count) FROM expense_rollups").fetchone()[0] == 500
+        conn.close()
+    assert snapshots[0] == snapshots[1]
+
+
+# Every scenario runs cleanly through the test client and reports percentiles
+def test_every_scenario_runs():
+    with seeded_app(500) as app:
+        transport = ClientTransport(app)
+        for scenario in SCENARIOS:
+            summary = run_scenario(transport, scenario, 500, iterations=3, warmup=1)
+            assert summary["errors"] == 0, scenario.name
+            assert summary["count"] == 3
+            assert 0 < summary["p50_ms"] <= summary["p95_ms"] <= summary["p99_ms"]
+
+
+# p95 regressions past the threshold (and failed requests) are reported; noise below it is not
+def test_compare_against_baseline():
+    baseline = {"10k": {"client": {"summary": {"p95_ms": 2.0}, "dashboard": {"p95_ms": 10.0}}}}
+    results = {"10k": {"client": {
+        "summary": {"p95_ms": 2.9, "errors": 0},      # Within the 1 ms floor
+        "dashboard": {"p95_ms": 16.0, "errors": 0},   # 60% slower
+        "stats": {"p95_ms": 1.0, "errors": 2},        # No baseline, but failing
+    }}}
+    regressions = compare(results, baseline, threshold=0.5)
+    assert len(regressions) == 2
+    assert regressions[0].startswith("10k/client/dashboard") and regressions[1].startswith("10k/client/stats")
@@ -0,0 +1,55 @@
+from cache import ResponseCache
+
+MARCH = frozenset({(2025, 3)})
+APRIL = frozenset({(2025, 4)})
+
+
+# Test 1: Least Recently Used Entries Are Evicted First
+def test_lru_eviction_by_entry_count():
+    cache = ResponseCache(max_entries=2)
+    cache.put("a", b"1", "application/json", version=1, months=MARCH)
+    cache.put("b", b"2", "application/json", version=1, months=MARCH)
+    assert cache.get("a", 1) is not None  # "a" is now the most recently used
+    cache.put("c", b"3", "application/json", version=1, months=MARCH)
+
+    assert cache.get("b", 1) is None
+    assert cache.get("a", 1).body == b"1"
+    assert cache.stats()["evictions"] == 1
+
+
+# Test 2: The Byte Budget Is Enforced
+def test_byte_budget():
+    cache = ResponseCache(max_entries=10, max_bytes=10)
+    cache.put("a", b"123456", "application/json", version=1)
+    cache.put("b", b"123456", "application/json", version=1)
+    cache.put("huge", b"x" * 11, "application/json", version=1)
+
+    stats = cache.stats()
+    assert stats["entries"] == 1 and stats["bytes"] == 6
+    assert stats["rejected"] == 1
+
+
+# Test 3: Writes Only Invalidate the Partitions They Touch
+def test_partition_invalidation():
+    cache = ResponseCache()
+    cache.put("march", b"{}", "application/json", version=1, months=MARCH)
+    cache.put("march-food", b"{}", "application/json", version=1, months=MARCH, category="Food")
+    cache.put("april", b"{}", "application/json", version=1, months=APRIL)
+    cache.put("all-gas", b"{}", "application/json", version=1, category="Gas")
+
+    cache.invalidate({(2025, 3, "Gas")}, version=2)
+
+    assert cache.get("march", 2) is None
+    assert cache.get("all-gas", 2) is None
+    assert cache.get("march-food", 2) is not None
+    assert cache.get("april", 2) is not None
+
+
+# Test 4: Unknown Writes (e.g. from Another Process) Clear Everything, Stale Results Are Not Stored
+def test_version_gaps_clear_cache():
+    cache = ResponseCache()
+    cache.put("april", b"{}", "application/json", version=1, months=APRIL)
+    assert cache.get("april", 5) is None
+
+    cache.put("stale", b"{}", "application/json", version=4, months=APRIL)
+    assert cache.get("stale", 5) is None
@@ -0,0 +1,133 @@
+import threading
+import time
+import pytest
+from datetime import date
+from functools import partial
+from database import build_db, get_db_connection
+
+numpy = pytest.importorskip("numpy")
+import columnar
+from columnar import ColumnarStore
+
+EXPENSES = [
+    (12.34, "2025-03-01", "Food", "Lunch"),
+    (5.00, "2025-03-15", "Gas", "Fuel"),
+    (7.66, "2025-03-31", "Food", "Dinner"),
+    (100.0, "2025-04-01", "Rent/Mortgage", "April"),
+]
+
+
+@pytest.fixture
+def conn(tmp_path):
+    db_path = str(tmp_path / "columnar.db")
+    build_db(db_path)
+    conn = get_db_connection(db_path)
+    with conn:
+        conn.executemany("INSERT INTO expenses (cost, date, category, description) VALUES (?, ?, ?, ?)", EXPENSES)
+    yield conn
+    conn.close()
+
+
+def sql_totals(conn, start, end):
+    rows = conn.execute("SELECT category, SUM(CAST(ROUND(cost * 100) AS INTEGER)), COUNT(*) FROM expenses "
+                        "WHERE date BETWEEN ? AND ? GROUP BY category", (start, end))
+    return {row[0]: (row[1], row[2]) for row in rows}
+
+
+def write(conn, query, params):
+    # Commits one write the way the routes do and returns (data version, RETURNING rows)
+    with conn:
+        rows = conn.execute(query, params).fetchall()
+        version = conn.execute("UPDATE data_version SET version = version + 1 RETURNING version").fetchone()[0]
+    return version, rows
+
+
+# Range totals from the store should match SQL to the cent
+def test_load_and_totals(conn):
+    store = ColumnarStore()
+    store.load(conn)
+    assert store.category_totals(date(2025, 3, 1), date(2025, 3, 31)) == {"Food": (2000, 2), "Gas": (500, 1)}
+    assert store.category_totals(date(2025, 3, 1), date(2025, 4, 30), "Rent/Mortgage") == {"Rent/Mortgage": (10000, 1)}
+    assert store.category_totals(date(2025, 3, 2), date(2025, 3, 30)) == sql_totals(conn, "2025-03-02", "2025-03-30")
+
+
+# Inserts, updates and deletes are applied incrementally, then folded into the base on compaction
+def test_incremental_apply(conn, monkeypatch):
+    store = ColumnarStore()
+    store.load(conn)
+    loads = store.stats()["loads"]
+
+    version, rows = write(conn, "INSERT INTO expenses (cost, date, category, description) "
+                                "VALUES (1.25, '2025-03-20', 'Gas', 'x') RETURNING id, cost, date, category", ())
+    store.apply(version, rows)
+    version, rows = write(conn, "UPDATE expenses SET cost = 2.5, category = 'Utilities' WHERE id = 1 "
+                                "RETURNING id, cost, date, category", ())
+    store.apply(version, rows)
+    version, _ = write(conn, "DELETE FROM expenses WHERE id = 2", ())
+    store.apply(version, deletes=[2])
+
+    assert store.sync(conn)
+    assert store.stats()["loads"] == loads
+    assert store.category_totals(date(2025, 3, 1), date(2025, 3, 31)) == sql_totals(conn, "2025-03-01", "2025-03-31")
+
+    monkeypatch.setattr(columnar, "DELTA_LIMIT", 0)
+    version, rows = write(conn, "INSERT INTO expenses (cost, date, category, description) "
+                                "VALUES (3, '2025-03-05', 'Food', 'y') RETURNING id, cost, date, category", ())
+    store.apply(version, rows)
+    assert store.stats()["compactions"] == 1 and store.stats()["pending"] == 0
+    assert store.category_totals(date(2025, 3, 1), date(2025, 3, 31)) == sql_totals(conn, "2025-03-01", "2025-03-31")
+
+
+# Out-of-order versions wait for their predecessor; a write the store never sees forces a reload
+def test_version_ordering(conn, monkeypatch):
+    store = ColumnarStore()
+    store.load(conn)
+    first = write(conn, "DELETE FROM expenses WHERE id = 1", ())[0]
+    second = write(conn, "DELETE FROM expenses WHERE id = 3", ())[0]
+    store.apply(second, deletes=[3])
+    assert store.version == first - 1
+    store.apply(first, deletes=[1])
+    assert store.version == second
+    assert store.category_totals(date(2025, 3, 1), date(2025, 3, 31)) == {"Gas": (500, 1)}
+
+    write(conn, "DELETE FROM expenses WHERE id = 4", ())  # Never applied, as if from another process
+    monkeypatch.setattr(columnar, "RELOAD_GRACE", 0)
+    assert store.sync(conn)
+    assert store.stats()["loads"] == 2
+    assert store.category_totals(date(2025, 4, 1), date(2025, 4, 30)) == {}
+
+
+# With a connection opener, a foreign write is reloaded in the background: requests use SQL meanwhile,
+# and a local write applied during the reload is replayed on top of its snapshot
+def test_background_reload(conn, tmp_path, monkeypatch):
+    store = ColumnarStore(partial(get_db_connection, str(tmp_path / "columnar.db")))
+    store.load(conn)
+    write(conn, "DELETE FROM expenses WHERE id = 4", ())  # Never applied, as if from another process
+    monkeypatch.setattr(columnar, "RELOAD_GRACE", 0)
+
+    reading, proceed = threading.Event(), threading.Event()
+
+    class PausedNumPy:
+        # Holds the reload between reading its snapshot and building from it
+        def __getattr__(self, name):
+            return getattr(numpy, name)
+
+        def array(self, *args, **kwargs):
+            reading.set()
+            proceed.wait(5)
+            return numpy.array(*args, **kwargs)
+
+    monkeypatch.setattr(columnar, "np", PausedNumPy())
+    assert not store.sync(conn)
+    assert reading.wait(5)
+    assert not store.sync(conn)
+    version, rows = write(conn, "INSERT INTO expenses (cost, date, category, description) "
+                                "VALUES (4, '2025-04-02', 'Gas', 'z') RETURNING id, cost, date, category", ())
+    store.apply(version, rows)
+    proceed.set()
+
+    deadline = time.monotonic() + 5
+    while not store.sync(conn) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert store.stats()["loads"] == 2
+    assert store.category_totals(date(2025, 3, 1), date(2025, 4, 30)) == sql_totals(conn, "2025-03-01", "2025-04-30")
@@ -1,6 +1,6 @@
 import sqlite3
 import pytest
-from database import DB_NAME, build_db
+from database import DB_NAME, build_db, ConnectionPool, WriteQueue, rebuild_rollups
 
 DB_PATH = "expense_tracker.db"  # Path to the database file
 
@@ -84,3 +84,78 @@ def test_invalid_data():
     assert cursor.fetchone() is None
 
     conn.close()
+
+
+# Test 4: Pooled Connections Are Reused and Tuned
+def test_connection_pool_reuse():
+    pool = ConnectionPool(DB_PATH, size=2)
+
+    with pool.connection() as conn:
+        first = conn
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+
+    with pool.connection() as conn:
+        assert conn is first  # Same long-lived connection handed back out
+
+    stats = pool.stats()
+    assert stats["open"] == 1
+    assert stats["checkouts"] == 2
+    assert stats["in_use"] == 0
+
+    pool.close()
+
+
+# Test 5: Monthly Rollups Stay Exact Through Inserts, Updates and Deletes
+def test_rollups_maintained_by_triggers():
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM expenses WHERE date LIKE '1999-%'")
+    conn.commit()
+
+    def rollup(month, category):
+        cursor.execute("SELECT total_cents, count FROM expense_rollups WHERE year=1999 AND month=? AND category=?",
+                       (month, category))
+        return cursor.fetchone()
+
+    cursor.execute("INSERT INTO expenses (cost, date, category, description) VALUES (?, ?, ?, ?)",
+                   (10.10, "1999-01-05", "Food", "Rollup A"))
+    first_id = cursor.lastrowid
+    cursor.execute("INSERT INTO expenses (cost, date, category, description) VALUES (?, ?, ?, ?)",
+                   (0.20, "1999-01-20", "Food", "Rollup B"))
+    conn.commit()
+    assert rollup(1, "Food") == (1030, 2)
+
+    # Moving an expense to another month and category moves its total with it
+    cursor.execute("UPDATE expenses SET date='1999-02-01', category='Gas' WHERE id=?", (first_id,))
+    conn.commit()
+    assert rollup(1, "Food") == (20, 1)
+    assert rollup(2, "Gas") == (1010, 1)
+
+    cursor.execute("DELETE FROM expenses WHERE id=?", (first_id,))
+    conn.commit()
+    assert rollup(2, "Gas") is None  # Empty partitions are removed
+
+    # A full rebuild agrees with the incrementally maintained rollups
+    rebuild_rollups(conn)
+    assert rollup(1, "Food") == (20, 1)
+
+    cursor.execute("DELETE FROM expenses WHERE date LIKE '1999-%'")
+    conn.commit()
+    conn.close()
+
+
+# Test 6: A Failing Write Gets Its Error Without Stopping the Group-Commit Writer
+def test_write_queue_survives_failed_writes():
+    writes = WriteQueue(DB_PATH, timeout=5)
+    insert = "INSERT INTO expenses (cost, date, category, description) VALUES (?, ?, ?, ?)"
+    try:
+        with pytest.raises(OverflowError):
+            writes.submit(insert, (10**30, "1999-06-01", "Food", "Writer Test"))
+        with pytest.raises(sqlite3.IntegrityError):
+            writes.submit(insert, (-5, "1999-06-01", "Food", "Writer Test"))
+        assert writes.submit(insert, (5, "1999-06-01", "Food", "Writer Test")).rowcount == 1
+        assert writes.stats()["errors"] == 2
+    finally:
+        writes.submit("DELETE FROM expenses WHERE description = 'Writer Test'")
+        writes.stop()
@@ -0,0 +1,28 @@
+import random
+from collections import deque
+from loadgen import DEFAULT_MIX, build_request, parse_mix, run_load, serve_seeded
+
+
+# Deletes only target rows the run created, and fall back to adds until there are some
+def test_deletes_use_created_ids():
+    rng, created = random.Random(1), deque()
+    assert build_request("delete", rng, created)[:2] == ("POST", "/expense")
+    created.append(42)
+    assert build_request("delete", rng, created) == ("DELETE", "/expense/42", None)
+    assert not created
+
+
+# A short mixed run against an in-process server reports every operation without errors
+def test_mixed_load_runs():
+    base_url, stop = serve_seeded(500)
+    try:
+        results = run_load(base_url, clients=4, duration=1.5, mix=parse_mix("add=3,bulk=1,expenses=3,summary=3,"
+                                                                             "dashboard=3,delete=2"), interval=0.5)
+    finally:
+        stop()
+    operations = results["operations"]
+    assert set(operations) <= set(DEFAULT_MIX) and {"add", "summary", "dashboard"} <= set(operations)
+    assert all(summary["errors"] == 0 and summary["requests"] > 0 for summary in operations.values())
+    assert all(sum(summary["histogram"].values()) == summary["requests"] for summary in operations.values())
+    assert results["timeline"] and sum(point["requests"] for point in results["timeline"]) == \
+        sum(summary["requests"] for summary in operations.values())
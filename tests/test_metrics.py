@@ -0,0 +1,51 @@
+import re
+import pytest
+
+
+@pytest.fixture
+def client(make_app):
+    return make_app({"RESPONSE_CACHE_ENTRIES": 0}).test_client()
+
+
+def sample(text, name, **labels):
+    # The value of one exposition line, matched on the given labels
+    for line in text.splitlines():
+        if line.startswith(name + "{") and all(f'{key}="{value}"' in line for key, value in labels.items()):
+            return float(line.rsplit(" ", 1)[1])
+    return None
+
+
+# Requests are recorded per route rule, method and status, with DB time, serialization time and rows
+def test_metrics_endpoint(client):
+    for day in ("2025-03-10", "2025-03-11", "2025-03-12"):
+        client.post("/expense", json={"cost": 5, "date": day, "category": "Food", "description": "Metrics"})
+    assert len(client.get("/expenses?month=3&year=2025").get_json()) == 3
+    client.get("/expense/999")
+    streamed = client.get("/expenses?stream=1")
+    streamed.get_data()
+    streamed.close()  # As a WSGI server would once the body is sent; streamed requests are recorded then
+
+    response = client.get("/metrics")
+    assert response.status_code == 200 and response.mimetype == "text/plain"
+    text = response.get_data(as_text=True)
+    assert sample(text, "expense_http_request_duration_seconds_count", route="/expense", method="POST",
+                  status="201") == 3
+    assert sample(text, "expense_http_request_duration_seconds_count", route="/expense/<int:id>",
+                  status="404") == 1
+    assert sample(text, "expense_http_request_duration_seconds_bucket", route="/expenses", status="200",
+                  le="+Inf") == 2
+    assert sample(text, "expense_rows_returned_sum", route="/expenses") == 6   # JSON list and stream
+    assert sample(text, "expense_db_duration_seconds_sum", route="/expenses") > 0
+    assert sample(text, "expense_serialization_duration_seconds_sum", route="/expenses") > 0
+    assert sample(text, "expense_http_requests_in_flight", route="/metrics") == 1
+    assert sample(text, "expense_http_requests_in_flight", route="/expenses") == 0
+
+    # Buckets are cumulative and end at the count
+    buckets = [float(value) for value in re.findall(
+        r'expense_http_request_duration_seconds_bucket\{route="/expense",method="POST",status="201",le="[^"]+"\} (\S+)',
+        text)]
+    assert buckets == sorted(buckets) and buckets[-1] == 3
+
+
+def test_metrics_can_be_disabled(make_app):
+    assert make_app({"METRICS": False}).test_client().get("/metrics").status_code == 404
@@ -2,10 +2,17 @@ import pytest
 import requests
 import random
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 API_URL = "http://127.0.0.1:5000"
 
 
+@pytest.fixture
+def local_app(make_app):
+    # In-process API backed by a throwaway database, so write benchmarks start from the same state
+    return make_app()
+
+
 # Benchmark Adding an Expense
 @pytest.mark.benchmark
 def test_add_expense_performance(benchmark):
@@ -28,22 +35,31 @@ def test_fetch_expenses_performance(benchmark):
     result = benchmark(lambda: requests.get(f"{API_URL}/expenses?month=3&year=2025"))
     assert result.status_code == 200
 
-# Load Testing: Adding Multiple Expenses
+# Load Testing: Adding Multiple Expenses from Concurrent Clients
+# Compares one commit per request against group commit, where a single writer thread batches commits.
 @pytest.mark.benchmark
+@pytest.mark.parametrize("group_commit", [False, True], ids=["per-request-commit", "group-commit"])
 @pytest.mark.parametrize("num_requests", [10, 50, 100])  # Test different load levels
-def test_bulk_add_expenses(benchmark, num_requests):
+def test_bulk_add_expenses(benchmark, local_app, num_requests, group_commit):
     # Test adding multiple expenses to simulate high load.
+    local_app.config["GROUP_COMMIT"] = group_commit
+
+    def add_one(_):
+        response = local_app.test_client().post("/expense", json={
+            "cost": round(random.uniform(5, 500), 2),
+            "date": "2025-03-10",
+            "category": "Gas",
+            "description": "Load Test Expense"
+        })
+        return response.status_code, response.get_json()["id"]
 
     def bulk_insert():
-        for _ in range(num_requests):
-            requests.post(f"{API_URL}/expense", json={
-                "cost": round(random.uniform(5, 500), 2),
-                "date": "2025-03-10",
-                "category": "Gas",
-                "description": "Load Test Expense"
-            })
-
-    benchmark(bulk_insert)
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            return list(executor.map(add_one, range(num_requests)))
+
+    results = benchmark(bulk_insert)
+    assert all(status == 201 for status, _ in results)
+    assert len({expense_id for _, expense_id in results}) == num_requests  # Every request got its own id
 
 
 # Load Testing: Fetching Large Dataset
@@ -0,0 +1,59 @@
+import json
+import sqlite3
+import pytest
+from profiler import normalize_sql, param_shape
+
+
+@pytest.fixture
+def profiled_app(make_app, tmp_path):
+    # Every statement counts as slow, so each one is logged
+    log_path = tmp_path / "slow.log"
+    return make_app({"SLOW_QUERY_MS": 0, "SLOW_QUERY_LOG": str(log_path), "RESPONSE_CACHE_ENTRIES": 0}), log_path
+
+
+def test_normalize_sql():
+    assert normalize_sql("SELECT *\n  FROM expenses WHERE id = 7 AND category = 'Food'") == \
+        "SELECT * FROM expenses WHERE id = ? AND category = ?"
+    assert normalize_sql("SELECT 1 FROM t WHERE c IN (?, ?, ?) AND d = ?") == \
+        "SELECT ? FROM t WHERE c IN (?, ...) AND d = ?"
+    assert param_shape(("2025-03-01", 5, 1.5)) == "(str, int, float)"
+    assert param_shape([(1.0, "a")] * 3, many=True) == "3 x (float, str)"
+
+
+# Inline inserts, bulk inserts, reads and commits are all profiled, and slow ones logged with a plan
+def test_statements_are_profiled_and_logged(profiled_app):
+    app, log_path = profiled_app
+    client = app.test_client()
+    expense = {"cost": 5.5, "date": "2025-03-10", "category": "Food", "description": "Profiled"}
+    client.post("/expense", json=expense)
+    client.post("/bulk_expense", json=[expense] * 3)
+    assert len(client.get("/expenses?month=3&year=2025").get_json()) == 4
+
+    report = client.get("/admin/slow_queries?limit=100").get_json()
+    statements = {row["sql"]: row for row in report["statements"]}
+    bulk = statements["INSERT INTO expenses (cost, date, category, description) VALUES (?, ?, ?, ?)"]
+    assert bulk["calls"] == 2 and bulk["rows"] == 4
+    listing = next(row for sql, row in statements.items() if sql.startswith("SELECT * FROM expenses WHERE date"))
+    assert listing["rows"] == 4
+    assert statements["COMMIT"]["calls"] >= 2
+    totals = [row["total_ms"] for row in report["statements"]]
+    assert totals == sorted(totals, reverse=True)
+
+    entries = [json.loads(line) for line in log_path.read_text().splitlines()]
+    select = next(entry for entry in entries if entry["sql"].startswith("SELECT * FROM expenses WHERE date"))
+    assert select["params"] == "(str, str)" and select["rows"] == 4
+    assert any("idx_expense_date_cover" in step for step in select["plan"])
+    assert any(entry["params"] == "3 x (float, str, str, str)" for entry in entries)
+
+
+# Failed statements are counted as errors; profiling can be switched off
+def test_errors_and_disabled(profiled_app, make_app):
+    app, _ = profiled_app
+    client = app.test_client()
+    with app.extensions["pool"].connection() as conn, pytest.raises(sqlite3.OperationalError):
+        conn.execute("SELECT missing_column FROM expenses WHERE id = 3")
+    statements = {row["sql"]: row for row in client.get("/admin/slow_queries").get_json()["statements"]}
+    assert statements["SELECT missing_column FROM expenses WHERE id = ?"]["errors"] == 1
+    assert client.get("/admin/slow_queries?order=bogus").status_code == 400
+
+    assert make_app({"PROFILE_SQL": False}).test_client().get("/admin/slow_queries").status_code == 404
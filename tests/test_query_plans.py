@@ -0,0 +1,91 @@
+import random
+import re
+import sqlite3
+import pytest
+import database
+from database import CATEGORIES, analyze
+
+# Requests whose SQL must stay on an index: no full SCAN, no temp B-tree for ORDER BY / GROUP BY
+HOT_REQUESTS = [
+    ("GET", "/expenses?month=3&year=2025"),
+    ("GET", "/expenses?month=3&year=2025&category=Food"),
+    ("GET", "/expenses?category=Food"),
+    ("GET", "/expenses?month=3&year=2025&limit=20&after_date=2025-03-10&after_id=5"),
+    ("GET", "/expenses?category=Food&limit=20&order=date"),
+    ("GET", "/expenses?category=Food&limit=20"),
+    ("GET", "/expenses?category=Food&limit=20&after_id=100"),
+    ("GET", "/expenses?category=Food&stream=1"),
+    ("GET", "/expenses?q=seeded&limit=20"),
+    ("GET", "/expenses?q=seeded&month=3&year=2025&category=Food"),
+    ("GET", "/summary?month=3&year=2025"),
+    ("GET", "/totals?start=2024-02-10&end=2025-03-20"),
+    ("GET", "/totals?start=2024-02-10&end=2025-03-20&category=Gas"),
+    ("GET", "/trends?start=2024-02-10&end=2025-03-20&period=month"),
+    ("GET", "/trends?start=2024-01-01&end=2024-12-31&period=week&category=Food"),
+    ("GET", "/dashboard?month=3&year=2025&category=Food"),
+    ("GET", "/export?start=2024-01-01&end=2024-06-30"),
+    ("GET", "/export?start=2024-01-01&category=Food"),
+    ("GET", "/expense/7"),
+    ("PUT", "/expense/7"),
+    ("DELETE", "/expense/8"),
+    ("POST", "/bulk_delete"),
+    ("PATCH", "/expenses"),
+]
+REQUEST_BODIES = {
+    ("PUT", "/expense/7"): {"cost": 9.5, "date": "2025-03-11", "category": "Food", "description": "Plan Test"},
+    ("POST", "/bulk_delete"): {"month": 1, "year": 2022, "category": "Gas"},
+    ("PATCH", "/expenses"): [{"id": 11, "cost": 3.5}, {"id": 12, "category": "Gas"}, {"id": 11, "cost": 4.5}],
+}
+
+# FTS5 reports every read of its index as "SCAN expenses_fts VIRTUAL TABLE INDEX n:<constraints>". One whose
+# constraints include a MATCH ("M") is a lookup in the full-text index, not a scan of the table, so it passes
+FTS_MATCH_STEP = re.compile(r"SCAN expenses_fts VIRTUAL TABLE INDEX \d+:\S*M")
+
+
+@pytest.fixture(scope="module")
+def traced_client(make_app):
+    # An app over a seeded, analyzed database whose pooled connections record every statement run
+    app = make_app({"COLUMNAR": False, "RESPONSE_CACHE_ENTRIES": 0})
+    conn = sqlite3.connect(app.config["DATABASE"])
+    rng = random.Random(7)
+    with conn:
+        conn.executemany("INSERT INTO expenses (cost, date, category, description) VALUES (?, ?, ?, ?)", [
+            (round(rng.uniform(1, 500), 2), f"{rng.randint(2022, 2025)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+             rng.choice(CATEGORIES), "Seeded") for _ in range(5000)])
+    analyze(conn)
+    conn.close()
+
+    statements = []
+    connect = database.get_db_connection
+
+    def traced_connection(db_name=None, profiler=None):
+        conn = connect(db_name, profiler)
+        conn.set_trace_callback(statements.append)
+        return conn
+
+    database.get_db_connection = traced_connection  # The pool opens its first connection after this
+    yield app, statements
+    database.get_db_connection = connect
+
+
+def query_plan(conn, sql):
+    return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql)]
+
+
+@pytest.mark.parametrize("method, url", HOT_REQUESTS)
+def test_hot_queries_use_indexes(traced_client, method, url):
+    app, statements = traced_client
+    statements.clear()
+    response = app.test_client().open(url, method=method, json=REQUEST_BODIES.get((method, url)))
+    assert response.status_code == 200
+    response.get_data()  # Drain streamed responses so their queries run
+
+    # FTS5 reads its own shadow tables (expenses_fts_*) from inside the search triggers; those are not ours
+    queries = [sql for sql in statements if sql.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE"))
+               and "'expenses_fts_" not in sql]
+    assert queries
+    with app.extensions["pool"].connection() as db:
+        for sql in queries:
+            plan = query_plan(db, sql)
+            assert not any((step.startswith("SCAN") and not FTS_MATCH_STEP.match(step)) or "TEMP B-TREE" in step
+                           for step in plan), (sql, plan)
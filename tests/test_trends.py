@@ -0,0 +1,41 @@
+import pytest
+from trends import PERIODS
+
+EDGE_EXPENSES = [
+    {"cost": 3, "date": "0001-01-05", "category": "Food", "description": "First week"},
+    {"cost": 4, "date": "0001-02-01", "category": "Gas", "description": "First February"},
+    {"cost": 5, "date": "9999-12-20", "category": "Food", "description": "Last month"},
+    {"cost": 6, "date": "9999-12-31", "category": "Gas", "description": "Last day"},
+]
+
+
+@pytest.fixture(scope="module")
+def client(make_app):
+    client = make_app({"RESPONSE_CACHE_ENTRIES": 0}).test_client()
+    assert client.post("/bulk_expense", json=EDGE_EXPENSES).status_code == 201
+    return client
+
+
+# Ranges that start, end or stop short of a month at either end of the calendar
+@pytest.mark.parametrize("period", PERIODS)
+@pytest.mark.parametrize("start, end, total", [
+    ("0001-01-01", "0001-01-20", 3),
+    ("0001-01-03", "0001-02-15", 7),
+    ("9999-12-15", "9999-12-31", 11),
+    ("9999-11-02", "9999-12-30", 5),
+    ("9990-06-15", "9999-12-31", 11),
+])
+def test_trends_at_the_ends_of_the_calendar(client, period, start, end, total):
+    response = client.get(f"/trends?start={start}&end={end}&period={period}")
+    assert response.status_code == 200
+    data = response.get_json()
+    assert sum(data["overall"]["totals"]) == total
+    assert data["periods"][0] <= start and data["periods"][-1] <= end
+
+
+# Years below 1000 are zero-padded wherever they are normalized, so they sort and slice like any other
+def test_early_years_are_zero_padded(client):
+    assert client.get("/expenses?month=1&year=1").get_json()[0]["date"] == "0001-01-05"
+    data = client.get("/trends?start=0001-01-01&end=0001-02-28&period=month").get_json()
+    assert data["periods"] == ["0001-01", "0001-02"]
+    assert data["overall"]["totals"] == [3, 4]
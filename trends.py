@@ -0,0 +1,88 @@
+import calendar
+from datetime import date, timedelta
+
+try:
+    import numpy as np
+except ImportError:  # Moving averages and deltas are then computed in plain Python
+    np = None
+
+MAX_TREND_PERIODS = 5000   # Longest series one /trends request may ask for
+
+PERIODS = ("day", "week", "month", "year")
+
+
+def period_labels(start, end, period):
+    """Every period key from the one holding `start` to the one holding `end` (dates), in order."""
+    if period == "month":
+        months = range(start.year * 12 + start.month - 1, end.year * 12 + end.month)
+        return [f"{month // 12:04d}-{month % 12 + 1:02d}" for month in months]
+    if period == "year":
+        return [f"{year:04d}" for year in range(start.year, end.year + 1)]
+
+    # Counted rather than stepped past `end`, which could overflow date.max
+    first = start - timedelta(days=start.weekday()) if period == "week" else start
+    step = timedelta(days=7 if period == "week" else 1)
+    return [(first + step * i).isoformat() for i in range(period_count(start, end, period))]
+
+
+def period_key(day, period):
+    """The period label holding a YYYY-MM-DD string. Weeks are labelled by their Monday."""
+    if period == "month":
+        return day[:7]
+    if period == "year":
+        return day[:4]
+    if period == "week":
+        parsed = date.fromisoformat(day)
+        return (parsed - timedelta(days=parsed.weekday())).isoformat()
+    return day
+
+
+def whole_months(start, end):
+    """The first and last day of the run of whole calendar months inside [start, end], or None."""
+    if start.day == 1:
+        first = start
+    elif (start.year, start.month) == (date.max.year, date.max.month):
+        return None  # No month starts after it
+    else:
+        first = date(start.year + start.month // 12, start.month % 12 + 1, 1)
+    if end.day == calendar.monthrange(end.year, end.month)[1]:
+        last = end
+    elif (end.year, end.month) == (date.min.year, date.min.month):
+        return None  # No month ends before it
+    else:
+        last = end.replace(day=1) - timedelta(days=1)
+    return (first, last) if first <= last else None
+
+
+def period_count(start, end, period):
+    """How many periods period_labels() would return, without building them."""
+    if period == "day":
+        return (end - start).days + 1
+    if period == "week":
+        return (end - (start - timedelta(days=start.weekday()))).days // 7 + 1
+    if period == "month":
+        return (end.year - start.year) * 12 + end.month - start.month + 1
+    return end.year - start.year + 1
+
+
+def moving_average(values, window):
+    """Trailing mean over `window` periods; None until a full window is available."""
+    if np is not None:
+        series = np.asarray(values, dtype=np.float64)
+        sums = np.cumsum(np.concatenate(([0.0], series)))
+        averages = (sums[window:] - sums[:-window]) / window
+        return [None] * min(window - 1, len(values)) + np.round(averages, 2).tolist()
+    averages, running = [], 0.0
+    for i, value in enumerate(values):
+        running += value - (values[i - window] if i >= window else 0)
+        averages.append(round(running / window, 2) if i >= window - 1 else None)
+    return averages
+
+
+def deltas(values):
+    """Change from the previous period; None for the first."""
+    if not values:
+        return []
+    if np is not None:
+        return [None] + np.round(np.diff(np.asarray(values, dtype=np.float64)), 2).tolist()
+    return [None] + [round(current - previous, 2) for previous, current in zip(values, values[1:])]